@@ -5,18 +5,41 @@ import re
 import html
 import json
 import io
-import hashlib
-from typing import Any
-from urllib import error as urlerror
-from urllib import request as urlrequest
+import time
+import uuid
+from typing import Any, Callable
 
 import streamlit as st
 from dotenv import load_dotenv
 
 from exporters.docx_exporter import texto_para_docx_bytes
 from exporters.pdf_exporter import texto_para_pdf_bytes
-from services.gemini_service import GeminiServiceError, gerar_peticao
-from services.prompt_builder import montar_prompt
+from services.gemini_service import (
+    GeminiServiceError,
+    coalescedor_chamadas,
+    decisoes_roteamento,
+    disjuntor_do_modelo,
+    estados_disjuntores,
+    estatisticas_hedge,
+    rotear_modelo,
+)
+from services.geracao_por_secoes import gerar_peticao_por_secoes, regenerar_secao
+from services import consultas_cadastrais
+from services.consultas_cadastrais import formatar_cep as _formatar_cep_br
+from services.biblioteca_modelos import hash_conteudo, obter_biblioteca_modelos
+from services.cache_consultas import obter_cache_consultas
+from services.compressor_modelo import comprimir_modelo_referencia
+from services.comum import float_ambiente
+from services.fila_geracao import obter_fila_geracao
+from services.indice_cep import obter_indice_cep
+from services.peticao_estruturada import estrutura_do_texto, gerar_texto_estruturado
+from services.pool_chaves import chaves_do_ambiente, obter_pool_chaves
+from services.pre_geracao import chave_pre_geracao, pre_geracao
+from services.provedores_consulta import estatisticas_provedores
+from services.provedores_llm import ProvedorGemini, definir_provedor, gerar_candidatos, gerar_peticao, obter_provedor
+from services.prompt_builder import blocos_alterados, montar_prompt, montar_prompt_com_relatorio
+from services.secoes_peticao import dividir_em_secoes, indexar_peticao
+from services.telemetria import iniciar_servidor_metricas, telemetria
 
 # ============================================================================
 # SISTEMA DE AUTENTICAÇÃO
@@ -196,6 +219,9 @@ SECOES_SUGERIDAS = [
 NIVEIS_DETALHAMENTO = ["Enxuto", "Padrão", "Aprofundado"]
 TIPOS_PESSOA_OPCOES = ["Pessoa Física", "Pessoa Jurídica"]
 LIMITE_CARACTERES_MODELO_REFERENCIA = 12000
+INTERVALO_ACOMPANHAMENTO_SEGUNDOS = 1.5
+# Prompt parado por este tempo antes da pré-geração começar (debounce).
+PRE_GERACAO_ESPERA_SEGUNDOS = float_ambiente("PRE_GERACAO_ESPERA_SEGUNDOS", 4.0)
 MODO_PREENCHIMENTO_OPCOES = ["Essencial", "Completo"]
 PEDIDOS_PARAMETROS_FINAIS = ["Tutela de urgência", "Justiça gratuita"]
 
@@ -260,10 +286,16 @@ CHAVES_FORMULARIO_BASE = [
     "tem_gratuidade",
     "tem_prioridade",
     "quer_audiencia",
+    "gerar_por_secoes",
+    "revisar_consistencia_secoes",
+    "pre_geracao_especulativa",
+    "saida_estruturada",
+    "quantidade_variantes",
     "obs_estrategicas",
     "modelo_referencia_nome",
     "modelo_referencia_texto",
     "modelo_referencia_truncado",
+    "modelo_referencia_comprimido",
 ]
 
 CAMPOS_POR_AREA: dict[str, list[dict[str, Any]]] = {
@@ -783,8 +815,11 @@ def _nome_arquivo_pdf(autor_nome: str) -> str:
 
 
  # Aplica máscara de CPF/CNPJ em um campo de documento.
-def _aplicar_mascara_documento(campo: str) -> None:
+def _aplicar_mascara_documento(campo: str, antecipar: bool = True) -> None:
     st.session_state[campo] = _formatar_cpf_cnpj(st.session_state.get(campo, ""))
+    # CNPJ completo: a consulta começa já, para o botão de busca achar o resultado pronto.
+    if antecipar:
+        consultas_cadastrais.antecipar_cnpj(st.session_state[campo])
 
 
  # Aplica máscara de moeda brasileira em um campo monetário.
@@ -793,16 +828,18 @@ def _aplicar_mascara_moeda(campo: str) -> None:
 
 
  # Aplica máscara de CEP em um campo.
-def _aplicar_mascara_cep(campo: str) -> None:
+def _aplicar_mascara_cep(campo: str, antecipar: bool = True) -> None:
     st.session_state[campo] = _formatar_cep_br(st.session_state.get(campo, ""))
+    if antecipar:
+        consultas_cadastrais.antecipar_cep(st.session_state[campo])
 
 
  # Aplica todas as máscaras necessárias antes da geração da peça.
 def _aplicar_mascaras_formulario() -> None:
-    _aplicar_mascara_documento("autor_doc")
-    _aplicar_mascara_documento("reu_doc")
-    _aplicar_mascara_cep("autor_cep")
-    _aplicar_mascara_cep("reu_cep")
+    _aplicar_mascara_documento("autor_doc", antecipar=False)
+    _aplicar_mascara_documento("reu_doc", antecipar=False)
+    _aplicar_mascara_cep("autor_cep", antecipar=False)
+    _aplicar_mascara_cep("reu_cep", antecipar=False)
     _aplicar_mascara_moeda("valor_causa")
 
 
@@ -888,18 +925,15 @@ def _coletar_dados_parte(papel: str) -> dict[str, str]:
     }
 
 
- # Formata CEP brasileiro no padrão 00000-000.
-def _formatar_cep_br(valor: str) -> str:
-    digitos = _somente_digitos(valor)
-    if len(digitos) <= 5:
-        return digitos
-    return f"{digitos[:5]}-{digitos[5:8]}"
+ # Normaliza quebras de linha do texto extraido do modelo de referencia.
+def _normalizar_texto_modelo_referencia(texto: str) -> str:
+    conteudo = str(texto or "").replace("\r\n", "\n").replace("\r", "\n")
+    return re.sub(r"\n{3,}", "\n\n", conteudo).strip()
 
 
  # Limita texto de referencia para manter o prompt em tamanho controlado.
 def _limitar_texto_modelo_referencia(texto: str, limite: int = LIMITE_CARACTERES_MODELO_REFERENCIA) -> tuple[str, bool]:
-    conteudo = str(texto or "").replace("\r\n", "\n").replace("\r", "\n")
-    conteudo = re.sub(r"\n{3,}", "\n\n", conteudo).strip()
+    conteudo = _normalizar_texto_modelo_referencia(texto)
     if len(conteudo) <= limite:
         return conteudo, False
     trecho = conteudo[:limite].rstrip()
@@ -907,6 +941,17 @@ def _limitar_texto_modelo_referencia(texto: str, limite: int = LIMITE_CARACTERES
     return f"{trecho}{aviso}", True
 
 
+ # Comprime modelos longos em esqueleto de estilo antes de aplicar o limite do prompt.
+def _preparar_texto_modelo_referencia(texto: str) -> tuple[str, bool, bool]:
+    conteudo = _normalizar_texto_modelo_referencia(texto)
+    if len(conteudo) <= LIMITE_CARACTERES_MODELO_REFERENCIA:
+        return conteudo, False, False
+
+    esqueleto = comprimir_modelo_referencia(conteudo)
+    texto_limitado, truncado = _limitar_texto_modelo_referencia(esqueleto)
+    return texto_limitado, True, truncado
+
+
  # Decodifica arquivo textual usando codificacoes comuns.
 def _decodificar_texto_arquivo(conteudo: bytes) -> str:
     for encoding in ("utf-8-sig", "utf-8", "latin-1"):
@@ -955,196 +1000,106 @@ def _extrair_texto_arquivo_modelo(nome_arquivo: str, conteudo: bytes) -> str:
     raise ValueError("Formato nao suportado. Envie .txt, .md ou .docx.")
 
 
+ # Remove do estado o modelo de referencia carregado (texto, nome e indicadores).
+def _limpar_modelo_referencia() -> None:
+    for chave in (
+        "modelo_referencia_nome",
+        "modelo_referencia_texto",
+        "modelo_referencia_truncado",
+        "modelo_referencia_comprimido",
+        "_modelo_referencia_origem",
+    ):
+        st.session_state.pop(chave, None)
+
+
+ # Grava no estado o modelo de referencia ja preparado, vindo do upload ou da biblioteca.
+def _definir_modelo_referencia(nome: str, texto: str, truncado: bool, comprimido: bool, origem: str) -> None:
+    st.session_state["modelo_referencia_nome"] = nome or "[SEM NOME]"
+    st.session_state["modelo_referencia_texto"] = texto
+    st.session_state["modelo_referencia_truncado"] = truncado
+    st.session_state["modelo_referencia_comprimido"] = comprimido
+    st.session_state["_modelo_referencia_origem"] = origem
+    st.session_state.pop("_modelo_referencia_erro", None)
+
+
  # Processa o upload do modelo de referencia e persiste texto extraido no estado.
 def _processar_modelo_referencia(uploaded_file: Any) -> None:
-    nome_key = "modelo_referencia_nome"
-    texto_key = "modelo_referencia_texto"
-    trunc_key = "modelo_referencia_truncado"
     assinatura_key = "_modelo_referencia_assinatura"
     erro_key = "_modelo_referencia_erro"
 
     if uploaded_file is None:
         st.session_state.pop(assinatura_key, None)
         st.session_state.pop(erro_key, None)
-        st.session_state.pop(nome_key, None)
-        st.session_state.pop(texto_key, None)
-        st.session_state.pop(trunc_key, None)
+        # Modelo escolhido da biblioteca continua valendo sem arquivo enviado.
+        if st.session_state.get("_modelo_referencia_origem") != "biblioteca":
+            _limpar_modelo_referencia()
         return
 
     nome_arquivo = str(getattr(uploaded_file, "name", "")).strip()
-    conteudo = bytes(uploaded_file.getvalue() or b"")
-
-    assinatura_raw = f"{nome_arquivo}|{len(conteudo)}".encode("utf-8") + conteudo
-    assinatura = hashlib.sha1(assinatura_raw).hexdigest()
+    assinatura = hash_conteudo(uploaded_file)
     if assinatura == st.session_state.get(assinatura_key):
         return
+    st.session_state[assinatura_key] = assinatura
 
+    # A biblioteca guarda o texto extraído; compressão e limite são refeitos aqui, com as regras atuais.
+    biblioteca = obter_biblioteca_modelos()
+    registro = biblioteca.obter(assinatura)
+    if registro is not None:
+        texto_limitado, comprimido, truncado = _preparar_texto_modelo_referencia(registro["texto"])
+        _definir_modelo_referencia(nome_arquivo, texto_limitado, truncado, comprimido, "upload")
+        return
+
+    conteudo = uploaded_file.getvalue() or b""
     try:
         texto_extraido = _extrair_texto_arquivo_modelo(nome_arquivo, conteudo)
     except ValueError as exc:
         st.session_state[erro_key] = str(exc)
-        st.session_state.pop(nome_key, None)
-        st.session_state.pop(texto_key, None)
-        st.session_state.pop(trunc_key, None)
-        st.session_state[assinatura_key] = assinatura
+        _limpar_modelo_referencia()
         return
     except Exception:
         st.session_state[erro_key] = "Erro inesperado ao processar o modelo de referencia."
-        st.session_state.pop(nome_key, None)
-        st.session_state.pop(texto_key, None)
-        st.session_state.pop(trunc_key, None)
-        st.session_state[assinatura_key] = assinatura
+        _limpar_modelo_referencia()
         return
 
-    texto_limitado, truncado = _limitar_texto_modelo_referencia(texto_extraido)
+    texto_limitado, comprimido, truncado = _preparar_texto_modelo_referencia(texto_extraido)
     if not texto_limitado:
         st.session_state[erro_key] = "Nao foi possivel extrair texto util do arquivo enviado."
-        st.session_state.pop(nome_key, None)
-        st.session_state.pop(texto_key, None)
-        st.session_state.pop(trunc_key, None)
-        st.session_state[assinatura_key] = assinatura
+        _limpar_modelo_referencia()
         return
 
-    st.session_state[nome_key] = nome_arquivo or "[SEM NOME]"
-    st.session_state[texto_key] = texto_limitado
-    st.session_state[trunc_key] = truncado
-    st.session_state.pop(erro_key, None)
-    st.session_state[assinatura_key] = assinatura
-
-
- # Extrai nome de representante legal/sócio principal do retorno da BrasilAPI.
-def _extrair_representante_brasilapi(dados_api: dict[str, Any]) -> str:
-    qsa = dados_api.get("qsa", [])
-    if not isinstance(qsa, list):
-        return ""
-
-    for socio in qsa:
-        if not isinstance(socio, dict):
-            continue
-        nome_rep = str(socio.get("nome_representante_legal", "")).strip()
-        if nome_rep:
-            return nome_rep
-
-    for socio in qsa:
-        if not isinstance(socio, dict):
-            continue
-        nome_socio = str(socio.get("nome_socio", "")).strip()
-        if nome_socio:
-            return nome_socio
-
-    return ""
-
-
- # Monta endereço textual a partir da resposta da BrasilAPI.
-def _montar_endereco_pj_brasilapi(dados_api: dict[str, Any]) -> str:
-    tipo_logradouro = str(dados_api.get("descricao_tipo_de_logradouro", "")).strip()
-    logradouro = str(dados_api.get("logradouro", "")).strip()
-    numero = str(dados_api.get("numero", "")).strip() or "S/N"
-    complemento = str(dados_api.get("complemento", "")).strip()
-    bairro = str(dados_api.get("bairro", "")).strip()
-    municipio = str(dados_api.get("municipio", "")).strip()
-    uf = str(dados_api.get("uf", "")).strip()
-    cep = _formatar_cep_br(str(dados_api.get("cep", "")))
-
-    linha_logradouro = " ".join(item for item in [tipo_logradouro, logradouro] if item).strip()
-    if linha_logradouro:
-        linha_logradouro = f"{linha_logradouro}, {numero}"
-    else:
-        linha_logradouro = ""
+    biblioteca.guardar(
+        assinatura,
+        nome_arquivo or "[SEM NOME]",
+        _normalizar_texto_modelo_referencia(texto_extraido),
+        len(conteudo),
+    )
+    _definir_modelo_referencia(nome_arquivo, texto_limitado, truncado, comprimido, "upload")
 
-    partes = [linha_logradouro, complemento, bairro]
 
-    cidade_uf = " / ".join(item for item in [municipio, uf] if item).strip(" /")
-    if cidade_uf:
-        partes.append(cidade_uf)
-    if cep:
-        partes.append(f"CEP {cep}")
+ # Carrega no estado o modelo escolhido na lista da biblioteca (callback do selectbox).
+def _carregar_modelo_da_biblioteca() -> None:
+    hash_modelo = str(st.session_state.get("modelo_referencia_biblioteca") or "")
+    if not hash_modelo:
+        if st.session_state.get("_modelo_referencia_origem") == "biblioteca":
+            _limpar_modelo_referencia()
+        return
 
-    partes_validas = [parte for parte in partes if parte]
-    return " - ".join(partes_validas)
+    registro = obter_biblioteca_modelos().obter(hash_modelo)
+    if registro is None:
+        st.session_state["_modelo_referencia_erro"] = "Modelo nao esta mais na biblioteca. Envie o arquivo novamente."
+        return
+    texto_limitado, comprimido, truncado = _preparar_texto_modelo_referencia(registro["texto"])
+    _definir_modelo_referencia(registro["nome"], texto_limitado, truncado, comprimido, "biblioteca")
 
 
- # Consulta dados públicos de CNPJ na BrasilAPI.
-@st.cache_data(ttl=3600, show_spinner=False)
+ # Consulta dados públicos de CNPJ na BrasilAPI (com cache persistente, inclusive de "não encontrado").
 def _consultar_cnpj_brasilapi(cnpj_digitos: str) -> dict[str, Any]:
-    digitos = _somente_digitos(cnpj_digitos)
-    if len(digitos) != 14:
-        raise ValueError("Informe um CNPJ com 14 dígitos para consulta.")
-
-    url = f"https://brasilapi.com.br/api/cnpj/v1/{digitos}"
-    req = urlrequest.Request(url, headers={"User-Agent": "streamlit-app/1.0"})
-
-    try:
-        with urlrequest.urlopen(req, timeout=12) as resp:
-            conteudo = resp.read().decode("utf-8")
-    except urlerror.HTTPError as exc:
-        if exc.code == 404:
-            raise ValueError("CNPJ não encontrado na BrasilAPI.") from exc
-        raise ValueError(f"Falha ao consultar CNPJ na BrasilAPI (HTTP {exc.code}).") from exc
-    except urlerror.URLError as exc:
-        raise ValueError("Não foi possível conectar à BrasilAPI.") from exc
-    except TimeoutError as exc:
-        raise ValueError("Tempo esgotado na consulta do CNPJ.") from exc
-
-    try:
-        dados_api = json.loads(conteudo)
-    except json.JSONDecodeError as exc:
-        raise ValueError("Resposta inválida da BrasilAPI.") from exc
-
-    if not isinstance(dados_api, dict):
-        raise ValueError("Resposta inválida da BrasilAPI.")
-    return dados_api
+    return consultas_cadastrais.consultar_cnpj(_somente_digitos(cnpj_digitos))
 
 
- # Consulta dados públicos de CEP na BrasilAPI.
-@st.cache_data(ttl=3600, show_spinner=False)
+ # Consulta dados públicos de CEP na BrasilAPI (com cache persistente, inclusive de "não encontrado").
 def _consultar_cep_brasilapi(cep_digitos: str) -> dict[str, Any]:
-    digitos = _somente_digitos(cep_digitos)
-    if len(digitos) != 8:
-        raise ValueError("Informe um CEP com 8 dígitos para consulta.")
-
-    url = f"https://brasilapi.com.br/api/cep/v1/{digitos}"
-    req = urlrequest.Request(url, headers={"User-Agent": "streamlit-app/1.0"})
-
-    try:
-        with urlrequest.urlopen(req, timeout=12) as resp:
-            conteudo = resp.read().decode("utf-8")
-    except urlerror.HTTPError as exc:
-        if exc.code == 404:
-            raise ValueError("CEP não encontrado na BrasilAPI.") from exc
-        raise ValueError(f"Falha ao consultar CEP na BrasilAPI (HTTP {exc.code}).") from exc
-    except urlerror.URLError as exc:
-        raise ValueError("Não foi possível conectar à BrasilAPI para consulta de CEP.") from exc
-    except TimeoutError as exc:
-        raise ValueError("Tempo esgotado na consulta do CEP.") from exc
-
-    try:
-        dados_api = json.loads(conteudo)
-    except json.JSONDecodeError as exc:
-        raise ValueError("Resposta inválida da BrasilAPI para CEP.") from exc
-
-    if not isinstance(dados_api, dict):
-        raise ValueError("Resposta inválida da BrasilAPI para CEP.")
-    return dados_api
-
-
- # Monta endereço a partir do retorno da BrasilAPI de CEP.
-def _montar_endereco_cep_brasilapi(dados_api: dict[str, Any]) -> str:
-    rua = str(dados_api.get("street", "")).strip()
-    bairro = str(dados_api.get("neighborhood", "")).strip()
-    cidade = str(dados_api.get("city", "")).strip()
-    uf = str(dados_api.get("state", "")).strip()
-    cep = _formatar_cep_br(str(dados_api.get("cep", "")))
-
-    partes = [rua, bairro]
-    cidade_uf = " / ".join(item for item in [cidade, uf] if item).strip(" /")
-    if cidade_uf:
-        partes.append(cidade_uf)
-    if cep:
-        partes.append(f"CEP {cep}")
-
-    partes_validas = [item for item in partes if item]
-    return " - ".join(partes_validas)
+    return consultas_cadastrais.consultar_cep(_somente_digitos(cep_digitos))
 
 
  # Preenche campos de parte PJ com base no CNPJ consultado na BrasilAPI.
@@ -1166,40 +1121,11 @@ def _preencher_parte_com_cnpj(papel: str) -> None:
         st.session_state[feedback_key] = ("error", "Erro inesperado ao consultar CNPJ.")
         return
 
-    razao_social = str(dados_api.get("razao_social", "")).strip()
-    nome_fantasia = str(dados_api.get("nome_fantasia", "")).strip()
-    natureza_juridica = str(dados_api.get("natureza_juridica", "")).strip()
-    endereco = _montar_endereco_pj_brasilapi(dados_api)
-    cep_cnpj = _formatar_cep_br(str(dados_api.get("cep", "")))
-    representante_legal = _extrair_representante_brasilapi(dados_api)
-    situacao = str(dados_api.get("descricao_situacao_cadastral", "")).strip()
-    email = str(dados_api.get("email", "")).strip()
-    telefone = _somente_digitos(str(dados_api.get("ddd_telefone_1", "")))
-
     st.session_state[f"{prefixo}_tipo_pessoa"] = "Pessoa Jurídica"
-    if razao_social:
-        st.session_state[f"{prefixo}_nome"] = razao_social
-    elif nome_fantasia:
-        st.session_state[f"{prefixo}_nome"] = nome_fantasia
-
-    if natureza_juridica:
-        st.session_state[f"{prefixo}_natureza_juridica"] = natureza_juridica
-    if representante_legal:
-        st.session_state[f"{prefixo}_representante_legal"] = representante_legal
-    if cep_cnpj:
-        st.session_state[f"{prefixo}_cep"] = cep_cnpj
-    if endereco:
-        st.session_state[f"{prefixo}_end"] = endereco
-
-    extras: list[str] = []
-    if situacao:
-        extras.append(f"Situação cadastral: {situacao}")
-    if telefone:
-        extras.append(f"Telefone: {telefone}")
-    if email:
-        extras.append(f"E-mail: {email}")
-    if extras and not _texto_campo(f"{prefixo}_qualificacao"):
-        st.session_state[f"{prefixo}_qualificacao"] = "; ".join(extras)
+    for campo, valor in consultas_cadastrais.campos_pj(dados_api).items():
+        if campo == "qualificacao" and _texto_campo(f"{prefixo}_qualificacao"):
+            continue
+        st.session_state[f"{prefixo}_{campo}"] = valor
 
     st.session_state[feedback_key] = ("success", "Dados da pessoa jurídica preenchidos.")
 
@@ -1223,13 +1149,12 @@ def _preencher_endereco_por_cep(papel: str) -> None:
         st.session_state[feedback_key] = ("error", "Erro inesperado ao consultar CEP.")
         return
 
-    endereco = _montar_endereco_cep_brasilapi(dados_api)
-    cep_fmt = _formatar_cep_br(str(dados_api.get("cep", cep_digitos)))
-    if cep_fmt:
-        st.session_state[f"{prefixo}_cep"] = cep_fmt
+    campos = consultas_cadastrais.campos_cep(dados_api, cep_digitos)
+    if "cep" in campos:
+        st.session_state[f"{prefixo}_cep"] = campos["cep"]
 
-    if endereco:
-        st.session_state[f"{prefixo}_end"] = endereco
+    if "end" in campos:
+        st.session_state[f"{prefixo}_end"] = campos["end"]
         st.session_state[feedback_key] = ("success", "Endereço preenchido via CEP. Revise número/complemento se necessário.")
     else:
         st.session_state[feedback_key] = ("error", "CEP encontrado, mas sem dados suficientes para montar endereço.")
@@ -1314,6 +1239,7 @@ def _coletar_payload() -> dict[str, Any]:
         "nome_arquivo": st.session_state.get("modelo_referencia_nome", ""),
         "texto": st.session_state.get("modelo_referencia_texto", ""),
         "conteudo_truncado": bool(st.session_state.get("modelo_referencia_truncado", False)),
+        "conteudo_comprimido": bool(st.session_state.get("modelo_referencia_comprimido", False)),
     }
 
     dados = {
@@ -1911,12 +1837,33 @@ def _aplicar_estilo_preto_dourado() -> None:
     )
 
 
+ # Monta o chip com o estado do disjuntor da API (fechado, aberto ou meio-aberto).
+def _chip_disjuntor(estado_disjuntor: dict[str, Any] | None) -> str:
+    if not estado_disjuntor:
+        return ""
+    estado = estado_disjuntor.get("estado")
+    if estado == "aberto":
+        rotulo = f"API indisponível · nova tentativa em {estado_disjuntor.get('sondagem_em_s', 0):.0f}s"
+    elif estado == "meio_aberto":
+        rotulo = "API instável · testando recuperação"
+    else:
+        rotulo = "API disponível"
+    css = "status-ok" if estado == "fechado" else "status-warn"
+    return f'<span class="hero-chip {css}">{html.escape(rotulo)}</span>'
+
+
  # Renderiza o cabeçalho principal com informações de área, modelo e status da API.
-def _render_cabecalho_moderno(area: str, modelo: str, api_configurada: bool) -> None:
+def _render_cabecalho_moderno(
+    area: str,
+    modelo: str,
+    api_configurada: bool,
+    estado_disjuntor: dict[str, Any] | None = None,
+) -> None:
     area_esc = html.escape(area or "Outro")
     modelo_esc = html.escape(modelo or "[PREENCHER]")
     status_label = "Chave API configurada" if api_configurada else "Chave API ausente"
     status_css = "status-ok" if api_configurada else "status-warn"
+    chip_disjuntor = _chip_disjuntor(estado_disjuntor)
 
     st.markdown(
         f"""
@@ -1929,6 +1876,7 @@ def _render_cabecalho_moderno(area: str, modelo: str, api_configurada: bool) ->
                 <span class="hero-chip">Área: {area_esc}</span>
                 <span class="hero-chip">Modelo: {modelo_esc}</span>
                 <span class="hero-chip {status_css}">{status_label}</span>
+                {chip_disjuntor}
             </div>
         </section>
         """,
@@ -2002,6 +1950,392 @@ def _sugerir_foro_competente(area_direito: str, rito: str) -> str:
     return ""
 
 
+ # Renderiza a ação de regenerar apenas uma seção da petição já gerada.
+def _renderizar_regeneracao_secao(modelo: str) -> None:
+    secoes = dividir_em_secoes(st.session_state.peticao_texto)
+    if not secoes:
+        return
+
+    rotulos = [f"{idx + 1}. {secao['cabecalho'] or secao['titulo']}" for idx, secao in enumerate(secoes)]
+    reg1, reg2 = st.columns([3, 1])
+    with reg1:
+        rotulo_escolhido = st.selectbox("Seção para regenerar", rotulos, key="secao_regenerar")
+    with reg2:
+        st.markdown("<div style='height: 1.75rem'></div>", unsafe_allow_html=True)
+        regenerar = st.button("Regenerar esta seção", key="btn_regenerar_secao", use_container_width=True)
+
+    if not regenerar:
+        return
+
+    indice = rotulos.index(rotulo_escolhido) if rotulo_escolhido in rotulos else 0
+    dados = _coletar_payload()
+    rota = _rotear_geracao(dados, modelo)
+    with st.spinner(f"Regenerando {secoes[indice]['titulo']}..."):
+        try:
+            st.session_state.peticao_texto = regenerar_secao(
+                dados,
+                st.session_state.peticao_texto,
+                indice,
+                model=rota["modelo"],
+                parametros=rota["parametros"],
+            )
+        except (GeminiServiceError, IndexError) as exc:
+            st.error(str(exc))
+            return
+        except Exception as exc:  # pragma: no cover
+            st.error(f"Erro inesperado ao regenerar a seção: {exc}")
+            return
+    st.rerun()
+
+
+ # Mostra o relatório da última montagem de prompt: tamanho, tokens e tempo por bloco.
+def _renderizar_relatorio_prompt() -> None:
+    relatorio = st.session_state.get("_relatorio_prompt")
+    if not isinstance(relatorio, dict):
+        return
+
+    with st.expander("Relatório de montagem do prompt"):
+        st.caption(
+            f"Total: {relatorio.get('total_caracteres', 0)} caracteres, "
+            f"~{relatorio.get('total_tokens_estimados', 0)} tokens, "
+            f"montado em {relatorio.get('tempo_total_ms', 0):.2f} ms."
+        )
+        linhas = [
+            {
+                "Bloco": nome,
+                "Caracteres": medicao.get("caracteres", 0),
+                "Tokens (estimados)": medicao.get("tokens_estimados", 0),
+                "Tempo (ms)": medicao.get("tempo_ms", 0.0),
+                "Cache": "sim" if medicao.get("cache") else "não",
+            }
+            for nome, medicao in relatorio.get("blocos", {}).items()
+        ]
+        st.table(linhas)
+        st.json(relatorio.get("classificacao", {}), expanded=False)
+
+
+ # Troca o texto da petição pela versão escolhida (o .docx e o .pdf exportam a escolhida).
+def _escolher_variante() -> None:
+    variantes = st.session_state.get("_variantes_peticao") or []
+    rotulo = str(st.session_state.get("_variante_escolhida", ""))
+    indice = int(rotulo.rsplit(" ", 1)[-1]) - 1 if rotulo else 0
+    if 0 <= indice < len(variantes):
+        st.session_state.peticao_texto = variantes[indice]
+
+
+ # Mostra as versões geradas lado a lado e a escolha de qual exportar.
+def _renderizar_variantes(variantes: list[str]) -> None:
+    colunas = st.columns(len(variantes))
+    for idx, (coluna, variante) in enumerate(zip(colunas, variantes), start=1):
+        with coluna:
+            st.text_area(f"Versão {idx}", variante, height=420, disabled=True)
+    st.radio(
+        "Versão para exportar",
+        [f"Versão {idx}" for idx in range(1, len(variantes) + 1)],
+        horizontal=True,
+        key="_variante_escolhida",
+        on_change=_escolher_variante,
+    )
+    if st.session_state.peticao_texto not in variantes:
+        st.caption(
+            "O texto atual, abaixo, tem seções regeneradas; escolher uma versão descarta essas alterações."
+        )
+
+
+ # Mostra as estatísticas do cache persistente de consultas de CNPJ/CEP.
+def _renderizar_estatisticas_consultas() -> None:
+    estatisticas = obter_cache_consultas().estatisticas()
+    indice = obter_indice_cep()
+    resumo_provedores = estatisticas_provedores.resumo()
+    if not estatisticas and indice is None and not resumo_provedores:
+        return
+
+    with st.expander("Consultas CNPJ/CEP"):
+        st.table(
+            [
+                {"tipo": tipo.upper(), **dados, "taxa_acerto": f"{dados['taxa_acerto']:.0%}"}
+                for tipo, dados in estatisticas.items()
+            ]
+        )
+        st.caption("Acertos e negativos (não encontrado) foram respondidos sem chamar a BrasilAPI.")
+        if indice is not None:
+            resumo_indice = indice.resumo()
+            st.caption(
+                f"Índice local de CEPs: {resumo_indice['registros']} registros; "
+                f"{resumo_indice['acertos']} acerto(s) e {resumo_indice['faltas']} falta(s) neste servidor."
+            )
+        if resumo_provedores:
+            st.table(
+                [
+                    {"provedor": nome, **dados, "taxa_erro": f"{dados['taxa_erro']:.0%}"}
+                    for nome, dados in resumo_provedores.items()
+                ]
+            )
+            st.caption("Vitórias: respostas usadas quando mais de um provedor foi consultado na mesma busca.")
+
+
+ # Mostra a saúde das chaves da API (quando houver mais de uma) e os contadores de hedge.
+def _renderizar_saude_api() -> None:
+    pool = obter_pool_chaves()
+    resumo_hedge = estatisticas_hedge.resumo()
+    resumo_coalescencia = coalescedor_chamadas.resumo()
+    resumo_telemetria = telemetria.memoria.resumo()
+    if not resumo_telemetria["chamadas"] and len(pool) < 2:
+        return
+
+    with st.expander("Saúde da API Gemini"):
+        if resumo_telemetria["chamadas"]:
+            p50 = resumo_telemetria["latencia_p50_s"] or 0.0
+            p95 = resumo_telemetria["latencia_p95_s"] or 0.0
+            tokens = resumo_telemetria["tokens"]
+            st.caption(
+                f"{resumo_telemetria['chamadas']} chamada(s) neste servidor; erro em "
+                f"{resumo_telemetria['taxa_erro']:.0%}. Latência p50 {p50:.1f}s, p95 {p95:.1f}s. "
+                f"Tokens: {tokens['prompt']} de prompt ({tokens['cache']} em cache), {tokens['candidatos']} gerados."
+            )
+        if len(pool) >= 2:
+            st.table(pool.resumo())
+        if resumo_hedge["chamadas"]:
+            st.caption(
+                f"Hedge: {resumo_hedge['hedges_disparados']} de {resumo_hedge['chamadas']} chamadas "
+                f"({resumo_hedge['taxa_hedge']:.0%}); reserva venceu {resumo_hedge['vitorias_reserva']} vez(es)."
+            )
+        if resumo_coalescencia["coalescidas"]:
+            st.caption(
+                f"Chamadas idênticas aproveitadas de outra em andamento: {resumo_coalescencia['coalescidas']} "
+                f"de {resumo_coalescencia['chamadas']}."
+            )
+        disjuntores = estados_disjuntores()
+        if any(estado["amostras"] or estado["aberturas"] for estado in disjuntores.values()):
+            st.caption("Disjuntores por modelo (aberto = falha imediata até a próxima sondagem):")
+            st.table([{"modelo": modelo, **estado} for modelo, estado in disjuntores.items()])
+        tarefas = obter_fila_geracao().resumo()
+        if tarefas:
+            st.caption("Fila de geração: " + ", ".join(f"{estado}: {total}" for estado, total in sorted(tarefas.items())))
+        if decisoes_roteamento:
+            st.caption("Últimas decisões de roteamento de modelo:")
+            st.table(list(decisoes_roteamento)[-5:])
+
+
+ # Escolhe modelo, limite de saída e orçamento de raciocínio pelo nível de detalhamento, área e tipo de ação.
+def _rotear_geracao(dados: dict[str, Any], modelo_padrao: str, registrar: bool = True) -> dict[str, Any]:
+    estrutura = dados.get("estrutura_peticao") if isinstance(dados.get("estrutura_peticao"), dict) else {}
+    contexto = dados.get("contexto_processual") if isinstance(dados.get("contexto_processual"), dict) else {}
+    return rotear_modelo(
+        nivel=str(estrutura.get("nivel_detalhamento", "")),
+        area=str(contexto.get("area_direito", "")),
+        tipo_acao=str(dados.get("tipo_acao", "")),
+        modelo_padrao=modelo_padrao,
+        registrar=registrar,
+    )
+
+
+ # Retorna o modo de geração atual e a função que gera o texto sem usar elementos da interface.
+def _preparar_funcao_geracao(dados: dict[str, Any], prompt: str, modelo: str) -> tuple[str, Callable[[], str]]:
+    rota = _rotear_geracao(dados, modelo, registrar=False)
+    modelo_rota, parametros = rota["modelo"], rota["parametros"]
+    sufixo = f"{modelo_rota}|{json.dumps(parametros, sort_keys=True)}"
+    if st.session_state.get("gerar_por_secoes", False):
+        revisar = bool(st.session_state.get("revisar_consistencia_secoes", True))
+        return (
+            f"secoes|revisao={int(revisar)}|{sufixo}",
+            lambda: gerar_peticao_por_secoes(
+                dados, model=modelo_rota, parametros=parametros, revisar_consistencia=revisar
+            )["texto"],
+        )
+    if st.session_state.get("saida_estruturada", False):
+        return (
+            f"estruturado|{sufixo}",
+            lambda: gerar_texto_estruturado(dados, model=modelo_rota, parametros=parametros),
+        )
+    return f"completo|{sufixo}", lambda: gerar_peticao(prompt, model=modelo_rota, parametros=parametros)
+
+
+ # Dispara a pré-geração em segundo plano quando o formulário fica válido (modo opcional).
+def _disparar_pre_geracao(modelo: str, etapa_atual: str) -> None:
+    chave_sessao = "_pre_geracao_chave"
+    sessao = st.session_state.setdefault("_pre_geracao_sessao", uuid.uuid4().hex)
+    ativo = bool(st.session_state.get("pre_geracao_especulativa", False))
+    if not ativo or _validar_essenciais_para_geracao():
+        pre_geracao.cancelar_agendamento(sessao)
+        chave_anterior = st.session_state.pop(chave_sessao, None)
+        if chave_anterior:
+            pre_geracao.descartar(chave_anterior)
+        return
+    # Só na etapa final: nas anteriores o formulário ainda muda a cada campo e cada disparo é uma chamada paga.
+    if etapa_atual != ETAPAS_FLUXO[-1]:
+        pre_geracao.cancelar_agendamento(sessao)
+        return
+
+    dados = _coletar_payload()
+    prompt = montar_prompt(dados)
+    modo, gerar_texto = _preparar_funcao_geracao(dados, prompt, modelo)
+    chave = chave_pre_geracao(prompt, modelo, modo)
+
+    chave_anterior = st.session_state.get(chave_sessao)
+    if chave_anterior and chave_anterior != chave:
+        pre_geracao.descartar(chave_anterior)
+    if chave == st.session_state.get("_pre_geracao_consumida"):
+        return
+
+    st.session_state[chave_sessao] = chave
+    pre_geracao.agendar(sessao, chave, gerar_texto, PRE_GERACAO_ESPERA_SEGUNDOS)
+
+
+ # Monta a tarefa de geração da fila; lê a sessão aqui, porque a função roda fora da thread do script.
+def _montar_tarefa_geracao(
+    dados: dict[str, Any],
+    prompt: str,
+    rota: dict[str, Any],
+    chave_pre_gerada: str | None = None,
+) -> Callable[[], dict[str, Any]]:
+    por_secoes = bool(st.session_state.get("gerar_por_secoes", False))
+    revisar_secoes = bool(st.session_state.get("revisar_consistencia_secoes", True))
+    estruturado = bool(st.session_state.get("saida_estruturada", False))
+    quantidade = 1 if por_secoes or estruturado else int(st.session_state.get("quantidade_variantes", 1) or 1)
+    modelo_rota, parametros = rota["modelo"], rota["parametros"]
+
+    def executar() -> dict[str, Any]:
+        texto_pre_gerado = None
+        if chave_pre_gerada:
+            texto_pre_gerado = pre_geracao.obter(chave_pre_gerada)
+            pre_geracao.descartar(chave_pre_gerada)
+            if texto_pre_gerado and quantidade == 1:
+                return {"texto": texto_pre_gerado, "legendas": ["Petição servida pela pré-geração em segundo plano."]}
+
+        legendas = [f"Modelo: {modelo_rota} (rota: {rota['regra']})."]
+        avisos: list[str] = []
+        if por_secoes:
+            resultado_secoes = gerar_peticao_por_secoes(
+                dados, model=modelo_rota, parametros=parametros, revisar_consistencia=revisar_secoes
+            )
+            texto = resultado_secoes["texto"]
+            legendas.append(
+                f"Gerada por seções em paralelo em {resultado_secoes['tempo_total']:.1f}s "
+                f"({len(resultado_secoes['tempos_por_grupo'])} chamadas simultâneas"
+                + (", mais a revisão de consistência)." if revisar_secoes else ").")
+            )
+            if resultado_secoes["secoes_ausentes"]:
+                avisos.append("Seções não identificadas no texto gerado: " + ", ".join(resultado_secoes["secoes_ausentes"]))
+        elif estruturado:
+            texto = gerar_texto_estruturado(dados, model=modelo_rota, parametros=parametros)
+        elif quantidade > 1:
+            # A pré-geração, se houver, já vale como uma das versões.
+            variantes = [texto_pre_gerado] if texto_pre_gerado else []
+            variantes += gerar_candidatos(
+                prompt, quantidade - len(variantes), model=modelo_rota, parametros=parametros
+            )
+            legendas.append(f"{len(variantes)} versões geradas com uma única espera; escolha abaixo qual exportar.")
+            return {"texto": variantes[0], "variantes": variantes, "legendas": legendas, "avisos": avisos}
+        else:
+            texto = gerar_peticao(prompt, model=modelo_rota, parametros=parametros)
+        return {"texto": texto, "legendas": legendas, "avisos": avisos}
+
+    return executar
+
+
+ # Retorna o id da tarefa de geração da sessão, recuperando-o da URL após reconexão.
+def _id_tarefa_geracao() -> str | None:
+    id_tarefa = st.session_state.get("_tarefa_geracao")
+    if not id_tarefa:
+        id_url = st.query_params.get("tarefa")
+        if id_url and obter_fila_geracao().situacao(id_url) is not None:
+            st.session_state["_tarefa_geracao"] = id_tarefa = id_url
+    return id_tarefa
+
+
+ # Indica se a sessão tem uma geração na fila ou em execução.
+def _tarefa_geracao_pendente() -> bool:
+    id_tarefa = _id_tarefa_geracao()
+    situacao = obter_fila_geracao().situacao(id_tarefa) if id_tarefa else None
+    return situacao is not None and situacao["estado"] in ("na_fila", "executando")
+
+
+ # Esquece a tarefa na sessão e na URL.
+def _encerrar_tarefa_geracao(id_tarefa: str) -> None:
+    st.session_state.pop("_tarefa_geracao", None)
+    if st.query_params.get("tarefa") == id_tarefa:
+        del st.query_params["tarefa"]
+    obter_fila_geracao().descartar(id_tarefa)
+
+
+ # Acompanha a tarefa de geração: mostra o andamento e, ao terminar, aplica o resultado na sessão.
+def _acompanhar_tarefa_geracao() -> None:
+    id_tarefa = _id_tarefa_geracao()
+    if not id_tarefa:
+        return
+    situacao = obter_fila_geracao().situacao(id_tarefa)
+    if situacao is None:
+        st.session_state.pop("_tarefa_geracao", None)
+        return
+
+    if situacao["estado"] == "concluida":
+        resultado = situacao["resultado"]
+        st.session_state.peticao_texto = resultado["texto"]
+        st.session_state["_variantes_peticao"] = resultado.get("variantes") or []
+        st.session_state.pop("_variante_escolhida", None)
+        for legenda in resultado.get("legendas", []):
+            st.caption(legenda)
+        for aviso in resultado.get("avisos", []):
+            st.warning(aviso)
+        _encerrar_tarefa_geracao(id_tarefa)
+        return
+    if situacao["estado"] in ("falhou", "cancelada"):
+        erro = situacao["erro"]
+        if isinstance(erro, GeminiServiceError):
+            st.error(str(erro))
+        elif erro is not None:
+            st.error(f"Erro inesperado ao gerar peticao: {erro}")
+        _encerrar_tarefa_geracao(id_tarefa)
+        return
+
+    _painel_tarefa_geracao(id_tarefa)
+
+
+ # Painel de andamento; com st.fragment, só ele é reexecutado a cada intervalo até a tarefa terminar.
+def _mostrar_andamento_tarefa(id_tarefa: str) -> None:
+    situacao = obter_fila_geracao().situacao(id_tarefa)
+    if situacao is None or situacao["estado"] not in ("na_fila", "executando"):
+        st.rerun()
+        return
+
+    descricao = situacao["descricao"]
+    if situacao["estado"] == "na_fila":
+        st.info(f"Geração na fila (posição {situacao['posicao_fila']}); aguardando um worker livre...")
+    else:
+        st.info(
+            f"Gerando a petição com {descricao.get('modelo', '')} "
+            f"há {situacao['execucao_s']:.0f}s. Pode continuar navegando: o resultado não se perde."
+        )
+    if situacao["estado"] == "na_fila" and st.button("Cancelar geração", key="btn_cancelar_geracao"):
+        obter_fila_geracao().cancelar(id_tarefa)
+        st.rerun()
+
+
+_fragmento = getattr(st, "fragment", None)
+_painel_tarefa_geracao = (
+    _fragmento(run_every=INTERVALO_ACOMPANHAMENTO_SEGUNDOS)(_mostrar_andamento_tarefa)
+    if _fragmento is not None
+    else _mostrar_andamento_tarefa
+)
+
+
+ # Sobe o endpoint /metrics uma vez por processo; reruns e novas sessões reaproveitam o resultado.
+@st.cache_resource(show_spinner=False)
+def _iniciar_servidor_metricas_processo() -> int | None:
+    return iniciar_servidor_metricas()
+
+
+ # Resolve o provedor de LLM uma vez por processo; LLM_PROVEDOR inválido cai no gemini com aviso.
+@st.cache_resource(show_spinner=False)
+def _resolver_provedor_llm() -> tuple[str, str | None]:
+    try:
+        return obter_provedor().nome, None
+    except GeminiServiceError as exc:
+        definir_provedor(ProvedorGemini())
+        return "gemini", f"{exc} Usando o provedor gemini."
+
+
  # Aplica sugestões automáticas que reduzem erro de preenchimento sem impor campos.
 def _aplicar_sugestoes_inteligentes(area_direito: str) -> None:
     if area_direito != "Direito da Saúde":
@@ -2018,6 +2352,7 @@ def _aplicar_sugestoes_inteligentes(area_direito: str) -> None:
 
 
 load_dotenv()
+_iniciar_servidor_metricas_processo()
 
 st.set_page_config(page_title="Gerador de Peticao Inicial (Gemini)", layout="wide")
 _aplicar_estilo_preto_dourado()
@@ -2025,14 +2360,22 @@ _restaurar_snapshot_formulario()
 if st.session_state.get("area_direito") not in AREAS_DIREITO:
     st.session_state["area_direito"] = AREAS_DIREITO[0]
 
-api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+provedor_llm, aviso_provedor_llm = _resolver_provedor_llm()
+api_configurada = bool(chaves_do_ambiente()) or provedor_llm != "gemini"
 gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash").strip()
 etapa_atual, etapa_idx = _menu_fluxo_lateral()
 area_selecionada = st.session_state.get("area_direito", AREAS_DIREITO[0])
 _aplicar_sugestoes_inteligentes(area_selecionada)
-_render_cabecalho_moderno(area=area_selecionada, modelo=gemini_model, api_configurada=bool(api_key))
-if not api_key:
-    st.warning("Configure sua chave no .env (GEMINI_API_KEY ou GOOGLE_API_KEY) antes de gerar.")
+_render_cabecalho_moderno(
+    area=area_selecionada,
+    modelo=gemini_model,
+    api_configurada=api_configurada,
+    estado_disjuntor=disjuntor_do_modelo(gemini_model).resumo() if provedor_llm == "gemini" else None,
+)
+if aviso_provedor_llm:
+    st.warning(aviso_provedor_llm)
+if not api_configurada:
+    st.warning("Configure sua chave no .env (GEMINI_API_KEY, GOOGLE_API_KEY ou GEMINI_API_KEYS) antes de gerar.")
 
 voltar_etapa = False
 avancar_etapa = False
@@ -2398,6 +2741,42 @@ with st.container(border=True):
             st.checkbox("Incluir pedido de justiça gratuita", key="tem_gratuidade")
             st.checkbox("Incluir prioridade de tramitação", key="tem_prioridade")
             st.checkbox("Manifestar interesse em audiência de conciliação", key="quer_audiencia", value=True)
+            st.checkbox(
+                "Gerar por seções em paralelo (experimental)",
+                key="gerar_por_secoes",
+                help="Redige grupos de seções em chamadas simultâneas e junta na ordem da estrutura base. "
+                "Costuma reduzir a espera em petições longas, com mais chamadas à API.",
+            )
+            st.checkbox(
+                "Revisar consistência do texto juntado",
+                key="revisar_consistencia_secoes",
+                value=True,
+                disabled=not st.session_state.get("gerar_por_secoes", False),
+                help="Na geração por seções, uma chamada final relê a petição inteira para alinhar termos, "
+                "nomes e referências entre as seções. Acrescenta a espera de uma chamada.",
+            )
+            st.checkbox(
+                "Pré-gerar em segundo plano quando os obrigatórios estiverem completos",
+                key="pre_geracao_especulativa",
+                help="Na etapa final, começa a gerar depois de alguns segundos sem mudanças no formulário. "
+                "Uma pré-geração por vez; se o formulário mudar, ela é descartada e pode consumir chamadas extras da API.",
+            )
+            st.checkbox(
+                "Saída estruturada em JSON (experimental)",
+                key="saida_estruturada",
+                help="O Gemini devolve seções, parágrafos e pedidos separados; o .docx e o .pdf saem com títulos "
+                "e numeração direto da estrutura. Ignorada quando a geração por seções estiver marcada.",
+            )
+            st.number_input(
+                "Versões para comparar",
+                min_value=1,
+                max_value=4,
+                value=1,
+                step=1,
+                key="quantidade_variantes",
+                help="Gera várias versões da petição com uma única espera e mostra lado a lado para escolher "
+                "qual exportar. Cada versão consome tokens. Vale só para a geração completa (sem seções nem JSON).",
+            )
             if area_selecionada == "Direito da Saúde":
                 chave_urgencia = _chave_campo_area("Direito da Saude", "urgencia_laudo")
                 urgencia_laudo = str(st.session_state.get(chave_urgencia, "")).strip()
@@ -2425,6 +2804,21 @@ with st.container(border=True):
             )
             _processar_modelo_referencia(arquivo_modelo_referencia)
 
+            modelos_guardados = obter_biblioteca_modelos().listar()
+            if modelos_guardados:
+                rotulos_modelos = {
+                    item["hash"]: f"{item['nome']} ({item['tamanho_original'] / 1024:.0f} KB)"
+                    for item in modelos_guardados
+                }
+                st.selectbox(
+                    "Ou escolha um modelo já enviado",
+                    options=[""] + list(rotulos_modelos),
+                    format_func=lambda hash_modelo: rotulos_modelos.get(hash_modelo, "—"),
+                    key="modelo_referencia_biblioteca",
+                    on_change=_carregar_modelo_da_biblioteca,
+                    help="Modelos enviados neste servidor, do uso mais recente para o mais antigo.",
+                )
+
             erro_modelo = str(st.session_state.get("_modelo_referencia_erro", "")).strip()
             if erro_modelo:
                 st.error(erro_modelo)
@@ -2432,8 +2826,13 @@ with st.container(border=True):
                 nome_modelo = str(st.session_state.get("modelo_referencia_nome", "")).strip()
                 texto_modelo = str(st.session_state.get("modelo_referencia_texto", "")).strip()
                 truncado_modelo = bool(st.session_state.get("modelo_referencia_truncado", False))
+                comprimido_modelo = bool(st.session_state.get("modelo_referencia_comprimido", False))
                 if nome_modelo and texto_modelo:
-                    sufixo = " (trecho truncado para caber no prompt)" if truncado_modelo else ""
+                    sufixo = ""
+                    if comprimido_modelo:
+                        sufixo = " (resumido em esqueleto de estilo para caber no prompt)"
+                    elif truncado_modelo:
+                        sufixo = " (trecho truncado para caber no prompt)"
                     st.success(f"Modelo carregado: {nome_modelo}{sufixo}")
                     st.text_area(
                         "Prévia extraída do modelo",
@@ -2482,6 +2881,9 @@ _salvar_snapshot_formulario()
 if "peticao_texto" not in st.session_state:
     st.session_state.peticao_texto = ""
 
+if api_configurada and not gerar:
+    _disparar_pre_geracao(gemini_model, etapa_atual)
+
 if voltar_etapa:
     _definir_etapa_idx(etapa_idx - 1)
     st.rerun()
@@ -2503,30 +2905,68 @@ if gerar:
         st.error(f"Não é possível gerar ainda. Campos principais obrigatórios pendentes:\n{itens}")
     else:
         dados = _coletar_payload()
-        prompt = montar_prompt(dados)
+        prompt, relatorio_prompt = montar_prompt_com_relatorio(dados)
+        assinaturas_prompt = relatorio_prompt["assinaturas"]
+        st.session_state["_relatorio_prompt"] = relatorio_prompt
+        assinaturas_anteriores = st.session_state.get("_prompt_assinaturas")
+        if isinstance(assinaturas_anteriores, dict):
+            alterados = blocos_alterados(assinaturas_anteriores, assinaturas_prompt)
+            st.caption(f"Blocos do prompt alterados desde a ultima geracao: {', '.join(alterados) or 'nenhum'}")
+        st.session_state["_prompt_assinaturas"] = assinaturas_prompt
+
+        rota = _rotear_geracao(dados, gemini_model)
+        modo_geracao, _ = _preparar_funcao_geracao(dados, prompt, gemini_model)
+        chave_geracao = chave_pre_geracao(prompt, gemini_model, modo_geracao)
+        st.session_state["_pre_geracao_consumida"] = chave_geracao
+        chave_pre_gerada = chave_geracao if pre_geracao.existe(chave_geracao) else None
+        if chave_pre_gerada:
+            st.session_state.pop("_pre_geracao_chave", None)
+
+        if _tarefa_geracao_pendente():
+            st.info("Já existe uma geração em andamento; aguarde o resultado abaixo.")
+        else:
+            id_tarefa = obter_fila_geracao().enfileirar(
+                _montar_tarefa_geracao(dados, prompt, rota, chave_pre_gerada),
+                descricao={"modelo": rota["modelo"], "rota": rota["regra"], "modo": modo_geracao.split("|")[0]},
+            )
+            st.session_state["_tarefa_geracao"] = id_tarefa
+            st.query_params["tarefa"] = id_tarefa
 
-        with st.spinner("Gerando a peticao..."):
-            try:
-                texto = gerar_peticao(prompt, model=gemini_model)
-                st.session_state.peticao_texto = texto
-            except GeminiServiceError as exc:
-                st.error(str(exc))
-            except Exception as exc:  # pragma: no cover
-                st.error(f"Erro inesperado ao gerar peticao: {exc}")
+_acompanhar_tarefa_geracao()
 
 if st.session_state.peticao_texto:
-    st.markdown('<div class="preview-bloco">Prévia da petição gerada</div>', unsafe_allow_html=True)
+    indice_peticao = indexar_peticao(st.session_state.peticao_texto)
+    total_preencher = len(indice_peticao["placeholders"])
+    badge_css = "status-warn" if total_preencher else "status-ok"
+    st.markdown(
+        '<div class="preview-bloco">Prévia da petição gerada '
+        f'<span class="hero-chip {badge_css}">[PREENCHER]: {total_preencher}</span> '
+        f'<span class="hero-chip">Pedidos numerados: {len(indice_peticao["pedidos"])}</span></div>',
+        unsafe_allow_html=True,
+    )
+    variantes = st.session_state.get("_variantes_peticao") or []
+    if len(variantes) > 1:
+        _renderizar_variantes(variantes)
+    # O texto atual (versão escolhida, com as seções regeneradas) é o que vai para o .docx e o .pdf.
     st.text_area("Texto gerado", st.session_state.peticao_texto, height=420)
+    if etapa_atual == "Finalização e Geração":
+        _renderizar_regeneracao_secao(gemini_model)
+        _renderizar_relatorio_prompt()
+        _renderizar_saude_api()
+        _renderizar_estatisticas_consultas()
     nome_arquivo_docx = _nome_arquivo_docx(st.session_state.get("autor_nome", ""))
     nome_arquivo_pdf = _nome_arquivo_pdf(st.session_state.get("autor_nome", ""))
 
+    estrutura_peticao = estrutura_do_texto(st.session_state.peticao_texto)
     docx_bytes = texto_para_docx_bytes(
         titulo="PETICAO INICIAL",
         texto=st.session_state.peticao_texto,
+        estrutura=estrutura_peticao,
     )
     pdf_bytes = texto_para_pdf_bytes(
         titulo="PETICAO INICIAL",
         texto=st.session_state.peticao_texto,
+        estrutura=estrutura_peticao,
     )
 
     down1, down2 = st.columns(2)
@@ -2544,3 +2984,8 @@ if st.session_state.peticao_texto:
             file_name=nome_arquivo_pdf,
             mime="application/pdf",
         )
+
+# Sem st.fragment (Streamlit < 1.37), acompanha a geração reexecutando a página inteira.
+if _fragmento is None and _tarefa_geracao_pendente():
+    time.sleep(INTERVALO_ACOMPANHAMENTO_SEGUNDOS)
+    st.rerun()
@@ -1,21 +1,49 @@
 from __future__ import annotations
 
 import io
+from typing import Any
 
-from docx import Document
+from services.secoes_peticao import indexar_peticao, titulo_visivel_secao
 
 
-# Converte título e texto simples em bytes de um arquivo DOCX.
-def texto_para_docx_bytes(titulo: str, texto: str) -> bytes:
-    doc = Document()
-    doc.add_heading(titulo, level=1)
+# Escreve a petição a partir da estrutura (seções, parágrafos e pedidos), sem reinterpretar o texto.
+def _escrever_estrutura(doc: Any, estrutura: dict[str, Any]) -> None:
+    for secao in estrutura.get("secoes", []):
+        if titulo_visivel_secao(secao):
+            doc.add_paragraph().add_run(secao["titulo"]).bold = True
+        for paragrafo in secao.get("paragrafos", []):
+            doc.add_paragraph(paragrafo)
+        for pedido in secao.get("pedidos", []):
+            doc.add_paragraph(pedido, style="List Number")
+        doc.add_paragraph("")
 
-    for linha in texto.splitlines():
+
+# Escreve o texto livre linha a linha, destacando os cabeçalhos de seção encontrados pelo índice.
+def _escrever_texto(doc: Any, texto: str) -> None:
+    indice = indexar_peticao(texto)
+    for idx, (inicio, fim) in enumerate(indice["paragrafos"]):
+        linha = texto[inicio:fim]
         if linha.strip() == "":
             doc.add_paragraph("")
+        elif idx in indice["cabecalhos"]:
+            doc.add_paragraph().add_run(linha.strip()).bold = True
         else:
             doc.add_paragraph(linha)
 
+
+# Converte título e texto simples em bytes de um arquivo DOCX.
+def texto_para_docx_bytes(titulo: str, texto: str, estrutura: dict[str, Any] | None = None) -> bytes:
+    # Importado só no primeiro uso: python-docx/lxml pesam na inicialização do app.
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading(titulo, level=1)
+
+    if estrutura:
+        _escrever_estrutura(doc, estrutura)
+    else:
+        _escrever_texto(doc, texto)
+
     bio = io.BytesIO()
     doc.save(bio)
     return bio.getvalue()
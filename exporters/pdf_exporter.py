@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import textwrap
-from typing import Iterable
+from typing import Any, Iterable
+
+from services.secoes_peticao import indexar_peticao, titulo_visivel_secao
 
 
 def _normalizar_linha_pdf(texto: str) -> str:
@@ -21,9 +23,10 @@ def _escapar_texto_pdf(texto: str) -> str:
 
 
 def _quebrar_linhas(texto: str, largura: int = 95) -> list[str]:
+    conteudo = texto or ""
     linhas: list[str] = []
-    for linha in (texto or "").splitlines():
-        limpa = linha.strip()
+    for inicio, fim in indexar_peticao(conteudo)["paragrafos"]:
+        limpa = conteudo[inicio:fim].strip()
         if not limpa:
             linhas.append("")
             continue
@@ -31,6 +34,29 @@ def _quebrar_linhas(texto: str, largura: int = 95) -> list[str]:
     return linhas
 
 
+def _linhas_estrutura(estrutura: dict[str, Any], largura: int = 95) -> list[str]:
+    # Pedidos numerados com recuo deslocado, para a continuacao alinhar depois do numero.
+    linhas: list[str] = []
+    for secao in estrutura.get("secoes", []):
+        if titulo_visivel_secao(secao):
+            linhas.append(secao["titulo"].strip())
+        for paragrafo in secao.get("paragrafos", []):
+            linhas.extend(textwrap.wrap(paragrafo.strip(), width=largura) or [""])
+            linhas.append("")
+        for idx, pedido in enumerate(secao.get("pedidos", []), start=1):
+            prefixo = f"{idx}. "
+            linhas.extend(
+                textwrap.wrap(
+                    prefixo + pedido.strip(),
+                    width=largura,
+                    subsequent_indent=" " * len(prefixo),
+                )
+            )
+        if linhas and linhas[-1]:
+            linhas.append("")
+    return linhas
+
+
 def _dividir_paginas(linhas: Iterable[str], max_linhas_por_pagina: int = 52) -> list[list[str]]:
     paginas: list[list[str]] = []
     atual: list[str] = []
@@ -73,9 +99,9 @@ def _montar_conteudo_pagina(linhas: list[str], primeira_pagina: bool, titulo: st
     return "\n".join(comandos).encode("latin-1", "replace")
 
 
-def texto_para_pdf_bytes(titulo: str, texto: str) -> bytes:
+def texto_para_pdf_bytes(titulo: str, texto: str, estrutura: dict[str, Any] | None = None) -> bytes:
     titulo_pdf = _normalizar_linha_pdf(titulo or "PETICAO INICIAL")
-    linhas = _quebrar_linhas(texto or "")
+    linhas = _linhas_estrutura(estrutura) if estrutura else _quebrar_linhas(texto or "")
     paginas_linhas = _dividir_paginas(linhas)
 
     objetos: list[bytes | None] = [None]
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.gemini_service import DEFAULT_MODEL  # noqa: E402
+from services.geracao_por_secoes import comparar_tempo_geracao  # noqa: E402
+
+
+ # Compara a geracao em chamada unica com a geracao por secoes paralelas para um caso salvo em JSON.
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara geracao em chamada unica e por secoes paralelas.")
+    parser.add_argument("caso", help="Arquivo JSON com o payload do caso (mesmo formato do app).")
+    parser.add_argument("--modelo", default=DEFAULT_MODEL)
+    args = parser.parse_args(argv)
+
+    with open(args.caso, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+
+    resultado = comparar_tempo_geracao(dados, model=args.modelo)
+    print(f"Chamada unica: {resultado['tempo_chamada_unica']:.2f}s")
+    print(f"Por secoes:    {resultado['tempo_por_secoes']:.2f}s")
+    print(f"Aceleracao:    {resultado['aceleracao']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.enriquecimento_lote import (  # noqa: E402
+    CONCORRENCIA_PADRAO,
+    REQUISICOES_POR_SEGUNDO_PADRAO,
+    enriquecer_casos,
+    gravar_casos,
+    ler_casos,
+)
+
+
+ # Preenche um lote de casos por CNPJ/CEP e lista as faltas (codigo 1 se houver alguma).
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Preenche dados de PJ (por CNPJ) e enderecos (por CEP) de um lote de casos.",
+    )
+    parser.add_argument("entrada", help="arquivo de casos (.json ou .csv)")
+    parser.add_argument("--saida", help="arquivo de saida (padrao: <entrada>.enriquecido.<ext>)")
+    parser.add_argument("--relatorio", help="grava o relatorio em JSON neste arquivo")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA_PADRAO)
+    parser.add_argument(
+        "--por-segundo",
+        type=float,
+        default=REQUISICOES_POR_SEGUNDO_PADRAO,
+        help="limite de chamadas a API por segundo (0 = sem limite)",
+    )
+    parser.add_argument("--sobrescrever", action="store_true", help="substitui campos ja preenchidos")
+    args = parser.parse_args(argv)
+
+    casos, conteudo = ler_casos(args.entrada)
+    relatorio = enriquecer_casos(
+        casos,
+        concorrencia=args.concorrencia,
+        por_segundo=args.por_segundo,
+        sobrescrever=args.sobrescrever,
+    )
+    base, extensao = os.path.splitext(args.entrada)
+    saida = args.saida or f"{base}.enriquecido{extensao}"
+    gravar_casos(saida, casos, conteudo)
+
+    print(
+        f"{relatorio['casos']} casos, {relatorio['documentos_unicos']} documentos unicos "
+        f"({relatorio['consultas_pedidas']} pedidos), {relatorio['partes_preenchidas']} partes preenchidas "
+        f"em {relatorio['duracao_s']:.1f}s -> {saida}"
+    )
+    for falta in relatorio["faltas"]:
+        print(f"  caso {falta['caso']} / {falta['parte']}: {falta['tipo']} {falta['documento']} - {falta['motivo']}")
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    return 1 if relatorio["faltas"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.indice_cep import IndiceCep, gravar_indice, ler_csv_ceps  # noqa: E402
+
+
+ # Gera o indice binario de CEPs a partir de um CSV ou consulta CEPs num indice ja gerado.
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera e consulta o indice local de CEPs.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    importar = subcomandos.add_parser("importar", help="gera o indice a partir de um CSV")
+    importar.add_argument("csv")
+    importar.add_argument("indice")
+    importar.add_argument("--encoding", default="utf-8-sig")
+    buscar = subcomandos.add_parser("buscar", help="consulta CEPs no indice")
+    buscar.add_argument("indice")
+    buscar.add_argument("ceps", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.comando == "importar":
+        inicio = time.perf_counter()
+        total = gravar_indice(ler_csv_ceps(args.csv, encoding=args.encoding), args.indice)
+        tamanho = os.path.getsize(args.indice)
+        print(f"{total} CEPs em {args.indice} ({tamanho / 1024:.0f} KiB) em {time.perf_counter() - inicio:.1f}s")
+        return 0
+
+    indice = IndiceCep(args.indice)
+    for cep in args.ceps:
+        inicio = time.perf_counter()
+        registro = indice.buscar(cep)
+        print(f"{cep}: {registro or 'nao encontrado'} ({(time.perf_counter() - inicio) * 1e6:.0f} us)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.biblioteca_modelos import obter_biblioteca_modelos  # noqa: E402
+
+
+ # Lista os modelos de referencia guardados, do uso mais recente para o mais antigo.
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Lista os modelos de referencia guardados na biblioteca.")
+    parser.add_argument("--limite", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    biblioteca = obter_biblioteca_modelos()
+    print(json.dumps(biblioteca.resumo(), ensure_ascii=False))
+    for item in biblioteca.listar(args.limite):
+        usado = time.strftime("%Y-%m-%d %H:%M", time.localtime(item["usado_em"]))
+        print(f"{item['hash'][:12]}  {usado}  {item['tamanho_texto']:>8} B  {item['nome']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.cache_consultas import obter_cache_consultas  # noqa: E402
+
+
+ # Mostra as estatisticas do cache de consultas e, com --limpar, remove os registros expirados.
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Estatisticas e limpeza do cache de consultas de CNPJ/CEP.")
+    parser.add_argument("--limpar", action="store_true", help="remove registros expirados antes de mostrar")
+    args = parser.parse_args(argv)
+
+    cache = obter_cache_consultas()
+    if args.limpar:
+        print(f"Registros expirados removidos: {cache.limpar_expirados()}")
+    print(json.dumps(cache.estatisticas(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+PACOTES_LOCAIS = ("services", "exporters")
+
+# Módulos que só devem ser carregados no primeiro uso (geração e exportação), nunca na inicialização.
+MODULOS_PESADOS = ("google.genai", "docx", "lxml")
+
+ORCAMENTO_PADRAO_MS = 400.0
+
+_CODIGO_MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+for nome in {modulos!r}:
+    __import__(nome)
+segundos = time.perf_counter() - inicio
+pesados = sorted(nome for nome in sys.modules if nome.split(".")[0] in {raizes!r} and nome.startswith({pesados!r}))
+print(json.dumps({{"segundos": segundos, "pesados": pesados}}))
+"""
+
+
+ # Lista os módulos importados no topo do app.py (mesma ordem), opcionalmente só os pacotes locais.
+def modulos_do_app(caminho: Path, incluir_terceiros: bool = False) -> list[str]:
+    arvore = ast.parse(caminho.read_text(encoding="utf-8-sig"))
+    modulos: list[str] = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            nomes = [alias.name for alias in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            nomes = [no.module]
+        else:
+            continue
+        for nome in nomes:
+            local = nome.split(".")[0] in PACOTES_LOCAIS
+            if nome != "__future__" and (local or incluir_terceiros) and nome not in modulos:
+                modulos.append(nome)
+    return modulos
+
+
+ # Lê a saída de `python -X importtime`: (módulo, self_us, cumulativo_us, profundidade).
+def _ler_importtime(saida: str) -> list[tuple[str, int, int, int]]:
+    linhas: list[tuple[str, int, int, int]] = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        try:
+            proprio, cumulativo, nome = linha.split(":", 1)[1].split("|", 2)
+            recuo = len(nome) - len(nome.lstrip(" "))
+            linhas.append((nome.strip(), int(proprio), int(cumulativo), max(0, (recuo - 1) // 2)))
+        except ValueError:
+            continue
+    return linhas
+
+
+ # Importa os módulos num interpretador novo e retorna tempo total, módulos pesados carregados e ranking.
+def medir(modulos: list[str]) -> dict[str, object]:
+    codigo = _CODIGO_MEDICAO.format(
+        modulos=modulos,
+        raizes=tuple(nome.split(".")[0] for nome in MODULOS_PESADOS),
+        pesados=MODULOS_PESADOS,
+    )
+    ambiente = {**os.environ, "PYTHONPATH": str(RAIZ), "PYTHONDONTWRITEBYTECODE": "1"}
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ,
+        env=ambiente,
+        capture_output=True,
+        text=True,
+    )
+    if processo.returncode != 0:
+        erro = processo.stderr.strip().splitlines()[-1:] or ["erro desconhecido"]
+        raise SystemExit(f"Falha ao importar os modulos do app: {erro[0]}")
+
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    # Descarta o que o interpretador já importa sozinho ao iniciar (site, encodings...).
+    base = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], env=ambiente, capture_output=True, text=True)
+    modulos_base = {linha[0] for linha in _ler_importtime(base.stderr)}
+    ranking = sorted(
+        (linha for linha in _ler_importtime(processo.stderr) if linha[3] == 0 and linha[0] not in modulos_base),
+        key=lambda linha: linha[2],
+        reverse=True,
+    )
+    resultado["ranking"] = ranking
+    return resultado
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo de importacao dos modulos do app.py e verifica o orcamento de inicializacao.",
+    )
+    parser.add_argument(
+        "--orcamento-ms",
+        type=float,
+        default=float(os.getenv("ORCAMENTO_IMPORTACAO_MS", "") or ORCAMENTO_PADRAO_MS),
+        help="tempo maximo de importacao em ms (padrao: ORCAMENTO_IMPORTACAO_MS ou 400)",
+    )
+    parser.add_argument("--todos", action="store_true", help="inclui pacotes de terceiros (streamlit, dotenv)")
+    parser.add_argument("--top", type=int, default=10, help="quantos modulos mostrar no ranking")
+    parser.add_argument("--repeticoes", type=int, default=3, help="medicoes (vale a mediana)")
+    args = parser.parse_args(argv)
+
+    modulos = modulos_do_app(RAIZ / "app.py", incluir_terceiros=args.todos)
+    medicoes = [medir(modulos) for _ in range(max(1, args.repeticoes))]
+    medicoes.sort(key=lambda medicao: medicao["segundos"])
+    mediana = medicoes[len(medicoes) // 2]
+    total_ms = mediana["segundos"] * 1000
+
+    print(f"Modulos importados no topo do app.py: {', '.join(modulos)}")
+    print(f"Tempo de importacao (mediana de {len(medicoes)}): {total_ms:.1f} ms (orcamento {args.orcamento_ms:.0f} ms)")
+    print("\nMaiores custos (cumulativo, ms):")
+    for nome, _, cumulativo, _ in mediana["ranking"][: args.top]:
+        print(f"  {cumulativo / 1000:8.1f}  {nome}")
+
+    falhas: list[str] = []
+    if mediana["pesados"]:
+        falhas.append("modulos pesados carregados na inicializacao: " + ", ".join(mediana["pesados"]))
+    if total_ms > args.orcamento_ms:
+        falhas.append(f"importacao acima do orcamento ({total_ms:.1f} ms > {args.orcamento_ms:.0f} ms)")
+
+    for falha in falhas:
+        print(f"\nFALHA: {falha}")
+    if not falhas:
+        print("\nOK: dentro do orcamento e sem modulos pesados na inicializacao.")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
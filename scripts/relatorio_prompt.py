@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.prompt_builder import montar_prompt_com_relatorio  # noqa: E402
+
+
+ # Imprime o relatorio de montagem do prompt por bloco para um caso salvo em JSON.
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Relatorio de montagem do prompt por bloco.")
+    parser.add_argument("caso", help="Arquivo JSON com o payload do caso (mesmo formato do app).")
+    args = parser.parse_args(argv)
+
+    with open(args.caso, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+
+    _, relatorio = montar_prompt_com_relatorio(dados)
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from services.telemetria import SinkMemoria, ler_eventos_jsonl, resumir_eventos  # noqa: E402
+
+
+ # Resume um arquivo JSONL de telemetria (total, erros, tokens e percentis por modelo).
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Resume a telemetria de chamadas ao LLM gravada em JSONL.")
+    parser.add_argument("arquivo", help="Arquivo JSONL (TELEMETRIA_JSONL).")
+    parser.add_argument("--openmetrics", action="store_true", help="Imprime no formato OpenMetrics.")
+    args = parser.parse_args(argv)
+
+    sink = SinkMemoria(janela=10**6)
+    eventos = ler_eventos_jsonl(args.arquivo)
+    for evento in eventos:
+        sink.registrar(evento)
+
+    if args.openmetrics:
+        print(sink.exportar_openmetrics(), end="")
+        return 0
+
+    por_modelo: dict[str, list[dict[str, Any]]] = {}
+    for evento in eventos:
+        por_modelo.setdefault(str(evento.get("modelo", "")), []).append(evento)
+    saida = {
+        "geral": sink.resumo(),
+        "por_modelo": {modelo: resumir_eventos(lista) for modelo, lista in sorted(por_modelo.items())},
+    }
+    print(json.dumps(saida, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+# Respostas no formato da BrasilAPI para um punhado de documentos; o resto devolve 404.
+CNPJS_EXEMPLO: dict[str, dict[str, Any]] = {
+    "19131243000197": {
+        "cnpj": "19131243000197",
+        "razao_social": "EMPRESA EXEMPLO LTDA",
+        "nome_fantasia": "EXEMPLO",
+        "natureza_juridica": "Sociedade Empresária Limitada",
+        "descricao_tipo_de_logradouro": "AVENIDA",
+        "logradouro": "PAULISTA",
+        "numero": "1000",
+        "complemento": "ANDAR 10",
+        "bairro": "BELA VISTA",
+        "municipio": "SAO PAULO",
+        "uf": "SP",
+        "cep": "01310100",
+        "descricao_situacao_cadastral": "ATIVA",
+        "ddd_telefone_1": "1133334444",
+        "email": "contato@exemplo.com.br",
+        "qsa": [{"nome_socio": "FULANO DE TAL", "nome_representante_legal": ""}],
+    },
+}
+
+CEPS_EXEMPLO: dict[str, dict[str, Any]] = {
+    "01310100": {
+        "cep": "01310100",
+        "state": "SP",
+        "city": "São Paulo",
+        "neighborhood": "Bela Vista",
+        "street": "Avenida Paulista",
+        "service": "local",
+    },
+    "20040002": {
+        "cep": "20040002",
+        "state": "RJ",
+        "city": "Rio de Janeiro",
+        "neighborhood": "Centro",
+        "street": "Rua da Assembleia",
+        "service": "local",
+    },
+}
+
+
+ # Resposta da BrasilAPI: o registro ou 404.
+def _resposta_brasilapi(dados: dict[str, dict[str, Any]], chave: str) -> tuple[int, Any]:
+    registro = dados.get(chave)
+    if registro is None:
+        return 404, {"message": "Não encontrado.", "type": "not_found"}
+    return 200, registro
+
+
+ # Resposta no formato do ViaCEP (200 com {"erro": true} quando não existe).
+def _resposta_viacep(cep: str) -> tuple[int, Any]:
+    registro = CEPS_EXEMPLO.get(cep)
+    if registro is None:
+        return 200, {"erro": True}
+    return 200, {
+        "cep": f"{cep[:5]}-{cep[5:]}",
+        "logradouro": registro["street"],
+        "complemento": "",
+        "bairro": registro["neighborhood"],
+        "localidade": registro["city"],
+        "uf": registro["state"],
+    }
+
+
+ # Resposta no formato da ReceitaWS (200 com {"status": "ERROR"} quando não existe).
+def _resposta_receitaws(cnpj: str) -> tuple[int, Any]:
+    registro = CNPJS_EXEMPLO.get(cnpj)
+    if registro is None:
+        return 200, {"status": "ERROR", "message": "CNPJ inválido"}
+    cep = registro["cep"]
+    telefone = registro["ddd_telefone_1"]
+    return 200, {
+        "status": "OK",
+        "cnpj": f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}",
+        "nome": registro["razao_social"],
+        "fantasia": registro["nome_fantasia"],
+        "natureza_juridica": f"206-2 - {registro['natureza_juridica']}",
+        "logradouro": f"{registro['descricao_tipo_de_logradouro']} {registro['logradouro']}",
+        "numero": registro["numero"],
+        "complemento": registro["complemento"],
+        "bairro": registro["bairro"],
+        "municipio": registro["municipio"],
+        "uf": registro["uf"],
+        "cep": f"{cep[:2]}.{cep[2:5]}-{cep[5:]}",
+        "situacao": registro["descricao_situacao_cadastral"],
+        "telefone": f"({telefone[:2]}) {telefone[2:6]}-{telefone[6:]}",
+        "email": registro["email"],
+        "qsa": [{"nome": socio["nome_socio"], "qual": "49-Sócio-Administrador"} for socio in registro["qsa"]],
+    }
+
+
+# Rotas da BrasilAPI e dos provedores alternativos (ViaCEP e ReceitaWS), todas no mesmo servidor.
+_ROTAS = (
+    (re.compile(r"^/api/cnpj/v1/(\d{14})$"), lambda chave: _resposta_brasilapi(CNPJS_EXEMPLO, chave)),
+    (re.compile(r"^/api/cep/v1/(\d{8})$"), lambda chave: _resposta_brasilapi(CEPS_EXEMPLO, chave)),
+    (re.compile(r"^/ws/(\d{8})/json/?$"), _resposta_viacep),
+    (re.compile(r"^/v1/cnpj/(\d{14})$"), _resposta_receitaws),
+)
+
+
+# Servidor HTTP/1.1 com keep-alive que imita as rotas de CNPJ e CEP da BrasilAPI, do ViaCEP e da ReceitaWS.
+class ServidorBrasilApiLocal(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        porta: int = 0,
+        atraso: float = 0.0,
+        taxa_erro: float = 0.0,
+        tempo_ocioso: float | None = None,
+    ) -> None:
+        super().__init__(("127.0.0.1", porta), _Manipulador)
+        self.atraso = atraso
+        self.taxa_erro = taxa_erro
+        self.tempo_ocioso = tempo_ocioso
+        self.conexoes = 0
+        self.requisicoes = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: ServidorBrasilApiLocal
+
+    def setup(self) -> None:
+        # Como servidores reais, fecha a conexão keep-alive que passar de `tempo_ocioso` sem requisição.
+        self.timeout = self.server.tempo_ocioso
+        super().setup()
+        with self.server.lock:
+            self.server.conexoes += 1
+
+    def log_message(self, formato: str, *args: Any) -> None:
+        return
+
+    def _responder(self, status: int, dados: Any) -> None:
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.requisicoes += 1
+        if self.path == "/__estatisticas":
+            self._responder(200, {"conexoes": self.server.conexoes, "requisicoes": self.server.requisicoes})
+            return
+
+        if self.server.atraso:
+            time.sleep(self.server.atraso)
+        if self.server.taxa_erro and random.random() < self.server.taxa_erro:
+            self._responder(503, {"message": "Falha simulada."})
+            return
+
+        for padrao, responder in _ROTAS:
+            encontrado = padrao.match(self.path)
+            if encontrado:
+                self._responder(*responder(encontrado.group(1)))
+                return
+        self._responder(404, {"message": "Rota inexistente."})
+
+
+ # Sobe o servidor numa thread em segundo plano e o retorna (porta 0 = porta livre qualquer).
+def iniciar_em_segundo_plano(
+    porta: int = 0,
+    atraso: float = 0.0,
+    taxa_erro: float = 0.0,
+    tempo_ocioso: float | None = None,
+) -> ServidorBrasilApiLocal:
+    servidor = ServidorBrasilApiLocal(porta=porta, atraso=atraso, taxa_erro=taxa_erro, tempo_ocioso=tempo_ocioso)
+    threading.Thread(target=servidor.serve_forever, name="brasilapi-local", daemon=True).start()
+    return servidor
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Servidor local que imita a BrasilAPI, o ViaCEP e a ReceitaWS para testes sem rede.",
+    )
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--atraso", type=float, default=0.0, help="atraso por resposta, em segundos")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="probabilidade de HTTP 503")
+    parser.add_argument(
+        "--tempo-ocioso", type=float, default=None, help="fecha conexões keep-alive ociosas após N segundos"
+    )
+    args = parser.parse_args(argv)
+
+    servidor = ServidorBrasilApiLocal(
+        porta=args.porta, atraso=args.atraso, taxa_erro=args.taxa_erro, tempo_ocioso=args.tempo_ocioso
+    )
+    print(
+        f"BrasilAPI local em {servidor.url} (use BRASILAPI_BASE_URL, VIACEP_BASE_URL e "
+        f"RECEITAWS_BASE_URL={servidor.url})"
+    )
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any
+
+from services.comum import ConexoesSqlite, float_ambiente
+
+TAMANHO_BLOCO_HASH = 1 << 20
+LIMITE_BYTES_PADRAO = 50 * 1024 * 1024
+LIMITE_ITENS_PADRAO = 200
+
+logger = logging.getLogger(__name__)
+
+# A tabela antiga "modelos" guardava o texto já comprimido/anonimizado para o prompt; como esse
+# preparo muda entre versões, ela é descartada e só o texto extraído (normalizado) é guardado.
+_ESQUEMA = """
+DROP TABLE IF EXISTS modelos;
+CREATE TABLE IF NOT EXISTS modelos_extraidos (
+    hash TEXT PRIMARY KEY,
+    nome TEXT NOT NULL,
+    texto TEXT NOT NULL,
+    tamanho_original INTEGER NOT NULL,
+    tamanho_texto INTEGER NOT NULL,
+    criado_em REAL NOT NULL,
+    usado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS modelos_extraidos_usado_em ON modelos_extraidos (usado_em);
+"""
+
+
+ # SHA-256 do conteúdo do upload lido em blocos, sem copiar o arquivo inteiro.
+def hash_conteudo(arquivo: Any) -> str:
+    """
+    Usa `getbuffer()` (memoryview sobre o buffer do BytesIO/UploadedFile) quando existir; senão lê
+    o arquivo em blocos de `TAMANHO_BLOCO_HASH` e volta a posição para o início.
+    """
+    resumo = hashlib.sha256()
+    obter_buffer = getattr(arquivo, "getbuffer", None)
+    if obter_buffer is not None:
+        with obter_buffer() as visao:
+            for inicio in range(0, len(visao), TAMANHO_BLOCO_HASH):
+                resumo.update(visao[inicio:inicio + TAMANHO_BLOCO_HASH])
+        return resumo.hexdigest()
+
+    arquivo.seek(0)
+    while True:
+        bloco = arquivo.read(TAMANHO_BLOCO_HASH)
+        if not bloco:
+            break
+        resumo.update(bloco)
+    arquivo.seek(0)
+    return resumo.hexdigest()
+
+
+# Biblioteca de modelos de referência já extraídos, endereçada pelo hash do arquivo enviado.
+class BibliotecaModelos:
+    """
+    Guarda uma vez, em SQLite compartilhado entre sessões e processos, o texto extraído e
+    normalizado de cada arquivo de modelo. O mesmo arquivo enviado por outra pessoa do escritório
+    não é extraído de novo; a compressão e o limite para o prompt são aplicados por quem lê, para
+    mudanças nesse preparo valerem também para os modelos já guardados. Acima de `limite_bytes` de texto ou
+    `limite_itens` modelos, saem os usados há mais tempo. Se o banco não puder ser aberto, a
+    biblioteca fica vazia e cada envio é extraído normalmente.
+    """
+
+    def __init__(
+        self,
+        caminho: str,
+        limite_bytes: int = LIMITE_BYTES_PADRAO,
+        limite_itens: int = LIMITE_ITENS_PADRAO,
+    ) -> None:
+        self._limite_bytes = limite_bytes
+        self._limite_itens = limite_itens
+        self._conexoes = ConexoesSqlite(caminho, _ESQUEMA, "Biblioteca de modelos")
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._faltas = 0
+
+    # Retorna o modelo guardado (nome e texto extraído) e marca o uso, ou None.
+    def obter(self, hash_modelo: str) -> dict[str, Any] | None:
+        conexao = self._conexoes.obter()
+        registro = None
+        if conexao is not None:
+            try:
+                linha = conexao.execute(
+                    "SELECT nome, texto FROM modelos_extraidos WHERE hash = ?", (hash_modelo,)
+                ).fetchone()
+                if linha is not None:
+                    conexao.execute(
+                        "UPDATE modelos_extraidos SET usado_em = ? WHERE hash = ?", (time.time(), hash_modelo)
+                    )
+                    nome, texto = linha
+                    registro = {"hash": hash_modelo, "nome": nome, "texto": texto}
+            except sqlite3.Error as exc:
+                logger.warning("Falha ao ler a biblioteca de modelos: %s", exc)
+        with self._lock:
+            if registro is None:
+                self._faltas += 1
+            else:
+                self._acertos += 1
+        return registro
+
+    # Guarda o texto extraído do modelo (o primeiro nome enviado fica) e aplica o limite de tamanho.
+    def guardar(self, hash_modelo: str, nome: str, texto: str, tamanho_original: int) -> None:
+        conexao = self._conexoes.obter()
+        if conexao is None:
+            return
+        agora = time.time()
+        try:
+            conexao.execute(
+                "INSERT INTO modelos_extraidos (hash, nome, texto, tamanho_original, tamanho_texto, "
+                "criado_em, usado_em) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET usado_em = excluded.usado_em",
+                (
+                    hash_modelo,
+                    nome,
+                    texto,
+                    tamanho_original,
+                    len(texto.encode("utf-8")),
+                    agora,
+                    agora,
+                ),
+            )
+            self._despejar(conexao)
+        except sqlite3.Error as exc:
+            logger.warning("Falha ao gravar na biblioteca de modelos: %s", exc)
+
+    # Remove os modelos usados há mais tempo até caber nos limites de itens e de bytes.
+    def _despejar(self, conexao: sqlite3.Connection) -> None:
+        itens, total = conexao.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamanho_texto), 0) FROM modelos_extraidos"
+        ).fetchone()
+        if itens <= self._limite_itens and total <= self._limite_bytes:
+            return
+        removidos: list[str] = []
+        for hash_modelo, tamanho in conexao.execute("SELECT hash, tamanho_texto FROM modelos_extraidos ORDER BY usado_em"):
+            # O mais recente nunca sai, mesmo sozinho acima do limite.
+            if itens <= 1 or (itens <= self._limite_itens and total <= self._limite_bytes):
+                break
+            removidos.append(hash_modelo)
+            itens -= 1
+            total -= tamanho
+        conexao.executemany("DELETE FROM modelos_extraidos WHERE hash = ?", [(hash_modelo,) for hash_modelo in removidos])
+
+    # Lista os modelos guardados, do uso mais recente para o mais antigo (sem o texto).
+    def listar(self, limite: int = 50) -> list[dict[str, Any]]:
+        conexao = self._conexoes.obter()
+        if conexao is None:
+            return []
+        try:
+            linhas = conexao.execute(
+                "SELECT hash, nome, tamanho_original, tamanho_texto, usado_em "
+                "FROM modelos_extraidos ORDER BY usado_em DESC LIMIT ?",
+                (limite,),
+            ).fetchall()
+        except sqlite3.Error as exc:
+            logger.warning("Falha ao listar a biblioteca de modelos: %s", exc)
+            return []
+        return [
+            {
+                "hash": hash_modelo,
+                "nome": nome,
+                "tamanho_original": tamanho_original,
+                "tamanho_texto": tamanho_texto,
+                "usado_em": usado_em,
+            }
+            for hash_modelo, nome, tamanho_original, tamanho_texto, usado_em in linhas
+        ]
+
+    # Contadores: modelos e bytes guardados (todas as sessões) e acertos/faltas neste processo.
+    def resumo(self) -> dict[str, Any]:
+        conexao = self._conexoes.obter()
+        itens, total = 0, 0
+        if conexao is not None:
+            try:
+                itens, total = conexao.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(tamanho_texto), 0) FROM modelos_extraidos"
+                ).fetchone()
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            return {"modelos": itens, "bytes_texto": total, "acertos": self._acertos, "faltas": self._faltas}
+
+
+_biblioteca: BibliotecaModelos | None = None
+_biblioteca_lock = threading.Lock()
+
+
+ # Retorna a biblioteca configurada pelo ambiente (BIBLIOTECA_MODELOS_DB, _MAX_MB e _MAX_ITENS).
+def obter_biblioteca_modelos() -> BibliotecaModelos:
+    global _biblioteca
+    with _biblioteca_lock:
+        if _biblioteca is None:
+            caminho = os.getenv("BIBLIOTECA_MODELOS_DB") or os.path.join(tempfile.gettempdir(), "peticao_modelos.sqlite3")
+            limite_mb = float_ambiente("BIBLIOTECA_MODELOS_MAX_MB", LIMITE_BYTES_PADRAO / (1024 * 1024))
+            _biblioteca = BibliotecaModelos(
+                caminho,
+                limite_bytes=int(limite_mb * 1024 * 1024),
+                limite_itens=int(float_ambiente("BIBLIOTECA_MODELOS_MAX_ITENS", LIMITE_ITENS_PADRAO)),
+            )
+        return _biblioteca
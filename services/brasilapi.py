@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import queue
+import re
+import threading
+from typing import Any
+from urllib.parse import urlsplit
+
+from services.comum import float_ambiente
+
+BRASILAPI_URL_PADRAO = "https://brasilapi.com.br"
+TAMANHO_POOL_PADRAO = 4
+TIMEOUT_CONEXAO_PADRAO = 3.0
+TIMEOUT_LEITURA_PADRAO = 10.0
+USER_AGENT = "streamlit-app/1.0"
+
+
+# Falha de consulta com o status HTTP (quando houver), para diferenciar "não encontrado" de indisponibilidade.
+class ErroConsulta(ValueError):
+    """Raised when a BrasilAPI lookup fails; `status` holds the HTTP status, if any."""
+
+    def __init__(self, mensagem: str, status: int | None = None) -> None:
+        super().__init__(mensagem)
+        self.status = status
+
+
+# Cliente HTTP com pool de conexões keep-alive para um único host, seguro entre threads.
+class ClienteHttpPool:
+    """
+    Mantém até `tamanho_pool` conexões abertas e reaproveitadas entre requisições; quando todas
+    estão em uso, a chamada espera uma ficar livre. O timeout de conexão vale para abrir o socket
+    (TCP + TLS) e o de leitura para cada leitura da resposta. Uma conexão reaproveitada que o
+    servidor já tenha fechado é descartada e a requisição (GET, idempotente) é refeita uma vez.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        tamanho_pool: int = TAMANHO_POOL_PADRAO,
+        timeout_conexao: float = TIMEOUT_CONEXAO_PADRAO,
+        timeout_leitura: float = TIMEOUT_LEITURA_PADRAO,
+    ) -> None:
+        partes = urlsplit(base_url)
+        if partes.scheme not in ("http", "https") or not partes.hostname:
+            raise ValueError(f"URL base invalida: {base_url!r}")
+        self._https = partes.scheme == "https"
+        self._host = partes.hostname
+        self._porta = partes.port
+        self._prefixo = partes.path.rstrip("/")
+        self._timeout_conexao = timeout_conexao
+        self._timeout_leitura = timeout_leitura
+        self._livres: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(max(1, tamanho_pool))
+        self._lock = threading.Lock()
+        self._conexoes_abertas = 0
+        self._requisicoes = 0
+
+    # Abre uma conexão nova com timeout de conexão e passa o socket para o timeout de leitura.
+    def _nova_conexao(self) -> http.client.HTTPConnection:
+        classe = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        conexao = classe(self._host, self._porta, timeout=self._timeout_conexao)
+        conexao.connect()
+        if conexao.sock is not None:
+            conexao.sock.settimeout(self._timeout_leitura)
+        with self._lock:
+            self._conexoes_abertas += 1
+        return conexao
+
+    # Faz um GET e retorna (status, corpo); erros de rede e timeout sobem como OSError/TimeoutError.
+    def get(self, caminho: str) -> tuple[int, bytes]:
+        cabecalhos = {"User-Agent": USER_AGENT, "Accept": "application/json", "Connection": "keep-alive"}
+        with self._vagas:
+            for tentativa in range(2):
+                try:
+                    conexao, reaproveitada = self._livres.get_nowait(), True
+                except queue.Empty:
+                    conexao, reaproveitada = self._nova_conexao(), False
+
+                try:
+                    conexao.request("GET", f"{self._prefixo}{caminho}", headers=cabecalhos)
+                    resposta = conexao.getresponse()
+                    corpo = resposta.read()
+                except (http.client.HTTPException, OSError):
+                    conexao.close()
+                    if reaproveitada and tentativa == 0:
+                        continue
+                    raise
+
+                with self._lock:
+                    self._requisicoes += 1
+                if resposta.will_close:
+                    conexao.close()
+                else:
+                    self._livres.put(conexao)
+                return resposta.status, corpo
+        raise OSError("Falha ao reutilizar a conexao.")  # pragma: no cover
+
+    # Fecha as conexões ociosas do pool.
+    def fechar(self) -> None:
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # Contadores do pool: conexões abertas desde o início, requisições e conexões ociosas.
+    def resumo(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "conexoes_abertas": self._conexoes_abertas,
+                "requisicoes": self._requisicoes,
+                "ociosas": self._livres.qsize(),
+            }
+
+
+_cliente: ClienteHttpPool | None = None
+_cliente_lock = threading.Lock()
+
+
+ # Retorna o cliente compartilhado da BrasilAPI (BRASILAPI_BASE_URL e BRASILAPI_* do ambiente).
+def obter_cliente_brasilapi() -> ClienteHttpPool:
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = ClienteHttpPool(
+                (os.getenv("BRASILAPI_BASE_URL") or BRASILAPI_URL_PADRAO).strip(),
+                tamanho_pool=int(float_ambiente("BRASILAPI_POOL", TAMANHO_POOL_PADRAO)),
+                timeout_conexao=float_ambiente("BRASILAPI_TIMEOUT_CONEXAO", TIMEOUT_CONEXAO_PADRAO),
+                timeout_leitura=float_ambiente("BRASILAPI_TIMEOUT_LEITURA", TIMEOUT_LEITURA_PADRAO),
+            )
+        return _cliente
+
+
+ # Faz o GET (na BrasilAPI, se `cliente` não for dado) e decodifica o JSON, traduzindo falhas nas mensagens de cada tipo de consulta.
+def consultar_json(caminho: str, mensagens: dict[str, str], cliente: ClienteHttpPool | None = None) -> dict[str, Any]:
+    try:
+        status, corpo = (cliente or obter_cliente_brasilapi()).get(caminho)
+    except TimeoutError as exc:
+        raise ErroConsulta(mensagens["timeout"]) from exc
+    except (http.client.HTTPException, OSError) as exc:
+        raise ErroConsulta(mensagens["conexao"]) from exc
+
+    if status == 404:
+        raise ErroConsulta(mensagens["nao_encontrado"], status=status)
+    if status >= 400:
+        raise ErroConsulta(mensagens["http"].format(status=status), status=status)
+
+    try:
+        dados_api = json.loads(corpo.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ErroConsulta(mensagens["invalida"]) from exc
+    if not isinstance(dados_api, dict):
+        raise ErroConsulta(mensagens["invalida"])
+    return dados_api
+
+
+ # Consulta dados públicos de CNPJ na BrasilAPI.
+def consultar_cnpj(cnpj_digitos: str) -> dict[str, Any]:
+    digitos = re.sub(r"\D", "", cnpj_digitos or "")
+    if len(digitos) != 14:
+        raise ErroConsulta("Informe um CNPJ com 14 dígitos para consulta.")
+
+    return consultar_json(
+        f"/api/cnpj/v1/{digitos}",
+        {
+            "nao_encontrado": "CNPJ não encontrado na BrasilAPI.",
+            "http": "Falha ao consultar CNPJ na BrasilAPI (HTTP {status}).",
+            "conexao": "Não foi possível conectar à BrasilAPI.",
+            "timeout": "Tempo esgotado na consulta do CNPJ.",
+            "invalida": "Resposta inválida da BrasilAPI.",
+        },
+    )
+
+
+ # Consulta dados públicos de CEP na BrasilAPI.
+def consultar_cep(cep_digitos: str) -> dict[str, Any]:
+    digitos = re.sub(r"\D", "", cep_digitos or "")
+    if len(digitos) != 8:
+        raise ErroConsulta("Informe um CEP com 8 dígitos para consulta.")
+
+    return consultar_json(
+        f"/api/cep/v1/{digitos}",
+        {
+            "nao_encontrado": "CEP não encontrado na BrasilAPI.",
+            "http": "Falha ao consultar CEP na BrasilAPI (HTTP {status}).",
+            "conexao": "Não foi possível conectar à BrasilAPI para consulta de CEP.",
+            "timeout": "Tempo esgotado na consulta do CEP.",
+            "invalida": "Resposta inválida da BrasilAPI para CEP.",
+        },
+    )
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+
+from services.brasilapi import ErroConsulta
+from services.comum import ConexoesSqlite, float_ambiente
+
+TTL_CEP_PADRAO = 30 * 24 * 3600.0
+TTL_CNPJ_PADRAO = 24 * 3600.0
+TTL_NEGATIVO_PADRAO = 6 * 3600.0
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS consultas (
+    tipo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    dados TEXT,
+    mensagem TEXT,
+    expira_em REAL NOT NULL,
+    PRIMARY KEY (tipo, chave)
+);
+CREATE TABLE IF NOT EXISTS estatisticas (
+    tipo TEXT PRIMARY KEY,
+    acertos INTEGER NOT NULL DEFAULT 0,
+    negativos INTEGER NOT NULL DEFAULT 0,
+    faltas INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+# Cache de consultas de CNPJ/CEP em SQLite, compartilhado entre processos da mesma máquina (ou volume).
+class CacheConsultas:
+    """
+    Guarda respostas positivas com TTL por tipo (CEP muda pouco, CNPJ mais) e respostas
+    "não encontrado" (HTTP 404) com TTL próprio, para um documento digitado errado não voltar à
+    API a cada clique. Outras falhas (rede, 5xx) não são guardadas. Se o banco não puder ser
+    aberto, o cache vira passagem direta para a consulta, com aviso no log.
+    """
+
+    def __init__(
+        self,
+        caminho: str,
+        ttls: dict[str, float] | None = None,
+        ttl_negativo: float = TTL_NEGATIVO_PADRAO,
+    ) -> None:
+        self._ttls = {"cep": TTL_CEP_PADRAO, "cnpj": TTL_CNPJ_PADRAO, **(ttls or {})}
+        self._ttl_negativo = ttl_negativo
+        self._conexoes = ConexoesSqlite(caminho, _ESQUEMA, "Cache de consultas")
+
+    # Soma um contador de estatística do tipo (acertos, negativos ou faltas); falha de escrita
+    # (ex.: banco travado por outro processo) só gera aviso, sem afetar a consulta.
+    def _contar(self, conexao: sqlite3.Connection, tipo: str, campo: str) -> None:
+        try:
+            conexao.execute(
+                f"INSERT INTO estatisticas (tipo, {campo}) VALUES (?, 1) "
+                f"ON CONFLICT(tipo) DO UPDATE SET {campo} = {campo} + 1",
+                (tipo,),
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Falha ao atualizar as estatisticas do cache de consultas: %s", exc)
+
+    # Retorna a resposta guardada (dados ou erro 404) ou consulta, guarda e retorna.
+    def obter_ou_consultar(self, tipo: str, chave: str, consultar: Callable[[str], dict[str, Any]]) -> dict[str, Any]:
+        conexao = self._conexoes.obter()
+        if conexao is None:
+            return consultar(chave)
+
+        try:
+            linha = conexao.execute(
+                "SELECT status, dados, mensagem FROM consultas WHERE tipo = ? AND chave = ? AND expira_em > ?",
+                (tipo, chave, time.time()),
+            ).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("Falha ao ler o cache de consultas: %s", exc)
+            return consultar(chave)
+
+        if linha is not None:
+            status, dados, mensagem = linha
+            if status == 200:
+                self._contar(conexao, tipo, "acertos")
+                return json.loads(dados)
+            self._contar(conexao, tipo, "negativos")
+            raise ErroConsulta(mensagem or "Registro não encontrado.", status=status)
+        self._contar(conexao, tipo, "faltas")
+
+        try:
+            dados_api = consultar(chave)
+        except ErroConsulta as exc:
+            if exc.status == 404:
+                self._gravar(conexao, tipo, chave, 404, None, str(exc), self._ttl_negativo)
+            raise
+        dados = json.dumps(dados_api, ensure_ascii=False)
+        self._gravar(conexao, tipo, chave, 200, dados, None, self._ttls.get(tipo, TTL_CNPJ_PADRAO))
+        return dados_api
+
+    # Grava (ou substitui) a resposta com o prazo de validade; falha de escrita só gera aviso no log.
+    def _gravar(
+        self,
+        conexao: sqlite3.Connection,
+        tipo: str,
+        chave: str,
+        status: int,
+        dados: str | None,
+        mensagem: str | None,
+        ttl: float,
+    ) -> None:
+        try:
+            conexao.execute(
+                "INSERT OR REPLACE INTO consultas (tipo, chave, status, dados, mensagem, expira_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tipo, chave, status, dados, mensagem, time.time() + ttl),
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Falha ao gravar no cache de consultas: %s", exc)
+
+    # Estatísticas acumuladas por tipo (todas as instâncias que usam o mesmo arquivo).
+    def estatisticas(self) -> dict[str, dict[str, Any]]:
+        conexao = self._conexoes.obter()
+        if conexao is None:
+            return {}
+        resultado: dict[str, dict[str, Any]] = {}
+        for tipo, acertos, negativos, faltas in conexao.execute(
+            "SELECT tipo, acertos, negativos, faltas FROM estatisticas ORDER BY tipo"
+        ):
+            total = acertos + negativos + faltas
+            resultado[tipo] = {
+                "acertos": acertos,
+                "negativos": negativos,
+                "faltas": faltas,
+                "taxa_acerto": (acertos + negativos) / total if total else 0.0,
+            }
+        registros = conexao.execute(
+            "SELECT tipo, COUNT(*) FROM consultas WHERE expira_em > ? GROUP BY tipo", (time.time(),)
+        ).fetchall()
+        for tipo, quantidade in registros:
+            resultado.setdefault(tipo, {"acertos": 0, "negativos": 0, "faltas": 0, "taxa_acerto": 0.0})
+            resultado[tipo]["registros"] = quantidade
+        return resultado
+
+    # Remove registros expirados e retorna quantos saíram.
+    def limpar_expirados(self) -> int:
+        conexao = self._conexoes.obter()
+        if conexao is None:
+            return 0
+        return conexao.execute("DELETE FROM consultas WHERE expira_em <= ?", (time.time(),)).rowcount
+
+
+_cache: CacheConsultas | None = None
+_cache_lock = threading.Lock()
+
+
+ # Retorna o cache configurado pelo ambiente (CACHE_CONSULTAS_DB e TTLs em segundos).
+def obter_cache_consultas() -> CacheConsultas:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            caminho = os.getenv("CACHE_CONSULTAS_DB") or os.path.join(tempfile.gettempdir(), "peticao_consultas.sqlite3")
+            _cache = CacheConsultas(
+                caminho,
+                ttls={
+                    "cep": float_ambiente("CACHE_TTL_CEP", TTL_CEP_PADRAO),
+                    "cnpj": float_ambiente("CACHE_TTL_CNPJ", TTL_CNPJ_PADRAO),
+                },
+                ttl_negativo=float_ambiente("CACHE_TTL_NEGATIVO", TTL_NEGATIVO_PADRAO),
+            )
+        return _cache
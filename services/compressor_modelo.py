@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+
+FRASES_POR_SECAO = 2
+LIMITE_CARACTERES_FRASE = 220
+LIMITE_CARACTERES_TITULO = 90
+ITENS_LISTA_POR_SECAO = 2
+
+PALAVRAS_NAO_NOME = {
+    "excelentissimo", "excelentissima", "senhor", "senhora", "doutor", "doutora", "juiz", "juiza",
+    "direito", "vara", "federal", "justica", "juizado", "especial", "civel", "civil", "codigo",
+    "processo", "processual", "lei", "constituicao", "tribunal", "estado", "municipio", "uniao",
+    "ministerio", "publico", "publica", "comarca", "fazenda", "previdencia", "social", "instituto",
+    "nacional", "seguro", "termos", "nestes", "pede", "deferimento", "peticao", "inicial", "acao",
+    "autor", "autora", "reu", "re", "requerente", "requerido", "requerida", "supremo", "superior",
+    "regional", "defensoria", "cpc", "cdc", "inss", "sus", "ans", "oab", "cnpj", "cpf", "rg",
+}
+
+# Vocabulario comum de titulos de peticao: em caixa alta, nao deve ser confundido com nome proprio.
+PALAVRAS_TITULO = {
+    "fato", "fatos", "direitos", "pedido", "pedidos", "preliminar", "preliminares", "merito", "prova",
+    "provas", "tutela", "urgencia", "antecipada", "evidencia", "gratuidade", "valor", "causa", "competencia",
+    "legitimidade", "conclusao", "requerimento", "requerimentos", "fundamento", "fundamentos", "juridico",
+    "juridicos", "juridica", "dano", "danos", "moral", "morais", "material", "materiais", "responsabilidade",
+    "objetiva", "civil", "consumidor", "relacao", "consumo", "inversao", "onus", "audiencia", "conciliacao",
+    "qualificacao", "partes", "sintese", "breve", "exposicao", "documentos", "citacao", "intimacao",
+    "beneficio", "aposentadoria", "auxilio", "incapacidade", "trabalho", "verbas", "rescisorias", "horas",
+    "extras", "prescricao", "decadencia", "pretensao", "jurisprudencia", "legislacao", "aplicavel",
+    "cabimento", "sentenca", "decisao", "obrigacao", "fazer", "indenizacao", "restituicao", "repeticao",
+    "indebito", "cobranca", "liminar", "medida", "cautelar", "pericia", "saude", "plano", "tratamento",
+    "negativa", "cobertura", "contrato", "clausula", "abusiva", "nulidade", "revisao", "juros", "honorarios",
+    "custas", "advocaticios", "inicial", "dispositivo", "dispositivos", "cpc", "oab",
+}
+
+CONECTORES_NOME = {"da", "de", "do", "das", "dos", "e"}
+
+_PADRAO_TITULO_NUMERADO = re.compile(
+    r"^\s*(?:[IVXLC]+|\d{1,2}(?:\.\d{1,2})*)\s*[\.\)\-–—]\s*\S"
+)
+_PADRAO_ITEM_LISTA = re.compile(r"^\s*(?:[a-z]|\d{1,3})\s*[\.\)\-]\s+\S|^\s*[-*•]\s+\S")
+_PADRAO_FIM_FRASE = re.compile(r"(?<=[\.!?;:])\s+")
+_PADRAO_FECHAMENTO = re.compile(r"^\s*(?:termos em que|nestes termos)", re.IGNORECASE)
+
+_SUBSTITUICOES_DADOS: list[tuple[re.Pattern[str], str]] = [
+    (re.compile(r"[\w\.\-+]+@[\w\-]+(?:\.[\w\-]+)+"), "[EMAIL]"),
+    (re.compile(r"\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b"), "[CNPJ]"),
+    (re.compile(r"\b\d{3}\.\d{3}\.\d{3}-\d{2}\b"), "[CPF]"),
+    (re.compile(r"R\$\s*[\d\.]+(?:,\d{2})?"), "[VALOR]"),
+    (re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"), "[DATA]"),
+    (re.compile(r"\b\d{5}-\d{3}\b"), "[CEP]"),
+    (re.compile(r"(?<!\w)\d(?:[\d\.\-/]*\d)?[ªº°]?(?!\w)"), "[NUMERO]"),
+]
+
+# Cidade apos "Comarca de" (enderecamento), mesmo com uma so palavra ("COMARCA DE CAMPINAS").
+_PADRAO_COMARCA = re.compile(
+    r"((?i:comarca)\s+(?:(?i:d[aeo]s?)\s+)?)[A-ZÀ-Ý][\wÀ-ÿ'\-]*(?:\s+(?:(?i:d[aeo]s?)\s+)?[A-ZÀ-Ý][\wÀ-ÿ'\-]*)*"
+)
+# Numeracao no inicio de titulos e itens ("1.", "II -", "a)"): faz parte do estilo e e mantida.
+_PADRAO_NUMERACAO = re.compile(
+    r"^\s*(?:[IVXLC]+|\d{1,2}(?:\.\d{1,2})*|[a-z])\s*[\.\)\-–—]\s+|^\s*[-*•]\s+"
+)
+_PADRAO_PALAVRA = re.compile(r"[^\W\d_]+(?:[-'][^\W\d_]+)*")
+
+
+ # Remove acentos e normaliza caixa para comparacoes tolerantes.
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return texto.encode("ascii", "ignore").decode("ascii").strip().lower()
+
+
+ # Indica se a linha parece um titulo de secao (caixa alta curta ou numeracao de secao).
+def _eh_titulo(linha: str) -> bool:
+    texto = linha.strip()
+    if not texto or len(texto) > LIMITE_CARACTERES_TITULO:
+        return False
+    if _PADRAO_FECHAMENTO.match(texto):
+        return True
+
+    letras = [caractere for caractere in texto if caractere.isalpha()]
+    if len(letras) < 3:
+        return False
+
+    maiusculas = sum(1 for caractere in letras if caractere.isupper())
+    if maiusculas / len(letras) >= 0.8:
+        return True
+
+    return bool(_PADRAO_TITULO_NUMERADO.match(texto)) and not texto.endswith((".", ";", ","))
+
+
+ # Substitui nomes proprios (sequencias de palavras capitalizadas) por [NOME].
+def _anonimizar_nomes(texto: str) -> str:
+    tokens = list(_PADRAO_PALAVRA.finditer(texto))
+    trechos: list[tuple[int, int]] = []
+    idx = 0
+    while idx < len(tokens):
+        inicio = idx
+        capitalizadas = 0
+        fim = idx
+        while fim < len(tokens):
+            palavra = tokens[fim].group(0)
+            if fim > inicio and texto[tokens[fim - 1].end():tokens[fim].start()].strip():
+                break
+            normalizada = _normalizar(palavra)
+            # Conectores (inclusive em caixa alta: "DE", "DOS") so ligam partes de um nome, nunca o iniciam.
+            if normalizada in CONECTORES_NOME:
+                if capitalizadas and fim + 1 < len(tokens):
+                    fim += 1
+                    continue
+                break
+            if (
+                palavra[:1].isupper()
+                and len(palavra) > 1
+                and normalizada not in PALAVRAS_NAO_NOME
+                and normalizada not in PALAVRAS_TITULO
+            ):
+                capitalizadas += 1
+                fim += 1
+                continue
+            break
+
+        while fim > inicio and tokens[fim - 1].group(0).lower() in CONECTORES_NOME:
+            fim -= 1
+
+        if capitalizadas >= 2:
+            trechos.append((tokens[inicio].start(), tokens[fim - 1].end()))
+            idx = fim
+        else:
+            idx = inicio + 1
+
+    for inicio, fim in reversed(trechos):
+        texto = f"{texto[:inicio]}[NOME]{texto[fim:]}"
+    return texto
+
+
+ # Substitui documentos, valores, datas e demais numeros por marcadores genericos.
+def _anonimizar_numeros(texto: str) -> str:
+    resultado = texto or ""
+    for padrao, marcador in _SUBSTITUICOES_DADOS:
+        resultado = padrao.sub(marcador, resultado)
+    return resultado
+
+
+ # Remove dados concretos (nomes, documentos, valores, datas e numeros) de um trecho.
+def anonimizar_trecho(texto: str) -> str:
+    return _anonimizar_nomes(_PADRAO_COMARCA.sub(r"\1[CIDADE]", _anonimizar_numeros(texto)))
+
+
+ # Anonimiza titulo ou item de lista mantendo a numeracao inicial ("1.", "II -", "a)").
+def _anonimizar_com_numeracao(texto: str) -> str:
+    numeracao = _PADRAO_NUMERACAO.match(texto or "")
+    if not numeracao:
+        return anonimizar_trecho(texto)
+    return numeracao.group(0) + anonimizar_trecho(texto[numeracao.end():])
+
+
+ # Corta texto no limite informado preservando palavras inteiras.
+def _encurtar(texto: str, limite: int) -> str:
+    if len(texto) <= limite:
+        return texto
+    return texto[:limite].rsplit(" ", 1)[0].rstrip(" ,;:") + "..."
+
+
+ # Separa o documento em secoes (titulo, linhas de conteudo) na ordem original.
+def dividir_secoes_modelo(texto: str) -> list[tuple[str, list[str]]]:
+    secoes: list[tuple[str, list[str]]] = [("", [])]
+    for linha in (texto or "").splitlines():
+        limpa = linha.strip()
+        if not limpa:
+            continue
+        if _eh_titulo(limpa):
+            secoes.append((limpa, []))
+            continue
+        secoes[-1][1].append(limpa)
+    return [secao for secao in secoes if secao[0] or secao[1]]
+
+
+ # Resume o conteudo de uma secao na ordem original: frases de abertura e amostra de itens enumerados.
+def _resumir_conteudo_secao(linhas: list[str], frases_por_secao: int) -> list[str]:
+    resumo: list[str] = []
+    frases_restantes = frases_por_secao
+    itens_na_lista = 0
+    paragrafos_omitidos = 0
+    itens_omitidos = 0
+
+    def descarregar_omissoes() -> None:
+        nonlocal paragrafos_omitidos, itens_omitidos
+        if paragrafos_omitidos:
+            resumo.append(f"[... +{paragrafos_omitidos} paragrafo(s) no mesmo estilo]")
+        if itens_omitidos:
+            resumo.append(f"[... +{itens_omitidos} item(ns) enumerado(s)]")
+        paragrafos_omitidos = 0
+        itens_omitidos = 0
+
+    for linha in linhas:
+        if _PADRAO_ITEM_LISTA.match(linha):
+            if itens_na_lista < ITENS_LISTA_POR_SECAO:
+                descarregar_omissoes()
+                resumo.append(_encurtar(_anonimizar_com_numeracao(linha), LIMITE_CARACTERES_FRASE))
+            else:
+                itens_omitidos += 1
+            itens_na_lista += 1
+            continue
+
+        itens_na_lista = 0
+        if frases_restantes <= 0:
+            paragrafos_omitidos += 1
+            continue
+
+        frases = [frase.strip() for frase in _PADRAO_FIM_FRASE.split(linha) if frase.strip()]
+        descarregar_omissoes()
+        for frase in frases[:frases_restantes]:
+            resumo.append(_encurtar(anonimizar_trecho(frase), LIMITE_CARACTERES_FRASE))
+        frases_restantes -= len(frases[:frases_restantes])
+
+    descarregar_omissoes()
+    return resumo
+
+
+ # Comprime o modelo de referencia em um esqueleto de estilo que cobre o documento inteiro.
+def comprimir_modelo_referencia(texto: str, frases_por_secao: int = FRASES_POR_SECAO) -> str:
+    """
+    Mantem os titulos de secao e as frases de abertura de cada uma, removendo
+    nomes e numeros, para preservar estrutura e tom com bem menos caracteres.
+    """
+    blocos: list[str] = ["[ESQUELETO DE ESTILO: titulos e frases de abertura do modelo, dados removidos]"]
+    for titulo, linhas in dividir_secoes_modelo(texto):
+        linhas_bloco: list[str] = []
+        if titulo:
+            linhas_bloco.append(_anonimizar_com_numeracao(titulo))
+        linhas_bloco.extend(_resumir_conteudo_secao(linhas, frases_por_secao))
+        if linhas_bloco:
+            blocos.append("\n".join(linhas_bloco))
+    return "\n\n".join(blocos)
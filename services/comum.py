@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+ # Lê um número do ambiente, caindo no padrão quando ausente ou inválido.
+def float_ambiente(nome: str, padrao: float) -> float:
+    try:
+        return float(os.getenv(nome, "") or padrao)
+    except ValueError:
+        return padrao
+
+
+# Conexões SQLite em modo WAL para um arquivo compartilhado entre threads e processos.
+class ConexoesSqlite:
+    """
+    Uma conexão por thread (sqlite3 não compartilha conexões entre threads), em autocommit, com
+    o esquema aplicado na abertura. Se o banco não puder ser aberto, avisa no log uma vez e
+    `obter` passa a retornar None, para quem usa seguir sem o banco.
+    """
+
+    def __init__(self, caminho: str, esquema: str, descricao: str) -> None:
+        self.caminho = caminho
+        self._esquema = esquema
+        self._descricao = descricao
+        self._local = threading.local()
+        self._desativado = False
+
+    # Conexão da thread atual, aberta na primeira chamada; None se o banco estiver desativado.
+    def obter(self) -> sqlite3.Connection | None:
+        if self._desativado:
+            return None
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            return conexao
+        try:
+            pasta = os.path.dirname(self.caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            conexao = sqlite3.connect(self.caminho, timeout=5.0, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.executescript(self._esquema)
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("%s indisponivel, seguindo sem o banco (%s): %s", self._descricao, self.caminho, exc)
+            self._desativado = True
+            return None
+        self._local.conexao = conexao
+        return conexao
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from services import provedores_consulta
+from services.brasilapi import ErroConsulta
+from services.cache_consultas import obter_cache_consultas
+from services.indice_cep import obter_indice_cep
+
+LIMITE_CONSULTAS_ANTECIPADAS = 64
+
+ConsultaApi = Callable[[str], dict[str, Any]]
+
+_executor_consultas = ThreadPoolExecutor(max_workers=4, thread_name_prefix="consultas-cadastrais")
+_antecipadas: OrderedDict[tuple[str, str], Future[dict[str, Any]]] = OrderedDict()
+_antecipadas_lock = threading.Lock()
+
+
+ # Busca dados de CNPJ: cache persistente primeiro, provedores configurados nas faltas.
+def _buscar_cnpj(digitos: str, consultar_api: ConsultaApi | None = None) -> dict[str, Any]:
+    return obter_cache_consultas().obter_ou_consultar("cnpj", digitos, consultar_api or provedores_consulta.consultar_cnpj)
+
+
+ # Busca endereço por CEP: índice local (se configurado), depois cache persistente e provedores.
+def _buscar_cep(digitos: str, consultar_api: ConsultaApi | None = None) -> dict[str, Any]:
+    indice = obter_indice_cep()
+    registro = indice.buscar(digitos) if indice is not None else None
+    if registro is not None:
+        return registro
+    return obter_cache_consultas().obter_ou_consultar("cep", digitos, consultar_api or provedores_consulta.consultar_cep)
+
+
+ # Dispara a busca em segundo plano, se ainda não houver uma para o mesmo documento.
+def _antecipar(tipo: str, digitos: str, buscar: Callable[[str], dict[str, Any]]) -> None:
+    chave = (tipo, digitos)
+    with _antecipadas_lock:
+        if chave in _antecipadas:
+            _antecipadas.move_to_end(chave)
+            return
+        _antecipadas[chave] = _executor_consultas.submit(buscar, digitos)
+        while len(_antecipadas) > LIMITE_CONSULTAS_ANTECIPADAS:
+            _antecipadas.popitem(last=False)
+
+
+ # Usa a busca antecipada, se houver (esperando terminar), ou busca agora.
+def _aguardar_ou_buscar(tipo: str, digitos: str, buscar: Callable[[str], dict[str, Any]]) -> dict[str, Any]:
+    with _antecipadas_lock:
+        futuro = _antecipadas.pop((tipo, digitos), None)
+    if futuro is not None:
+        try:
+            return futuro.result()
+        except ErroConsulta as exc:
+            # "Não encontrado" vale; falha de rede na antecipação merece nova tentativa agora.
+            if exc.status == 404:
+                raise
+    return buscar(digitos)
+
+
+ # Normaliza o documento para dígitos e valida o tamanho esperado.
+def _digitos(valor: str, tamanho: int, mensagem: str) -> str:
+    digitos = re.sub(r"\D", "", valor or "")
+    if len(digitos) != tamanho:
+        raise ErroConsulta(mensagem)
+    return digitos
+
+
+ # Consulta dados de CNPJ, aproveitando a consulta antecipada quando existir.
+ # `consultar_api` substitui a chamada à API nas faltas de cache (ex.: com limite de taxa, no lote).
+def consultar_cnpj(cnpj_digitos: str, consultar_api: ConsultaApi | None = None) -> dict[str, Any]:
+    digitos = _digitos(cnpj_digitos, 14, "Informe um CNPJ com 14 dígitos para consulta.")
+    if consultar_api is not None:
+        return _buscar_cnpj(digitos, consultar_api)
+    return _aguardar_ou_buscar("cnpj", digitos, _buscar_cnpj)
+
+
+ # Consulta endereço por CEP, aproveitando a consulta antecipada quando existir.
+def consultar_cep(cep_digitos: str, consultar_api: ConsultaApi | None = None) -> dict[str, Any]:
+    digitos = _digitos(cep_digitos, 8, "Informe um CEP com 8 dígitos para consulta.")
+    if consultar_api is not None:
+        return _buscar_cep(digitos, consultar_api)
+    return _aguardar_ou_buscar("cep", digitos, _buscar_cep)
+
+
+ # Antecipa em segundo plano a consulta do CNPJ completo (14 dígitos); outros valores são ignorados.
+def antecipar_cnpj(cnpj_digitos: str) -> None:
+    digitos = re.sub(r"\D", "", cnpj_digitos or "")
+    if len(digitos) == 14:
+        _antecipar("cnpj", digitos, _buscar_cnpj)
+
+
+ # Antecipa em segundo plano a consulta do CEP completo (8 dígitos); outros valores são ignorados.
+def antecipar_cep(cep_digitos: str) -> None:
+    digitos = re.sub(r"\D", "", cep_digitos or "")
+    if len(digitos) == 8:
+        _antecipar("cep", digitos, _buscar_cep)
+
+
+ # Formata CEP brasileiro no padrão 00000-000.
+def formatar_cep(valor: str) -> str:
+    digitos = re.sub(r"\D", "", valor or "")
+    if len(digitos) <= 5:
+        return digitos
+    return f"{digitos[:5]}-{digitos[5:8]}"
+
+
+ # Extrai nome de representante legal/sócio principal do retorno da BrasilAPI.
+def extrair_representante(dados_api: dict[str, Any]) -> str:
+    qsa = dados_api.get("qsa", [])
+    if not isinstance(qsa, list):
+        return ""
+
+    for socio in qsa:
+        if not isinstance(socio, dict):
+            continue
+        nome_rep = str(socio.get("nome_representante_legal", "")).strip()
+        if nome_rep:
+            return nome_rep
+
+    for socio in qsa:
+        if not isinstance(socio, dict):
+            continue
+        nome_socio = str(socio.get("nome_socio", "")).strip()
+        if nome_socio:
+            return nome_socio
+
+    return ""
+
+
+ # Monta endereço textual a partir da resposta da BrasilAPI.
+def montar_endereco_pj(dados_api: dict[str, Any]) -> str:
+    tipo_logradouro = str(dados_api.get("descricao_tipo_de_logradouro", "")).strip()
+    logradouro = str(dados_api.get("logradouro", "")).strip()
+    numero = str(dados_api.get("numero", "")).strip() or "S/N"
+    complemento = str(dados_api.get("complemento", "")).strip()
+    bairro = str(dados_api.get("bairro", "")).strip()
+    municipio = str(dados_api.get("municipio", "")).strip()
+    uf = str(dados_api.get("uf", "")).strip()
+    cep = formatar_cep(str(dados_api.get("cep", "")))
+
+    linha_logradouro = " ".join(item for item in [tipo_logradouro, logradouro] if item).strip()
+    if linha_logradouro:
+        linha_logradouro = f"{linha_logradouro}, {numero}"
+    else:
+        linha_logradouro = ""
+
+    partes = [linha_logradouro, complemento, bairro]
+
+    cidade_uf = " / ".join(item for item in [municipio, uf] if item).strip(" /")
+    if cidade_uf:
+        partes.append(cidade_uf)
+    if cep:
+        partes.append(f"CEP {cep}")
+
+    partes_validas = [parte for parte in partes if parte]
+    return " - ".join(partes_validas)
+
+
+ # Monta endereço a partir do retorno da BrasilAPI de CEP.
+def montar_endereco_cep(dados_api: dict[str, Any]) -> str:
+    rua = str(dados_api.get("street", "")).strip()
+    bairro = str(dados_api.get("neighborhood", "")).strip()
+    cidade = str(dados_api.get("city", "")).strip()
+    uf = str(dados_api.get("state", "")).strip()
+    cep = formatar_cep(str(dados_api.get("cep", "")))
+
+    partes = [rua, bairro]
+    cidade_uf = " / ".join(item for item in [cidade, uf] if item).strip(" /")
+    if cidade_uf:
+        partes.append(cidade_uf)
+    if cep:
+        partes.append(f"CEP {cep}")
+
+    partes_validas = [item for item in partes if item]
+    return " - ".join(partes_validas)
+
+
+ # Campos da parte PJ (sufixos do formulário: nome, cep, end...) preenchidos pela consulta de CNPJ; só os não vazios.
+def campos_pj(dados_api: dict[str, Any]) -> dict[str, str]:
+    razao_social = str(dados_api.get("razao_social", "")).strip()
+    nome_fantasia = str(dados_api.get("nome_fantasia", "")).strip()
+    situacao = str(dados_api.get("descricao_situacao_cadastral", "")).strip()
+    email = str(dados_api.get("email", "")).strip()
+    telefone = re.sub(r"\D", "", str(dados_api.get("ddd_telefone_1", "")))
+
+    extras: list[str] = []
+    if situacao:
+        extras.append(f"Situação cadastral: {situacao}")
+    if telefone:
+        extras.append(f"Telefone: {telefone}")
+    if email:
+        extras.append(f"E-mail: {email}")
+
+    campos = {
+        "nome": razao_social or nome_fantasia,
+        "natureza_juridica": str(dados_api.get("natureza_juridica", "")).strip(),
+        "representante_legal": extrair_representante(dados_api),
+        "cep": formatar_cep(str(dados_api.get("cep", ""))),
+        "end": montar_endereco_pj(dados_api),
+        "qualificacao": "; ".join(extras),
+    }
+    return {campo: valor for campo, valor in campos.items() if valor}
+
+
+ # Campos de endereço (cep, end) preenchidos pela consulta de CEP; só os não vazios.
+def campos_cep(dados_api: dict[str, Any], cep_digitos: str = "") -> dict[str, str]:
+    campos = {
+        "cep": formatar_cep(str(dados_api.get("cep", cep_digitos))),
+        "end": montar_endereco_cep(dados_api),
+    }
+    return {campo: valor for campo, valor in campos.items() if valor}
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import csv
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from services import consultas_cadastrais, provedores_consulta
+from services.brasilapi import ErroConsulta
+
+PAPEIS = ("autor", "reu")
+CONCORRENCIA_PADRAO = 4
+REQUISICOES_POR_SEGUNDO_PADRAO = 3.0
+
+
+# Limite de taxa por espaçamento: cada chamada ganha um horário, no mínimo 1/taxa após a anterior.
+class LimitadorTaxa:
+    def __init__(self, por_segundo: float) -> None:
+        self._intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    # Bloqueia até o próximo horário livre.
+    def aguardar(self) -> None:
+        if not self._intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            horario = max(agora, self._proximo)
+            self._proximo = horario + self._intervalo
+        if horario > agora:
+            time.sleep(horario - agora)
+
+    # Envolve a consulta para respeitar o limite antes de cada chamada.
+    def limitar(self, consultar: Callable[[str], dict[str, Any]]) -> Callable[[str], dict[str, Any]]:
+        def consultar_limitado(chave: str) -> dict[str, Any]:
+            self.aguardar()
+            return consultar(chave)
+
+        return consultar_limitado
+
+
+ # Texto do campo do caso, sem espaços nas pontas.
+def _campo(caso: dict[str, Any], chave: str) -> str:
+    return str(caso.get(chave) or "").strip()
+
+
+ # Identificação do caso no relatório: campo id/processo, se houver, ou a posição (1, 2, ...).
+def _identificar_caso(caso: dict[str, Any], posicao: int) -> str:
+    return _campo(caso, "id") or _campo(caso, "processo") or str(posicao)
+
+
+ # Lista as consultas necessárias para uma parte: CNPJ (se o documento for CNPJ) ou CEP (se faltar endereço).
+def _consultas_da_parte(caso: dict[str, Any], papel: str, sobrescrever: bool) -> list[tuple[str, str]]:
+    documento = re.sub(r"\D", "", _campo(caso, f"{papel}_doc"))
+    if len(documento) == 14:
+        return [("cnpj", documento)]
+    cep = re.sub(r"\D", "", _campo(caso, f"{papel}_cep"))
+    if len(cep) == 8 and (sobrescrever or not _campo(caso, f"{papel}_end")):
+        return [("cep", cep)]
+    return []
+
+
+ # Grava os campos consultados na parte; sem `sobrescrever`, só preenche os vazios.
+def _aplicar_campos(caso: dict[str, Any], papel: str, campos: dict[str, str], sobrescrever: bool) -> int:
+    preenchidos = 0
+    for campo, valor in campos.items():
+        chave = f"{papel}_{campo}"
+        if sobrescrever or not _campo(caso, chave):
+            caso[chave] = valor
+            preenchidos += 1
+    return preenchidos
+
+
+ # Enriquece os casos em lugar: deduplica CNPJs/CEPs, consulta em paralelo com limite de taxa e preenche as partes.
+def enriquecer_casos(
+    casos: list[dict[str, Any]],
+    concorrencia: int = CONCORRENCIA_PADRAO,
+    por_segundo: float = REQUISICOES_POR_SEGUNDO_PADRAO,
+    sobrescrever: bool = False,
+) -> dict[str, Any]:
+    """
+    O limite de taxa vale só para as chamadas à API; acertos do cache persistente e do índice
+    local de CEPs não esperam. Cada documento é consultado uma vez, mesmo que apareça em vários
+    casos. Retorna o relatório com contadores e a lista de faltas (caso, parte, documento, motivo).
+    """
+    limitador = LimitadorTaxa(por_segundo)
+    consultas_api = {
+        "cnpj": limitador.limitar(provedores_consulta.consultar_cnpj),
+        "cep": limitador.limitar(provedores_consulta.consultar_cep),
+    }
+    funcoes = {"cnpj": consultas_cadastrais.consultar_cnpj, "cep": consultas_cadastrais.consultar_cep}
+
+    pendencias: list[tuple[int, str, str, str]] = []
+    for posicao, caso in enumerate(casos, start=1):
+        for papel in PAPEIS:
+            for tipo, digitos in _consultas_da_parte(caso, papel, sobrescrever):
+                pendencias.append((posicao, papel, tipo, digitos))
+
+    unicos = sorted({(tipo, digitos) for _, _, tipo, digitos in pendencias})
+
+    # Erros viram valor do dicionário, para o relatório dizer o motivo de cada falta.
+    def consultar(item: tuple[str, str]) -> dict[str, Any] | Exception:
+        tipo, digitos = item
+        try:
+            return funcoes[tipo](digitos, consultar_api=consultas_api[tipo])
+        except Exception as exc:
+            return exc
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix="enriquecimento") as executor:
+        resultados = dict(zip(unicos, executor.map(consultar, unicos)))
+    duracao = time.perf_counter() - inicio
+
+    faltas: list[dict[str, str]] = []
+    partes_preenchidas = 0
+    campos_preenchidos = 0
+    for posicao, papel, tipo, digitos in pendencias:
+        caso = casos[posicao - 1]
+        resultado = resultados[(tipo, digitos)]
+        if isinstance(resultado, Exception):
+            motivo = str(resultado) if isinstance(resultado, ErroConsulta) else "Erro inesperado na consulta."
+            faltas.append(
+                {
+                    "caso": _identificar_caso(caso, posicao),
+                    "parte": papel,
+                    "tipo": tipo,
+                    "documento": digitos,
+                    "motivo": motivo,
+                }
+            )
+            continue
+
+        if tipo == "cnpj":
+            caso[f"{papel}_tipo_pessoa"] = "Pessoa Jurídica"
+            campos = consultas_cadastrais.campos_pj(resultado)
+        else:
+            campos = consultas_cadastrais.campos_cep(resultado, digitos)
+        campos_preenchidos += _aplicar_campos(caso, papel, campos, sobrescrever)
+        partes_preenchidas += 1
+
+    return {
+        "casos": len(casos),
+        "consultas_pedidas": len(pendencias),
+        "documentos_unicos": len(unicos),
+        "partes_preenchidas": partes_preenchidas,
+        "campos_preenchidos": campos_preenchidos,
+        "faltas": faltas,
+        "duracao_s": round(duracao, 3),
+    }
+
+
+ # Lê o arquivo de casos: JSON (lista ou {"casos": [...]}) ou CSV com as chaves do formulário como colunas.
+def ler_casos(caminho: str) -> tuple[list[dict[str, Any]], Any]:
+    if caminho.lower().endswith(".csv"):
+        with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+            return [dict(linha) for linha in csv.DictReader(arquivo)], None
+    with open(caminho, encoding="utf-8") as arquivo:
+        conteudo = json.load(arquivo)
+    casos = conteudo.get("casos") if isinstance(conteudo, dict) else conteudo
+    if not isinstance(casos, list) or not all(isinstance(caso, dict) for caso in casos):
+        raise ValueError("Arquivo de casos deve ser uma lista de objetos ou {\"casos\": [...]}.")
+    return casos, conteudo
+
+
+ # Grava os casos no mesmo formato da entrada (CSV ganha as colunas novas no fim).
+def gravar_casos(caminho: str, casos: list[dict[str, Any]], conteudo_original: Any = None) -> None:
+    if caminho.lower().endswith(".csv"):
+        colunas: list[str] = []
+        for caso in casos:
+            colunas.extend(chave for chave in caso if chave not in colunas)
+        with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=colunas)
+            escritor.writeheader()
+            escritor.writerows(casos)
+        return
+    conteudo = conteudo_original if isinstance(conteudo_original, dict) else casos
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(conteudo, arquivo, ensure_ascii=False, indent=2)
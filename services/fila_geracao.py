@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from services.comum import float_ambiente
+
+LIMITE_TAREFAS = 64
+RETENCAO_SEGUNDOS = 3600.0
+
+ESTADOS_PENDENTES = ("na_fila", "executando")
+
+
+# Registro de uma tarefa na tabela: estado, horários, resultado ou erro.
+class _Tarefa:
+    def __init__(self, identificador: str, descricao: dict[str, Any]) -> None:
+        self.identificador = identificador
+        self.descricao = descricao
+        self.estado = "na_fila"
+        self.criada_em = time.time()
+        self.iniciada_em: float | None = None
+        self.concluida_em: float | None = None
+        self.resultado: Any = None
+        self.erro: BaseException | None = None
+        self.futuro: Future[None] | None = None
+
+
+# Fila de geração em segundo plano: workers em threads e tabela de tarefas indexada por id.
+class FilaGeracao:
+    """
+    A tabela vive no processo do servidor, fora da sessão do Streamlit: o id guardado na sessão
+    (ou na URL) continua válido depois de reruns e reconexões. Tarefas concluídas ficam
+    disponíveis por `retencao_segundos`; acima de `limite`, as concluídas mais antigas saem primeiro.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        limite: int = LIMITE_TAREFAS,
+        retencao_segundos: float = RETENCAO_SEGUNDOS,
+    ) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fila-geracao")
+        self._tarefas: OrderedDict[str, _Tarefa] = OrderedDict()
+        self._lock = threading.Lock()
+        self._limite = limite
+        self._retencao_segundos = retencao_segundos
+
+    # Enfileira a função e retorna o id da tarefa.
+    def enfileirar(self, executar: Callable[[], Any], descricao: dict[str, Any] | None = None) -> str:
+        tarefa = _Tarefa(uuid.uuid4().hex, dict(descricao or {}))
+        with self._lock:
+            self._limpar()
+            self._tarefas[tarefa.identificador] = tarefa
+        tarefa.futuro = self._executor.submit(self._executar, tarefa, executar)
+        return tarefa.identificador
+
+    # Executa a tarefa no worker, registrando início, fim e resultado (ou a exceção).
+    def _executar(self, tarefa: _Tarefa, executar: Callable[[], Any]) -> None:
+        with self._lock:
+            if tarefa.estado != "na_fila":
+                return
+            tarefa.estado = "executando"
+            tarefa.iniciada_em = time.time()
+        try:
+            resultado = executar()
+        except BaseException as exc:
+            with self._lock:
+                tarefa.estado = "falhou"
+                tarefa.erro = exc
+                tarefa.concluida_em = time.time()
+            return
+        with self._lock:
+            tarefa.estado = "concluida"
+            tarefa.resultado = resultado
+            tarefa.concluida_em = time.time()
+
+    # Remove tarefas concluídas expiradas e, acima do limite, as concluídas mais antigas (com o lock adquirido).
+    def _limpar(self) -> None:
+        agora = time.time()
+        for identificador, tarefa in list(self._tarefas.items()):
+            if tarefa.concluida_em is not None and agora - tarefa.concluida_em > self._retencao_segundos:
+                del self._tarefas[identificador]
+
+        excedente = len(self._tarefas) - self._limite + 1
+        for identificador, tarefa in list(self._tarefas.items()):
+            if excedente <= 0:
+                break
+            if tarefa.estado not in ESTADOS_PENDENTES:
+                del self._tarefas[identificador]
+                excedente -= 1
+
+    # Situação da tarefa: estado, posição na fila, tempos, resultado e erro; None se o id não existe.
+    def situacao(self, identificador: str) -> dict[str, Any] | None:
+        with self._lock:
+            tarefa = self._tarefas.get(identificador)
+            if tarefa is None:
+                return None
+            posicao = 0
+            if tarefa.estado == "na_fila":
+                posicao = 1 + sum(
+                    1
+                    for outra in self._tarefas.values()
+                    if outra.estado == "na_fila" and outra.criada_em < tarefa.criada_em
+                )
+            fim = tarefa.concluida_em or time.time()
+            return {
+                "id": tarefa.identificador,
+                "estado": tarefa.estado,
+                "descricao": dict(tarefa.descricao),
+                "posicao_fila": posicao,
+                "espera_s": round((tarefa.iniciada_em or fim) - tarefa.criada_em, 1),
+                "execucao_s": round(fim - tarefa.iniciada_em, 1) if tarefa.iniciada_em else 0.0,
+                "resultado": tarefa.resultado,
+                "erro": tarefa.erro,
+            }
+
+    # Cancela a tarefa se ainda estiver na fila; tarefas em execução terminam normalmente.
+    def cancelar(self, identificador: str) -> bool:
+        with self._lock:
+            tarefa = self._tarefas.get(identificador)
+            if tarefa is None or tarefa.estado != "na_fila":
+                return False
+            tarefa.estado = "cancelada"
+            tarefa.concluida_em = time.time()
+        if tarefa.futuro is not None:
+            tarefa.futuro.cancel()
+        return True
+
+    # Remove a tarefa da tabela depois que o resultado foi entregue à sessão.
+    def descartar(self, identificador: str) -> None:
+        with self._lock:
+            tarefa = self._tarefas.get(identificador)
+            if tarefa is not None and tarefa.estado not in ESTADOS_PENDENTES:
+                del self._tarefas[identificador]
+
+    # Contadores por estado, para o painel de saúde.
+    def resumo(self) -> dict[str, int]:
+        with self._lock:
+            contagem: dict[str, int] = {}
+            for tarefa in self._tarefas.values():
+                contagem[tarefa.estado] = contagem.get(tarefa.estado, 0) + 1
+            return contagem
+
+
+ # Número de workers da fila (GERACAO_WORKERS, padrão 2).
+def _workers_do_ambiente() -> int:
+    return max(1, int(float_ambiente("GERACAO_WORKERS", 2)))
+
+
+_fila: FilaGeracao | None = None
+_fila_lock = threading.Lock()
+
+
+ # Retorna a fila do processo, criada na primeira chamada (depois que o .env já foi carregado).
+def obter_fila_geracao() -> FilaGeracao:
+    global _fila
+    with _fila_lock:
+        if _fila is None:
+            _fila = FilaGeracao(max_workers=_workers_do_ambiente())
+        return _fila
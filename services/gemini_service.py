@@ -1,54 +1,933 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
 import os
+import unicodedata
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, Iterator, TypeVar
 
-from google import genai
+from services.comum import float_ambiente
+from services.pool_chaves import ErroChavesSaturadas, obter_pool_chaves
+from services.telemetria import MedicaoChamada, telemetria
 
 DEFAULT_MODEL = "gemini-2.5-flash"
 
+JANELA_LATENCIAS_HEDGE = 200
+AMOSTRAS_MINIMAS_HEDGE = 20
+
+T = TypeVar("T")
+
+# Rotas de modelo por nível de detalhamento, área e tipo de ação (None = qualquer valor).
+# Vence a regra mais específica; em empate, a primeira da lista. `modelo` None usa o modelo padrão.
+# Pode ser substituída por GEMINI_ROTAS (JSON na própria variável ou caminho de arquivo .json).
+ROTAS_MODELO_PADRAO: list[dict[str, Any]] = [
+    {
+        "nome": "enxuto",
+        "nivel": "Enxuto",
+        "area": None,
+        "tipo_acao": None,
+        "modelo": "gemini-2.5-flash-lite",
+        "max_output_tokens": 4096,
+        "thinking_budget": 0,
+    },
+    {
+        "nome": "padrao",
+        "nivel": "Padrão",
+        "area": None,
+        "tipo_acao": None,
+        "modelo": None,
+        "max_output_tokens": None,
+        "thinking_budget": None,
+    },
+    {
+        "nome": "aprofundado",
+        "nivel": "Aprofundado",
+        "area": None,
+        "tipo_acao": None,
+        "modelo": None,
+        "max_output_tokens": None,
+        "thinking_budget": 4096,
+    },
+]
+LIMITE_DECISOES_ROTEAMENTO = 200
+
+LIMITE_CANDIDATOS = 4
+
+JANELA_DISJUNTOR = 20
+AMOSTRAS_MINIMAS_DISJUNTOR = 5
+TAXA_FALHA_DISJUNTOR = 0.5
+ABERTO_SEGUNDOS_DISJUNTOR = 30.0
+
+logger = logging.getLogger(__name__)
+
 
 # Define um tipo de erro específico para falhas de integração com o Gemini.
 class GeminiServiceError(RuntimeError):
     """Raised when Gemini generation fails."""
 
 
-# Envia o prompt ao Gemini e retorna o texto gerado, com tratamento de erros de cota e autenticação.
-def gerar_peticao(prompt: str, model: str = DEFAULT_MODEL, api_key: str | None = None) -> str:
+# Erro de cota esgotada (HTTP 429), usado para trocar de chave no pool.
+class ErroCotaGemini(GeminiServiceError):
+    """Raised when the API key is out of quota (HTTP 429 RESOURCE_EXHAUSTED)."""
+
+
+# Falha imediata enquanto o disjuntor do modelo está aberto (sem chamar a API).
+class ErroCircuitoAberto(GeminiServiceError):
+    """Raised when the circuit breaker is open and the call fails fast."""
+
+
+# Importa o SDK do Gemini no primeiro uso; o pacote é pesado e a tela de login não precisa dele.
+def _tipos_sdk() -> Any:
+    try:
+        from google.genai import types
+    except ImportError as exc:
+        raise GeminiServiceError("Pacote google-genai nao instalado (pip install -r requirements.txt).") from exc
+    return types
+
+
+# Cria o cliente do SDK para a chave (importando o SDK no primeiro uso).
+def _cliente(api_key: str) -> Any:
+    try:
+        from google import genai
+    except ImportError as exc:
+        raise GeminiServiceError("Pacote google-genai nao instalado (pip install -r requirements.txt).") from exc
+    return genai.Client(api_key=api_key)
+
+
+# Monta a configuração de geração a partir dos parâmetros da rota (limite de saída e orçamento de raciocínio).
+def _montar_config(parametros: dict[str, Any] | None, **extras: Any) -> Any:
+    opcoes: dict[str, Any] = dict(extras)
+    parametros = parametros or {}
+    types = _tipos_sdk()
+    if parametros.get("max_output_tokens"):
+        opcoes["max_output_tokens"] = int(parametros["max_output_tokens"])
+    if parametros.get("thinking_budget") is not None:
+        opcoes["thinking_config"] = types.ThinkingConfig(thinking_budget=int(parametros["thinking_budget"]))
+    return types.GenerateContentConfig(**opcoes) if opcoes else None
+
+
+# Resolve o modelo (parâmetro, GEMINI_MODEL ou padrão).
+def _resolver_modelo(model: str | None) -> str:
+    return (model or os.getenv("GEMINI_MODEL") or DEFAULT_MODEL).strip()
+
+
+# Indica se a exceção do SDK é de cota esgotada (HTTP 429 RESOURCE_EXHAUSTED).
+def _eh_erro_cota(exc: BaseException) -> bool:
+    msg_lower = str(exc).lower()
+    return "resource_exhausted" in msg_lower or "quota" in msg_lower or "429" in msg_lower
+
+
+# Converte exceções do SDK em GeminiServiceError, com mensagem específica para cota esgotada.
+def _traduzir_erro(exc: Exception, chosen_model: str) -> GeminiServiceError:
+    raw_msg = str(exc)
+    if _eh_erro_cota(exc):
+        return ErroCotaGemini(
+            "Cota da API Gemini esgotada (HTTP 429 RESOURCE_EXHAUSTED). "
+            "No Google AI Studio/Google Cloud, habilite faturamento no projeto da chave "
+            "ou use outra chave/projeto com cota disponivel. "
+            "Tambem pode testar outro modelo via GEMINI_MODEL no .env "
+            "(ex.: gemini-2.5-flash)."
+        )
+    return GeminiServiceError(f"Falha ao chamar Gemini ({chosen_model}): {raw_msg}")
+
+
+# Disjuntor (circuit breaker) de um modelo: fechado, aberto ou meio-aberto.
+class DisjuntorGemini:
     """
-    Gera texto usando Gemini.
-    Requer GEMINI_API_KEY ou GOOGLE_API_KEY no ambiente.
+    Fechado: as chamadas passam e os desfechos entram numa janela deslizante; com pelo menos
+    `amostras_minimas` desfechos e taxa de falha >= `taxa_falha`, abre. Aberto: falha na hora
+    (ErroCircuitoAberto) até passar `aberto_segundos`. Meio-aberto: deixa passar uma única chamada
+    de sondagem; sucesso fecha e limpa a janela, falha reabre.
     """
-    key = (api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or "").strip()
-    if not key:
+
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(
+        self,
+        tamanho_janela: int = JANELA_DISJUNTOR,
+        amostras_minimas: int = AMOSTRAS_MINIMAS_DISJUNTOR,
+        taxa_falha: float = TAXA_FALHA_DISJUNTOR,
+        aberto_segundos: float = ABERTO_SEGUNDOS_DISJUNTOR,
+    ) -> None:
+        self._desfechos: deque[bool] = deque(maxlen=tamanho_janela)
+        self._amostras_minimas = amostras_minimas
+        self._taxa_falha = taxa_falha
+        self._aberto_segundos = aberto_segundos
+        self._estado = self.FECHADO
+        self._aberto_ate = 0.0
+        self._sondagem_em_andamento = False
+        self._aberturas = 0
+        self._rejeitadas = 0
+        self._lock = threading.Lock()
+
+    # Autoriza a chamada ou falha na hora; depois do tempo aberto, a primeira chamada vira a sondagem.
+    def permitir(self) -> None:
+        with self._lock:
+            if self._estado == self.ABERTO and time.monotonic() >= self._aberto_ate:
+                self._estado = self.MEIO_ABERTO
+            if self._estado == self.FECHADO:
+                return
+            if self._estado == self.MEIO_ABERTO and not self._sondagem_em_andamento:
+                self._sondagem_em_andamento = True
+                return
+            self._rejeitadas += 1
+            restante = max(0.0, self._aberto_ate - time.monotonic())
+        raise ErroCircuitoAberto(
+            "API Gemini temporariamente indisponivel (falhas seguidas); "
+            f"nova tentativa automatica em {restante:.0f}s."
+        )
+
+    # Registra o desfecho de uma chamada autorizada.
+    def registrar(self, sucesso: bool) -> None:
+        with self._lock:
+            if self._estado == self.MEIO_ABERTO:
+                self._sondagem_em_andamento = False
+                if sucesso:
+                    self._estado = self.FECHADO
+                    self._desfechos.clear()
+                else:
+                    self._abrir()
+                return
+            if self._estado == self.ABERTO:
+                return
+
+            self._desfechos.append(sucesso)
+            falhas = self._desfechos.count(False)
+            if len(self._desfechos) >= self._amostras_minimas and falhas / len(self._desfechos) >= self._taxa_falha:
+                self._abrir()
+
+    # Abre o circuito (chamado com o lock adquirido).
+    def _abrir(self) -> None:
+        self._estado = self.ABERTO
+        self._aberto_ate = time.monotonic() + self._aberto_segundos
+        self._aberturas += 1
+        self._desfechos.clear()
+
+    # Estado atual para exibição: estado, taxa de falha na janela, segundos até a sondagem e contadores.
+    def resumo(self) -> dict[str, Any]:
+        with self._lock:
+            agora = time.monotonic()
+            estado = self._estado
+            if estado == self.ABERTO and agora >= self._aberto_ate:
+                estado = self.MEIO_ABERTO
+            return {
+                "estado": estado,
+                "taxa_falha": self._desfechos.count(False) / len(self._desfechos) if self._desfechos else 0.0,
+                "amostras": len(self._desfechos),
+                "sondagem_em_s": round(max(0.0, self._aberto_ate - agora), 1) if estado == self.ABERTO else 0.0,
+                "aberturas": self._aberturas,
+                "rejeitadas": self._rejeitadas,
+            }
+
+
+_disjuntores: dict[str, DisjuntorGemini] = {}
+_disjuntores_lock = threading.Lock()
+
+
+# Retorna o disjuntor do modelo (um por modelo: cota e indisponibilidade costumam ser por modelo).
+def disjuntor_do_modelo(model: str | None) -> DisjuntorGemini:
+    modelo = _resolver_modelo(model)
+    with _disjuntores_lock:
+        if modelo not in _disjuntores:
+            _disjuntores[modelo] = DisjuntorGemini(
+                tamanho_janela=int(float_ambiente("GEMINI_DISJUNTOR_JANELA", JANELA_DISJUNTOR)),
+                amostras_minimas=int(float_ambiente("GEMINI_DISJUNTOR_MINIMO", AMOSTRAS_MINIMAS_DISJUNTOR)),
+                taxa_falha=float_ambiente("GEMINI_DISJUNTOR_TAXA_FALHA", TAXA_FALHA_DISJUNTOR),
+                aberto_segundos=float_ambiente("GEMINI_DISJUNTOR_ABERTO_SEGUNDOS", ABERTO_SEGUNDOS_DISJUNTOR),
+            )
+        return _disjuntores[modelo]
+
+
+# Estado dos disjuntores já usados, por modelo (para o cabeçalho e o painel de saúde).
+def estados_disjuntores() -> dict[str, dict[str, Any]]:
+    with _disjuntores_lock:
+        disjuntores = dict(_disjuntores)
+    return {modelo: disjuntor.resumo() for modelo, disjuntor in disjuntores.items()}
+
+
+# Executa a chamada protegida pelo disjuntor do modelo e pelo pool de chaves.
+def _executar_com_chave(
+    api_key: str | None,
+    executar: Callable[[str], T],
+    medicao: MedicaoChamada | None = None,
+    modelo: str | None = None,
+) -> T:
+    if not (api_key and api_key.strip()) and not len(obter_pool_chaves()):
         raise GeminiServiceError("Configure GEMINI_API_KEY (ou GOOGLE_API_KEY) no ambiente.")
 
-    chosen_model = (model or os.getenv("GEMINI_MODEL") or DEFAULT_MODEL).strip()
+    disjuntor = disjuntor_do_modelo(modelo)
+    disjuntor.permitir()
+    sucesso = False
+    try:
+        resultado = _executar_no_pool(api_key, executar, medicao)
+        sucesso = True
+        return resultado
+    finally:
+        disjuntor.registrar(sucesso)
+
+
+# Executa a chamada com a chave informada ou com uma chave do pool, trocando de chave em caso de cota esgotada.
+def _executar_no_pool(api_key: str | None, executar: Callable[[str], T], medicao: MedicaoChamada | None = None) -> T:
+    if api_key and api_key.strip():
+        return executar(api_key.strip())
+
+    pool = obter_pool_chaves()
+    tentadas: set[str] = set()
+    ultimo_erro: ErroCotaGemini | None = None
+    while True:
+        try:
+            with pool.reservar(excluir=tentadas) as chave:
+                if chave is None:
+                    assert ultimo_erro is not None
+                    raise ultimo_erro
+                try:
+                    resultado = executar(chave)
+                except ErroCotaGemini as exc:
+                    pool.registrar_resultado(chave, sucesso=False, erro_quota=True)
+                    tentadas.add(chave)
+                    ultimo_erro = exc
+                    if medicao is not None:
+                        medicao.retentativa()
+                    continue
+                except GeminiServiceError:
+                    pool.registrar_resultado(chave, sucesso=False)
+                    raise
+        except ErroChavesSaturadas as exc:
+            raise ErroCotaGemini(str(exc)) from exc
+        pool.registrar_resultado(chave, sucesso=True)
+        return resultado
+
+
+# Classifica o desfecho de uma chamada que falhou, para a telemetria.
+def _resultado_erro(exc: BaseException) -> str:
+    if isinstance(exc, ErroCircuitoAberto):
+        return "circuito_aberto"
+    return "erro_cota" if isinstance(exc, ErroCotaGemini) else "erro"
+
+
+# Envia o prompt ao Gemini e retorna a resposta bruta, com tratamento de erros de cota e autenticação.
+def _chamar_gemini(
+    prompt: str,
+    model: str,
+    api_key: str | None,
+    config: Any = None,
+    tipo: str = "texto",
+    parametros: dict[str, Any] | None = None,
+) -> Any:
+    chosen_model = _resolver_modelo(model)
+    medicao = telemetria.iniciar("gemini", chosen_model, tipo)
+    medicao.evento["parametros"] = parametros or {}
+
+    def executar(key: str) -> Any:
+        try:
+            client = _cliente(key)
+            return client.models.generate_content(
+                model=chosen_model,
+                contents=prompt,
+                config=config,
+            )
+        except Exception as exc:  # pragma: no cover
+            raise _traduzir_erro(exc, chosen_model) from exc
 
     try:
-        client = genai.Client(api_key=key)
-        response = client.models.generate_content(
-            model=chosen_model,
-            contents=prompt,
+        response = _executar_com_chave(api_key, executar, medicao, chosen_model)
+    except GeminiServiceError as exc:
+        medicao.finalizar(_resultado_erro(exc))
+        raise
+    # Sem streaming, o primeiro byte chega junto com a resposta completa.
+    medicao.primeiro_byte()
+    medicao.uso(getattr(response, "usage_metadata", None))
+    medicao.finalizar("sucesso")
+    return response
+
+
+# Gera em streaming, sinalizando o primeiro trecho recebido e parando de ler se a tentativa for cancelada.
+def _gerar_em_stream(
+    prompt: str,
+    model: str,
+    api_key: str | None,
+    cancelar: threading.Event,
+    primeiro_trecho: threading.Event,
+    parametros: dict[str, Any] | None = None,
+    ao_primeiro_trecho: Callable[[float], None] | None = None,
+) -> tuple[str, float]:
+    chosen_model = _resolver_modelo(model)
+    config = _montar_config(parametros)
+
+    inicio = time.perf_counter()
+    tempo_primeiro_trecho = 0.0
+    partes: list[str] = []
+    medicao = telemetria.iniciar("gemini", chosen_model, "stream_hedge")
+    medicao.evento["parametros"] = parametros or {}
+
+    def executar(key: str) -> None:
+        nonlocal tempo_primeiro_trecho
+        partes.clear()
+        try:
+            client = _cliente(key)
+            for chunk in client.models.generate_content_stream(model=chosen_model, contents=prompt, config=config):
+                if cancelar.is_set():
+                    break
+                if not primeiro_trecho.is_set():
+                    tempo_primeiro_trecho = time.perf_counter() - inicio
+                    primeiro_trecho.set()
+                    medicao.primeiro_byte()
+                    if ao_primeiro_trecho is not None:
+                        ao_primeiro_trecho(tempo_primeiro_trecho)
+                medicao.uso(getattr(chunk, "usage_metadata", None))
+                partes.append(chunk.text or "")
+        except Exception as exc:  # pragma: no cover
+            raise _traduzir_erro(exc, chosen_model) from exc
+
+    try:
+        _executar_com_chave(api_key, executar, medicao, chosen_model)
+    except GeminiServiceError as exc:
+        medicao.finalizar(_resultado_erro(exc))
+        raise
+
+    if cancelar.is_set():
+        medicao.finalizar("cancelada")
+        raise GeminiServiceError(f"Tentativa cancelada ({chosen_model}).")
+    text = "".join(partes).strip()
+    if not text:
+        medicao.finalizar("erro")
+        raise GeminiServiceError("Gemini nao retornou texto.")
+    medicao.finalizar("sucesso")
+    return text, tempo_primeiro_trecho
+
+
+# Gera em streaming e devolve os trechos conforme chegam (sem hedge nem coalescência).
+def gerar_peticao_stream(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> Iterator[str]:
+    chosen_model = _resolver_modelo(model)
+    chave_explicita = (api_key or "").strip()
+    pool = obter_pool_chaves()
+    config = _montar_config(parametros)
+    medicao = telemetria.iniciar("gemini", chosen_model, "stream")
+    medicao.evento["parametros"] = parametros or {}
+
+    disjuntor = disjuntor_do_modelo(chosen_model)
+    autorizada = False
+    falhou = False
+
+    # Se o consumidor parar de ler antes do fim, a chamada fica registrada como cancelada.
+    try:
+        with nullcontext(chave_explicita) if chave_explicita else pool.reservar() as key:
+            if not key:
+                medicao.finalizar("erro")
+                raise GeminiServiceError("Configure GEMINI_API_KEY (ou GOOGLE_API_KEY) no ambiente.")
+            try:
+                disjuntor.permitir()
+            except ErroCircuitoAberto as exc:
+                medicao.finalizar(_resultado_erro(exc))
+                raise
+            autorizada = True
+            try:
+                client = _cliente(key)
+                for chunk in client.models.generate_content_stream(model=chosen_model, contents=prompt, config=config):
+                    medicao.uso(getattr(chunk, "usage_metadata", None))
+                    if chunk.text:
+                        medicao.primeiro_byte()
+                        yield chunk.text
+            except Exception as exc:  # pragma: no cover
+                erro = _traduzir_erro(exc, chosen_model)
+                falhou = True
+                if not chave_explicita:
+                    pool.registrar_resultado(key, sucesso=False, erro_quota=isinstance(erro, ErroCotaGemini))
+                medicao.finalizar(_resultado_erro(erro))
+                raise erro from exc
+            if not chave_explicita:
+                pool.registrar_resultado(key, sucesso=True)
+            medicao.finalizar("sucesso")
+    except ErroChavesSaturadas as exc:
+        medicao.finalizar("erro_cota")
+        raise ErroCotaGemini(str(exc)) from exc
+    finally:
+        # Leitura interrompida pelo consumidor não indica falha da API.
+        if autorizada:
+            disjuntor.registrar(not falhou)
+        medicao.finalizar("cancelada")
+
+
+# Guarda tempos até o primeiro trecho por modelo e os contadores de hedge (requisições de reserva).
+class EstatisticasHedge:
+    """
+    O limiar de hedge é o percentil configurado dos tempos recentes até o primeiro trecho do modelo
+    principal; enquanto houver menos de `AMOSTRAS_MINIMAS_HEDGE` amostras, vale o atraso padrão.
+    """
+
+    def __init__(self, tamanho_janela: int = JANELA_LATENCIAS_HEDGE) -> None:
+        self._latencias: dict[str, deque[float]] = {}
+        self._tamanho_janela = tamanho_janela
+        self._lock = threading.Lock()
+        self._chamadas = 0
+        self._hedges = 0
+        self._vitorias_reserva = 0
+
+    # Registra o tempo até o primeiro trecho de uma tentativa concluída.
+    def registrar_latencia(self, modelo: str, segundos: float) -> None:
+        with self._lock:
+            janela = self._latencias.setdefault(modelo, deque(maxlen=self._tamanho_janela))
+            janela.append(segundos)
+
+    # Registra o desfecho de uma chamada com política de hedge.
+    def registrar_chamada(self, hedge_disparado: bool, venceu_reserva: bool) -> None:
+        with self._lock:
+            self._chamadas += 1
+            self._hedges += int(hedge_disparado)
+            self._vitorias_reserva += int(venceu_reserva)
+
+    # Calcula o limiar (segundos) a partir do percentil dos tempos recentes do modelo.
+    def limiar(self, modelo: str, percentil: float, padrao: float, minimo: float) -> float:
+        with self._lock:
+            amostras = sorted(self._latencias.get(modelo, ()))
+        if len(amostras) < AMOSTRAS_MINIMAS_HEDGE:
+            return max(padrao, minimo)
+        posicao = min(len(amostras) - 1, int(round(percentil / 100 * (len(amostras) - 1))))
+        return max(amostras[posicao], minimo)
+
+    # Resumo para exibição: chamadas, hedges disparados, taxa de hedge e vitórias da reserva.
+    def resumo(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "chamadas": self._chamadas,
+                "hedges_disparados": self._hedges,
+                "taxa_hedge": self._hedges / self._chamadas if self._chamadas else 0.0,
+                "vitorias_reserva": self._vitorias_reserva,
+                "amostras_por_modelo": {modelo: len(janela) for modelo, janela in self._latencias.items()},
+            }
+
+
+estatisticas_hedge = EstatisticasHedge()
+_executor_hedge: ThreadPoolExecutor | None = None
+_executor_hedge_lock = threading.Lock()
+
+
+# Executor próprio do hedge, com folga para a geração por seções (um principal e uma reserva por grupo,
+# em várias sessões): tarefa parada na fila atrasaria o primeiro trecho e dispararia hedges à toa.
+# Criado no primeiro uso, para GEMINI_HEDGE_WORKERS do .env valer.
+def _obter_executor_hedge() -> ThreadPoolExecutor:
+    global _executor_hedge
+    with _executor_hedge_lock:
+        if _executor_hedge is None:
+            _executor_hedge = ThreadPoolExecutor(
+                max_workers=max(1, int(float_ambiente("GEMINI_HEDGE_WORKERS", 32))),
+                thread_name_prefix="gemini-hedge",
+            )
+        return _executor_hedge
+
+
+# Indica se a política de hedge está ligada no ambiente (GEMINI_HEDGE=1).
+def hedge_ativo() -> bool:
+    return os.getenv("GEMINI_HEDGE", "").strip().lower() in {"1", "true", "sim", "on"}
+
+
+# Gera com hedge: se o principal não mandar o primeiro trecho até o limiar, dispara a reserva e fica com a primeira resposta.
+def gerar_peticao_com_hedge(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    fallback_model: str | None = None,
+    fallback_api_key: str | None = None,
+    percentil: float | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> str:
+    """
+    A reserva usa GEMINI_FALLBACK_MODEL/GEMINI_FALLBACK_API_KEY (ou o mesmo modelo e chave).
+    Limiar: percentil GEMINI_HEDGE_PERCENTIL (padrão 95) dos tempos até o primeiro trecho,
+    com GEMINI_HEDGE_ATRASO_PADRAO enquanto não houver amostras e piso em GEMINI_HEDGE_ATRASO_MINIMO.
+    A tentativa perdedora para de ser lida assim que a outra termina. O relógio do limiar só
+    começa quando a tentativa principal sai da fila do executor, e uma falha rápida da principal
+    (cota, disjuntor aberto, chave inválida) dispara a reserva na hora. Se a principal ainda estiver
+    na fila ao fim do limiar (executor lotado), a reserva roda numa thread própria.
+    """
+    modelo_principal = _resolver_modelo(model)
+    modelo_reserva = (fallback_model or os.getenv("GEMINI_FALLBACK_MODEL") or modelo_principal).strip()
+    chave_reserva = fallback_api_key or os.getenv("GEMINI_FALLBACK_API_KEY") or api_key
+    limiar = estatisticas_hedge.limiar(
+        modelo_principal,
+        percentil if percentil is not None else float_ambiente("GEMINI_HEDGE_PERCENTIL", 95.0),
+        float_ambiente("GEMINI_HEDGE_ATRASO_PADRAO", 20.0),
+        float_ambiente("GEMINI_HEDGE_ATRASO_MINIMO", 2.0),
+    )
+
+    tentativas: dict[Future[tuple[str, float]], tuple[str, threading.Event]] = {}
+
+    def disparar(
+        modelo: str,
+        chave: str | None,
+        iniciada: threading.Event,
+        primeiro_trecho: threading.Event,
+        thread_propria: bool = False,
+    ) -> None:
+        cancelar = threading.Event()
+
+        def executar() -> tuple[str, float]:
+            iniciada.set()
+            # Toda tentativa que recebe o primeiro trecho vira amostra, vencendo ou não.
+            return _gerar_em_stream(
+                prompt,
+                modelo,
+                chave,
+                cancelar,
+                primeiro_trecho,
+                parametros,
+                lambda segundos: estatisticas_hedge.registrar_latencia(modelo, segundos),
+            )
+
+        if thread_propria:
+            futuro: Future[tuple[str, float]] = Future()
+
+            def rodar() -> None:
+                if not futuro.set_running_or_notify_cancel():
+                    return
+                try:
+                    futuro.set_result(executar())
+                except BaseException as exc:
+                    futuro.set_exception(exc)
+
+            threading.Thread(target=rodar, name="gemini-hedge-reserva", daemon=True).start()
+        else:
+            futuro = _obter_executor_hedge().submit(executar)
+        # Término (inclusive por erro) também acorda a espera pelo primeiro trecho.
+        futuro.add_done_callback(lambda _futuro: primeiro_trecho.set())
+        tentativas[futuro] = (modelo, cancelar)
+
+    iniciada_principal = threading.Event()
+    primeiro_trecho_principal = threading.Event()
+    disparar(modelo_principal, api_key, iniciada_principal, primeiro_trecho_principal)
+    principal = next(iter(tentativas))
+    iniciou_principal = iniciada_principal.wait(limiar)
+    inicio_principal = time.perf_counter()
+
+    hedge_disparado = False
+    if iniciou_principal:
+        primeiro_trecho_principal.wait(limiar)
+    falhou_principal = principal.done() and principal.exception() is not None
+    if falhou_principal or not primeiro_trecho_principal.is_set():
+        disparar(
+            modelo_reserva,
+            chave_reserva,
+            threading.Event(),
+            threading.Event(),
+            thread_propria=not iniciou_principal,
         )
-    except Exception as exc:  # pragma: no cover
-        raw_msg = str(exc)
-        msg_lower = raw_msg.lower()
-        if "resource_exhausted" in msg_lower or "quota" in msg_lower or "429" in msg_lower:
-            raise GeminiServiceError(
-                "Cota da API Gemini esgotada (HTTP 429 RESOURCE_EXHAUSTED). "
-                "No Google AI Studio/Google Cloud, habilite faturamento no projeto da chave "
-                "ou use outra chave/projeto com cota disponivel. "
-                "Tambem pode testar outro modelo via GEMINI_MODEL no .env "
-                "(ex.: gemini-2.5-flash)."
-            ) from exc
-        raise GeminiServiceError(f"Falha ao chamar Gemini ({chosen_model}): {raw_msg}") from exc
+        hedge_disparado = True
 
+    pendentes = set(tentativas)
+    ultimo_erro: BaseException | None = None
+    while pendentes:
+        concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            erro = futuro.exception()
+            if erro is not None:
+                ultimo_erro = erro
+                continue
+
+            texto, _tempo_primeiro_trecho = futuro.result()
+            if (
+                futuro is not principal
+                and iniciada_principal.is_set()
+                and not principal.done()
+                and not primeiro_trecho_principal.is_set()
+            ):
+                # A principal ainda não respondeu: o tempo até aqui é um piso da sua latência e entra
+                # como amostra, para a cauda lenta não sumir do percentil quando a reserva vence.
+                estatisticas_hedge.registrar_latencia(modelo_principal, time.perf_counter() - inicio_principal)
+            for perdedor in pendentes:
+                tentativas[perdedor][1].set()
+                perdedor.cancel()
+            estatisticas_hedge.registrar_chamada(hedge_disparado, futuro is not principal)
+            return texto
+
+    estatisticas_hedge.registrar_chamada(hedge_disparado, False)
+    if isinstance(ultimo_erro, GeminiServiceError):
+        raise ultimo_erro
+    raise GeminiServiceError(f"Falha ao chamar Gemini ({modelo_principal}): {ultimo_erro}") from ultimo_erro
+
+
+# Normaliza texto de roteamento (sem acentos, minúsculo) para comparar "Padrão" com "Padrao".
+def _normalizar_rota(valor: Any) -> str:
+    texto = unicodedata.normalize("NFKD", str(valor or ""))
+    return texto.encode("ascii", "ignore").decode("ascii").strip().lower()
+
+
+# Carrega a tabela de rotas (GEMINI_ROTAS ou a padrão); configuração inválida cai na padrão com aviso no log.
+def carregar_rotas_modelo() -> list[dict[str, Any]]:
+    bruto = (os.getenv("GEMINI_ROTAS") or "").strip()
+    if not bruto:
+        return ROTAS_MODELO_PADRAO
+    try:
+        if bruto.startswith("["):
+            rotas = json.loads(bruto)
+        else:
+            with open(bruto, encoding="utf-8") as arquivo:
+                rotas = json.load(arquivo)
+    except (OSError, json.JSONDecodeError) as exc:
+        logger.warning("GEMINI_ROTAS invalido (%s); usando rotas padrao.", exc)
+        return ROTAS_MODELO_PADRAO
+    if not isinstance(rotas, list):
+        logger.warning("GEMINI_ROTAS deve ser uma lista de regras; usando rotas padrao.")
+        return ROTAS_MODELO_PADRAO
+    return [rota for rota in rotas if isinstance(rota, dict)]
+
+
+decisoes_roteamento: deque[dict[str, Any]] = deque(maxlen=LIMITE_DECISOES_ROTEAMENTO)
+
+
+# Escolhe modelo e configuração de geração para o caso e registra a decisão no log.
+def rotear_modelo(
+    nivel: str,
+    area: str = "",
+    tipo_acao: str = "",
+    modelo_padrao: str | None = None,
+    rotas: list[dict[str, Any]] | None = None,
+    registrar: bool = True,
+) -> dict[str, Any]:
+    """
+    Retorna {"modelo", "parametros": {"max_output_tokens", "thinking_budget"}, "regra"}.
+    Sem regra aplicável, usa o modelo padrão sem parâmetros extras (regra "nenhuma").
+    Com `registrar=False` (consultas repetidas, ex.: pré-geração), a decisão não vai para o log.
+    """
+    valores = {"nivel": _normalizar_rota(nivel), "area": _normalizar_rota(area), "tipo_acao": _normalizar_rota(tipo_acao)}
+
+    escolhida: dict[str, Any] | None = None
+    melhor = -1
+    for rota in rotas if rotas is not None else carregar_rotas_modelo():
+        criterios = [campo for campo in valores if rota.get(campo)]
+        if any(_normalizar_rota(rota[campo]) != valores[campo] for campo in criterios):
+            continue
+        if len(criterios) > melhor:
+            escolhida = rota
+            melhor = len(criterios)
+
+    modelo = _resolver_modelo((escolhida or {}).get("modelo") or modelo_padrao)
+    parametros = {
+        chave: escolhida[chave]
+        for chave in ("max_output_tokens", "thinking_budget")
+        if escolhida is not None and escolhida.get(chave) is not None
+    }
+    decisao = {
+        "momento": round(time.time(), 3),
+        "nivel": nivel,
+        "area": area,
+        "tipo_acao": tipo_acao,
+        "regra": (escolhida or {}).get("nome", "nenhuma"),
+        "modelo": modelo,
+        "parametros": parametros,
+    }
+    if registrar:
+        decisoes_roteamento.append(decisao)
+        logger.info("roteamento de modelo: %s", json.dumps(decisao, ensure_ascii=False))
+    return {"modelo": modelo, "parametros": parametros, "regra": decisao["regra"]}
+
+
+# Junta chamadas idênticas simultâneas (mesmo modelo e prompt) em uma única requisição em andamento.
+class CoalescedorChamadas:
+    """
+    A primeira chamada de uma chave executa; as que chegam enquanto ela está em andamento
+    esperam e recebem o mesmo resultado (ou a mesma exceção). Nada é guardado depois que termina.
+    """
+
+    def __init__(self) -> None:
+        self._em_andamento: dict[str, Future[Any]] = {}
+        self._lock = threading.Lock()
+        self._chamadas = 0
+        self._coalescidas = 0
+
+    # Executa `funcao` ou espera a execução idêntica já em andamento.
+    def executar(self, chave: str, funcao: Callable[[], T]) -> T:
+        with self._lock:
+            self._chamadas += 1
+            futuro = self._em_andamento.get(chave)
+            lider = futuro is None
+            if futuro is None:
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+            else:
+                self._coalescidas += 1
+
+        if not lider:
+            return futuro.result()
+
+        try:
+            resultado = funcao()
+        except BaseException as exc:
+            futuro.set_exception(exc)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+
+    # Contadores: chamadas recebidas, chamadas servidas por outra em andamento e chaves ativas.
+    def resumo(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "chamadas": self._chamadas,
+                "coalescidas": self._coalescidas,
+                "em_andamento": len(self._em_andamento),
+            }
+
+
+coalescedor_chamadas = CoalescedorChamadas()
+
+
+# Chave de coalescência: tipo de chamada, modelo e hash do prompt.
+def _chave_coalescencia(tipo: str, model: str | None, prompt: str, extra: str = "") -> str:
+    digest = hashlib.sha256((prompt or "").encode("utf-8"))
+    digest.update(extra.encode("utf-8"))
+    return f"{tipo}|{_resolver_modelo(model)}|{digest.hexdigest()}"
+
+
+# Envia o prompt ao Gemini e retorna o texto gerado, com tratamento de erros de cota e autenticação.
+def gerar_peticao(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> str:
+    """
+    Gera texto usando Gemini.
+    Requer GEMINI_API_KEY ou GOOGLE_API_KEY no ambiente.
+    Com GEMINI_HEDGE=1, usa a política de hedge de `gerar_peticao_com_hedge`.
+    Chamadas idênticas simultâneas (mesmo modelo e prompt) compartilham uma única requisição.
+    `parametros` (ver `rotear_modelo`) define max_output_tokens e thinking_budget.
+    """
+
+    def gerar() -> str:
+        if hedge_ativo():
+            return gerar_peticao_com_hedge(prompt, model=model, api_key=api_key, parametros=parametros)
+
+        response = _chamar_gemini(prompt, model, api_key, config=_montar_config(parametros), parametros=parametros)
+
+        text = (response.text or "").strip()
+        if not text:
+            raise GeminiServiceError("Gemini nao retornou texto.")
+        return text
+
+    extra = json.dumps(parametros or {}, sort_keys=True)
+    return coalescedor_chamadas.executar(_chave_coalescencia("texto", model, prompt, extra), gerar)
+
+
+# Envia o prompt pedindo resposta JSON no esquema informado e retorna o objeto decodificado.
+def gerar_json(
+    prompt: str,
+    esquema: dict[str, Any],
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> Any:
+    config = _montar_config(
+        parametros,
+        response_mime_type="application/json",
+        response_schema=esquema,
+    )
+
+    def gerar() -> Any:
+        response = _chamar_gemini(prompt, model, api_key, config=config, tipo="json", parametros=parametros)
+
+        text = (response.text or "").strip()
+        if not text:
+            raise GeminiServiceError("Gemini nao retornou texto.")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise GeminiServiceError(f"Gemini retornou JSON invalido: {exc}") from exc
+
+    extra = json.dumps([esquema, parametros or {}], sort_keys=True)
+    return coalescedor_chamadas.executar(_chave_coalescencia("json", model, prompt, extra), gerar)
+
+
+# Junta o texto das partes de um candidato da resposta, ignorando partes de raciocínio.
+def _texto_candidato(candidato: Any) -> str:
+    conteudo = getattr(candidato, "content", None)
+    partes = getattr(conteudo, "parts", None) or []
+    return "".join(
+        parte.text for parte in partes if getattr(parte, "text", None) and not getattr(parte, "thought", False)
+    ).strip()
+
+
+# Gera uma versão avulsa (sem coalescência, para que prompts iguais rendam textos diferentes).
+def _gerar_um_candidato(prompt: str, model: str, api_key: str | None, parametros: dict[str, Any] | None) -> str:
+    response = _chamar_gemini(
+        prompt, model, api_key, config=_montar_config(parametros), tipo="candidato", parametros=parametros
+    )
     text = (response.text or "").strip()
     if not text:
         raise GeminiServiceError("Gemini nao retornou texto.")
     return text
 
 
+_executor_candidatos = ThreadPoolExecutor(max_workers=LIMITE_CANDIDATOS, thread_name_prefix="gemini-candidatos")
+
+
+# Gera várias versões da petição para o mesmo prompt, com a espera de uma só chamada.
+def gerar_candidatos(
+    prompt: str,
+    quantidade: int = 2,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+    modo: str | None = None,
+) -> list[str]:
+    """
+    Modo "candidatos" (padrão; GEMINI_MODO_CANDIDATOS) pede `quantidade` candidatos numa única
+    requisição (candidate_count); se o modelo recusar ou devolver menos, completa com chamadas
+    paralelas. Modo "paralelo" faz as chamadas simultâneas direto. Retorna ao menos uma versão;
+    falhas parciais nas chamadas paralelas só reduzem a lista.
+    """
+    quantidade = max(1, min(int(quantidade), LIMITE_CANDIDATOS))
+    modo = (modo or os.getenv("GEMINI_MODO_CANDIDATOS") or "candidatos").strip().lower()
+
+    textos: list[str] = []
+    if modo == "candidatos" and quantidade > 1:
+        try:
+            response = _chamar_gemini(
+                prompt,
+                model,
+                api_key,
+                config=_montar_config(parametros, candidate_count=quantidade),
+                tipo="candidatos",
+                parametros=parametros,
+            )
+            textos = [texto for texto in map(_texto_candidato, getattr(response, "candidates", None) or []) if texto]
+        except (ErroCircuitoAberto, ErroCotaGemini):
+            raise
+        except GeminiServiceError as exc:
+            logger.warning("candidate_count=%s recusado (%s); usando chamadas paralelas.", quantidade, exc)
+
+    faltantes = quantidade - len(textos)
+    if faltantes > 0:
+        futuros = [
+            _executor_candidatos.submit(_gerar_um_candidato, prompt, model, api_key, parametros)
+            for _ in range(faltantes)
+        ]
+        erros: list[GeminiServiceError] = []
+        for futuro in futuros:
+            try:
+                textos.append(futuro.result())
+            except GeminiServiceError as exc:
+                erros.append(exc)
+        if not textos:
+            raise erros[0]
+    return textos[:quantidade]
+
+
 # Backward-compatible alias used by earlier app versions.
 # Mantém compatibilidade com chamadas antigas que usam o nome em inglês.
 def generate_petition(prompt: str, api_key: str | None = None, model: str | None = None) -> str:
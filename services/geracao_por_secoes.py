@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from services.gemini_service import DEFAULT_MODEL, GeminiServiceError
+from services.prompt_builder import (
+    ESTRUTURA_BASE_MINIMA,
+    montar_prompt,
+    montar_prompt_regeneracao_secao,
+    montar_prompt_revisao_consistencia,
+    montar_prompt_secoes,
+)
+from services.provedores_llm import gerar_peticao
+from services.secoes_peticao import dividir_em_secoes, limpar_markdown, secoes_ausentes, substituir_secao
+
+# Secoes redigidas juntas na mesma chamada; cada grupo vira uma requisicao concorrente.
+GRUPOS_SECOES_PARALELAS: list[tuple[str, ...]] = [
+    ("ENDERECAMENTO", "QUALIFICACAO DAS PARTES"),
+    ("DOS FATOS",),
+    ("DO DIREITO",),
+    ("DOS PEDIDOS", "DO VALOR DA CAUSA"),
+    ("DAS PROVAS", "REQUERIMENTOS FINAIS", "FECHAMENTO"),
+]
+
+_PADRAO_PREENCHER = re.compile(r"\[\s*preencher\s*\]", re.IGNORECASE)
+
+
+ # Agrupa as secoes da estrutura base para geracao concorrente, preservando a ordem do prompt base.
+def agrupar_secoes(estrutura: list[str] | None = None) -> list[list[str]]:
+    estrutura = estrutura or ESTRUTURA_BASE_MINIMA
+    grupo_por_secao = {secao: idx for idx, grupo in enumerate(GRUPOS_SECOES_PARALELAS) for secao in grupo}
+
+    grupos: list[list[str]] = []
+    indice_grupo: dict[Any, int] = {}
+    for secao in estrutura:
+        chave: Any = grupo_por_secao.get(secao, secao)
+        if chave not in indice_grupo:
+            indice_grupo[chave] = len(grupos)
+            grupos.append([])
+        grupos[indice_grupo[chave]].append(secao)
+    return grupos
+
+
+ # Mantem no trecho apenas as secoes pedidas ao grupo, descartando secoes redigidas por outro grupo.
+def _filtrar_trecho_grupo(texto: str, grupo: list[str], descartadas: list[str]) -> str:
+    partes: list[str] = []
+    for secao in dividir_em_secoes(texto):
+        if secao["cabecalho"] and secao["titulo"] not in grupo:
+            descartadas.append(secao["titulo"])
+            continue
+        partes.append(secao["texto"].strip("\n"))
+    return "\n\n".join(parte for parte in partes if parte.strip())
+
+
+ # Aplica a passada local de consistencia: uniformiza [PREENCHER] e limpa linhas em branco repetidas.
+def _normalizar_texto_final(texto: str) -> str:
+    texto = _PADRAO_PREENCHER.sub("[PREENCHER]", texto)
+    return re.sub(r"\n{3,}", "\n\n", texto).strip()
+
+
+ # Gera a peticao por grupos de secoes em paralelo e junta o resultado na ordem da estrutura base.
+def gerar_peticao_por_secoes(
+    dados: dict[str, Any],
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    gerar: Callable[[str], str] | None = None,
+    revisar_consistencia: bool = False,
+    parametros: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Retorna um dicionario com o texto final, o tempo total (relogio), o tempo de
+    cada grupo e as secoes ausentes ou descartadas na passada de consistencia.
+    """
+    gerar = gerar or (lambda prompt: gerar_peticao(prompt, model=model, api_key=api_key, parametros=parametros))
+    grupos = agrupar_secoes()
+
+    def gerar_grupo(grupo: list[str]) -> tuple[str, float]:
+        inicio_grupo = time.perf_counter()
+        texto_grupo = gerar(montar_prompt_secoes(dados, grupo))
+        return texto_grupo, time.perf_counter() - inicio_grupo
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(grupos), thread_name_prefix="peticao-secao") as executor:
+        futuros = [executor.submit(gerar_grupo, grupo) for grupo in grupos]
+        resultados = [futuro.result() for futuro in futuros]
+
+    descartadas: list[str] = []
+    trechos: list[str] = []
+    tempos_por_grupo: dict[str, float] = {}
+    for grupo, (texto_grupo, tempo_grupo) in zip(grupos, resultados):
+        tempos_por_grupo[" + ".join(grupo)] = tempo_grupo
+        trecho = _filtrar_trecho_grupo(limpar_markdown(texto_grupo), grupo, descartadas)
+        if trecho:
+            trechos.append(trecho)
+
+    texto = _normalizar_texto_final("\n\n".join(trechos))
+    if not texto:
+        raise GeminiServiceError("Gemini nao retornou texto para as secoes solicitadas.")
+
+    # Revisao vazia (resposta cortada ou recusada) mantem o texto juntado.
+    if revisar_consistencia:
+        texto = _normalizar_texto_final(gerar(montar_prompt_revisao_consistencia(texto))) or texto
+
+    return {
+        "texto": texto,
+        "tempo_total": time.perf_counter() - inicio,
+        "tempos_por_grupo": tempos_por_grupo,
+        "secoes_ausentes": secoes_ausentes(texto),
+        "secoes_descartadas": descartadas,
+    }
+
+
+ # Regenera uma unica secao do texto e devolve a peticao com o novo trecho no lugar do antigo.
+def regenerar_secao(
+    dados: dict[str, Any],
+    texto: str,
+    indice: int,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    gerar: Callable[[str], str] | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> str:
+    gerar = gerar or (lambda prompt: gerar_peticao(prompt, model=model, api_key=api_key, parametros=parametros))
+    secoes = dividir_em_secoes(texto)
+    if not 0 <= indice < len(secoes):
+        raise IndexError("Secao inexistente no texto da peticao.")
+
+    secao = secoes[indice]
+    prompt = montar_prompt_regeneracao_secao(dados, secao["titulo"], secao["texto"])
+    descartadas: list[str] = []
+    novo_trecho = _filtrar_trecho_grupo(limpar_markdown(gerar(prompt)), [secao["titulo"]], descartadas)
+    if not novo_trecho:
+        raise GeminiServiceError("Gemini nao retornou texto para a secao solicitada.")
+    # Resposta so com o corpo: o cabecalho original volta, senao a secao sumiria do texto.
+    inicio_novo = dividir_em_secoes(novo_trecho)[0]
+    if secao["cabecalho"] and not (inicio_novo["cabecalho"] and inicio_novo["titulo"] == secao["titulo"]):
+        novo_trecho = f"{secao['cabecalho']}\n\n{novo_trecho}"
+    return _normalizar_texto_final(substituir_secao(texto, indice, novo_trecho))
+
+
+ # Mede o tempo de relogio da geracao em chamada unica e da geracao por secoes para o mesmo caso.
+def comparar_tempo_geracao(
+    dados: dict[str, Any],
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    gerar: Callable[[str], str] | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> dict[str, float]:
+    gerar = gerar or (lambda prompt: gerar_peticao(prompt, model=model, api_key=api_key, parametros=parametros))
+
+    inicio = time.perf_counter()
+    gerar(montar_prompt(dados))
+    tempo_unico = time.perf_counter() - inicio
+
+    tempo_secoes = gerar_peticao_por_secoes(dados, gerar=gerar)["tempo_total"]
+    return {
+        "tempo_chamada_unica": tempo_unico,
+        "tempo_por_secoes": tempo_secoes,
+        "aceleracao": tempo_unico / tempo_secoes if tempo_secoes else 0.0,
+    }
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import csv
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Any, Iterable
+
+MAGICO = b"CEPIDX1\0"
+_CABECALHO = struct.Struct("<8sI")
+_ENTRADA = struct.Struct("<IIH")
+SEPARADOR_CAMPOS = "\x1f"
+
+CAMPOS_REGISTRO = ("street", "neighborhood", "city", "state")
+
+logger = logging.getLogger(__name__)
+
+# Nomes aceitos para cada coluna do CSV de origem (comparação sem diferenciar maiúsculas).
+ALIASES_COLUNAS: dict[str, tuple[str, ...]] = {
+    "cep": ("cep",),
+    "street": ("street", "logradouro", "rua", "endereco"),
+    "neighborhood": ("neighborhood", "bairro"),
+    "city": ("city", "cidade", "localidade", "municipio"),
+    "state": ("state", "uf", "estado"),
+}
+
+
+# Índice local de CEPs: arquivo binário ordenado, lido por memory map e busca binária.
+class IndiceCep:
+    """
+    Layout: cabeçalho (mágico + quantidade), tabela ordenada de entradas (CEP como inteiro,
+    offset e tamanho do registro) e a área de registros (campos UTF-8 separados por 0x1F).
+    Só a página da tabela tocada pela busca é lida do disco; o processo não carrega o arquivo.
+    """
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        with open(caminho, "rb") as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        # Arquivo truncado ou corrompido vira ValueError, como o de formato errado.
+        if len(self._mapa) < _CABECALHO.size:
+            self._mapa.close()
+            raise ValueError(f"Indice de CEP truncado: {caminho}")
+        magico, self.quantidade = _CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO:
+            self._mapa.close()
+            raise ValueError(f"Arquivo nao e um indice de CEP: {caminho}")
+        if len(self._mapa) < _CABECALHO.size + self.quantidade * _ENTRADA.size:
+            self._mapa.close()
+            raise ValueError(f"Indice de CEP truncado: {caminho}")
+        self._inicio_tabela = _CABECALHO.size
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._faltas = 0
+
+    # Busca o CEP (8 dígitos) e retorna o registro no formato da BrasilAPI, ou None.
+    def buscar(self, cep_digitos: str) -> dict[str, Any] | None:
+        digitos = re.sub(r"\D", "", cep_digitos or "")
+        if len(digitos) != 8:
+            return None
+        alvo = int(digitos)
+
+        baixo, alto = 0, self.quantidade - 1
+        while baixo <= alto:
+            meio = (baixo + alto) // 2
+            cep, offset, tamanho = _ENTRADA.unpack_from(self._mapa, self._inicio_tabela + meio * _ENTRADA.size)
+            if cep < alvo:
+                baixo = meio + 1
+            elif cep > alvo:
+                alto = meio - 1
+            else:
+                valores = self._mapa[offset:offset + tamanho].decode("utf-8", "replace").split(SEPARADOR_CAMPOS)
+                with self._lock:
+                    self._acertos += 1
+                return {"cep": digitos, **dict(zip(CAMPOS_REGISTRO, valores)), "service": "indice_local"}
+
+        with self._lock:
+            self._faltas += 1
+        return None
+
+    # Contadores de uso do índice neste processo.
+    def resumo(self) -> dict[str, Any]:
+        with self._lock:
+            return {"registros": self.quantidade, "acertos": self._acertos, "faltas": self._faltas}
+
+
+ # Grava o índice a partir de registros {cep, street, neighborhood, city, state}; CEP repetido fica com o primeiro.
+def gravar_indice(registros: Iterable[dict[str, Any]], caminho: str) -> int:
+    por_cep: dict[int, bytes] = {}
+    for registro in registros:
+        digitos = re.sub(r"\D", "", str(registro.get("cep", "")))
+        if len(digitos) != 8 or int(digitos) in por_cep:
+            continue
+        valores = [str(registro.get(campo) or "").replace(SEPARADOR_CAMPOS, " ").strip() for campo in CAMPOS_REGISTRO]
+        dados = SEPARADOR_CAMPOS.join(valores).encode("utf-8")[:0xFFFF]
+        por_cep[int(digitos)] = dados
+
+    ordenados = sorted(por_cep.items())
+    offset = _CABECALHO.size + len(ordenados) * _ENTRADA.size
+    tabela = bytearray()
+    area = bytearray()
+    for cep, dados in ordenados:
+        tabela += _ENTRADA.pack(cep, offset + len(area), len(dados))
+        area += dados
+
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(_CABECALHO.pack(MAGICO, len(ordenados)))
+        arquivo.write(tabela)
+        arquivo.write(area)
+    os.replace(temporario, caminho)
+    return len(ordenados)
+
+
+ # Lê um CSV de CEPs (separador detectado) mapeando as colunas pelos nomes aceitos.
+def ler_csv_ceps(caminho: str, encoding: str = "utf-8-sig") -> Iterable[dict[str, Any]]:
+    with open(caminho, encoding=encoding, newline="") as arquivo:
+        amostra = arquivo.read(8192)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t|")
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.DictReader(arquivo, dialect=dialeto)
+        colunas = {nome.strip().lower(): nome for nome in leitor.fieldnames or []}
+        mapa = {
+            campo: next((colunas[alias] for alias in aliases if alias in colunas), None)
+            for campo, aliases in ALIASES_COLUNAS.items()
+        }
+        if mapa["cep"] is None:
+            raise ValueError("CSV sem coluna 'cep'.")
+        for linha in leitor:
+            yield {campo: linha.get(coluna, "") if coluna else "" for campo, coluna in mapa.items()}
+
+
+_indice: IndiceCep | None = None
+_indice_carregado = False
+_indice_lock = threading.Lock()
+
+
+ # Retorna o índice apontado por CEP_INDICE_LOCAL, ou None se não configurado ou ilegível.
+def obter_indice_cep() -> IndiceCep | None:
+    global _indice, _indice_carregado
+    with _indice_lock:
+        if not _indice_carregado:
+            _indice_carregado = True
+            caminho = (os.getenv("CEP_INDICE_LOCAL") or "").strip()
+            if caminho and os.path.exists(caminho):
+                try:
+                    _indice = IndiceCep(caminho)
+                except (OSError, ValueError) as exc:
+                    logger.warning("Indice local de CEPs ignorado: %s", exc)
+                    _indice = None
+        return _indice
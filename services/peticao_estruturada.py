@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from services.gemini_service import DEFAULT_MODEL, GeminiServiceError
+from services.prompt_builder import montar_prompt_estruturado
+from services.provedores_llm import gerar_json
+from services.secoes_peticao import identificar_secao, titulo_visivel_secao
+
+# Esquema de resposta (subconjunto OpenAPI aceito pelo Gemini em response_schema).
+ESQUEMA_PETICAO_ESTRUTURADA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "secoes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "titulo": {"type": "STRING"},
+                    "paragrafos": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "pedidos": {"type": "ARRAY", "items": {"type": "STRING"}},
+                },
+                "required": ["titulo", "paragrafos"],
+                "propertyOrdering": ["titulo", "paragrafos", "pedidos"],
+            },
+        },
+    },
+    "required": ["secoes"],
+}
+
+LIMITE_ESTRUTURAS_REGISTRADAS = 32
+
+_PADRAO_NUMERACAO_PEDIDO = re.compile(r"^\s*(?:\d{1,3}|[a-z])\s*[\.\)\-]\s+")
+
+_estruturas_por_texto: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_estruturas_lock = threading.Lock()
+
+
+ # Converte um valor em lista de textos limpos, ignorando itens vazios.
+def _lista_textos(valor: Any) -> list[str]:
+    if isinstance(valor, str):
+        valor = [valor]
+    if not isinstance(valor, list):
+        return []
+    return [str(item).strip() for item in valor if str(item or "").strip()]
+
+
+ # Valida e normaliza a resposta do modelo no formato {"secoes": [{titulo, paragrafos, pedidos}]}.
+def normalizar_peticao_estruturada(resposta: Any) -> dict[str, Any]:
+    secoes_brutas = resposta.get("secoes") if isinstance(resposta, dict) else None
+    if not isinstance(secoes_brutas, list):
+        raise GeminiServiceError("Resposta estruturada do Gemini sem a lista de secoes.")
+
+    secoes: list[dict[str, Any]] = []
+    for secao in secoes_brutas:
+        if not isinstance(secao, dict):
+            continue
+        titulo = str(secao.get("titulo") or "").strip()
+        paragrafos = _lista_textos(secao.get("paragrafos"))
+        pedidos = [_PADRAO_NUMERACAO_PEDIDO.sub("", pedido) for pedido in _lista_textos(secao.get("pedidos"))]
+        if not (titulo or paragrafos or pedidos):
+            continue
+        secoes.append(
+            {
+                "titulo": titulo,
+                "canonico": identificar_secao(titulo),
+                "paragrafos": paragrafos,
+                "pedidos": pedidos,
+            }
+        )
+
+    if not secoes:
+        raise GeminiServiceError("Gemini nao retornou secoes na resposta estruturada.")
+    return {"secoes": secoes}
+
+
+ # Achata a estrutura no texto simples usado hoje (titulos, paragrafos e pedidos numerados).
+def achatar_peticao_estruturada(estrutura: dict[str, Any]) -> str:
+    blocos: list[str] = []
+    for secao in estrutura.get("secoes", []):
+        linhas: list[str] = []
+        if titulo_visivel_secao(secao):
+            linhas.append(secao["titulo"])
+        partes = list(secao.get("paragrafos", []))
+        if secao.get("pedidos"):
+            partes.append("\n".join(f"{idx}. {pedido}" for idx, pedido in enumerate(secao["pedidos"], start=1)))
+        if linhas and partes:
+            linhas[0] = f"{linhas[0]}\n{partes.pop(0)}"
+        blocos.append("\n\n".join(linhas + partes))
+
+    texto = "\n\n".join(bloco for bloco in blocos if bloco.strip()).strip()
+    registrar_estrutura(texto, estrutura)
+    return texto
+
+
+ # Guarda a estrutura associada ao texto achatado, para os exportadores a reaproveitarem.
+def registrar_estrutura(texto: str, estrutura: dict[str, Any]) -> None:
+    chave = hashlib.sha1((texto or "").encode("utf-8")).hexdigest()
+    with _estruturas_lock:
+        _estruturas_por_texto[chave] = estrutura
+        _estruturas_por_texto.move_to_end(chave)
+        while len(_estruturas_por_texto) > LIMITE_ESTRUTURAS_REGISTRADAS:
+            _estruturas_por_texto.popitem(last=False)
+
+
+ # Retorna a estrutura que gerou exatamente este texto, ou None se o texto foi editado ou veio de texto livre.
+def estrutura_do_texto(texto: str) -> dict[str, Any] | None:
+    chave = hashlib.sha1((texto or "").encode("utf-8")).hexdigest()
+    with _estruturas_lock:
+        return _estruturas_por_texto.get(chave)
+
+
+ # Gera a peticao no modo estruturado e devolve a estrutura normalizada.
+def gerar_peticao_estruturada(
+    dados: dict[str, Any],
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    resposta = gerar_json(
+        montar_prompt_estruturado(dados),
+        ESQUEMA_PETICAO_ESTRUTURADA,
+        model=model,
+        api_key=api_key,
+        parametros=parametros,
+    )
+    return normalizar_peticao_estruturada(resposta)
+
+
+ # Gera no modo estruturado e devolve o texto achatado (compativel com o fluxo de texto livre).
+def gerar_texto_estruturado(
+    dados: dict[str, Any],
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> str:
+    return achatar_peticao_estruturada(
+        gerar_peticao_estruturada(dados, model=model, api_key=api_key, parametros=parametros)
+    )
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from services.comum import float_ambiente
+
+EJECAO_PADRAO_SEGUNDOS = 60.0
+EJECAO_MAXIMA_SEGUNDOS = 900.0
+JANELA_QUOTA_SEGUNDOS = 60.0
+ESPERA_MAXIMA_PADRAO_SEGUNDOS = 5.0
+ESPERA_MINIMA_SEGUNDOS = 0.01
+
+
+ # Lê as chaves do ambiente: GEMINI_API_KEYS (separadas por vírgula ou espaço) e as variáveis de chave única.
+def chaves_do_ambiente() -> list[str]:
+    brutas = (os.getenv("GEMINI_API_KEYS") or "").replace(",", " ").split()
+    brutas += [os.getenv("GEMINI_API_KEY") or "", os.getenv("GOOGLE_API_KEY") or ""]
+
+    chaves: list[str] = []
+    for chave in brutas:
+        chave = chave.strip()
+        if chave and chave not in chaves:
+            chaves.append(chave)
+    return chaves
+
+
+ # Mostra só o final da chave, para estatísticas e logs.
+def mascarar_chave(chave: str) -> str:
+    return f"...{chave[-4:]}" if len(chave) > 4 else "..."
+
+
+# Todas as chaves estão ejetadas ou no limite por minuto por mais tempo que a espera máxima.
+class ErroChavesSaturadas(RuntimeError):
+    def __init__(self, espera_s: float) -> None:
+        super().__init__(f"Todas as chaves da API estao sem cota no momento; a proxima libera em {espera_s:.1f}s.")
+        self.espera_s = espera_s
+
+
+# Estado de uma chave: requisições em andamento, janela de quota, erros e ejeção temporária.
+class _EstadoChave:
+    def __init__(self, chave: str) -> None:
+        self.chave = chave
+        self.em_andamento = 0
+        self.chamadas = 0
+        self.erros = 0
+        self.erros_quota = 0
+        self.quotas_seguidas = 0
+        self.ejetada_ate = 0.0
+        self.inicios_recentes: deque[float] = deque()
+
+
+# Distribui as chamadas entre várias chaves/projetos da API.
+class PoolChavesApi:
+    """
+    Escolhe a chave com menos requisições em andamento (empate em rodízio), pulando
+    chaves ejetadas após HTTP 429 e chaves que atingiram o limite por minuto
+    (GEMINI_RPM_POR_CHAVE, 0 = sem limite). A ejeção dobra a cada 429 seguido. Se nenhuma
+    chave estiver livre, espera a primeira que libera, até `espera_maxima` segundos; além
+    disso, levanta ErroChavesSaturadas na hora.
+    """
+
+    def __init__(
+        self,
+        chaves: list[str],
+        limite_por_minuto: int = 0,
+        ejecao_segundos: float = EJECAO_PADRAO_SEGUNDOS,
+        espera_maxima: float = ESPERA_MAXIMA_PADRAO_SEGUNDOS,
+    ) -> None:
+        self._estados = [_EstadoChave(chave) for chave in chaves]
+        self._limite_por_minuto = limite_por_minuto
+        self._ejecao_segundos = ejecao_segundos
+        self._espera_maxima = espera_maxima
+        self._rodizio = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._estados)
+
+    # Remove da janela de quota os inícios mais antigos que um minuto.
+    def _limpar_janela(self, estado: _EstadoChave, agora: float) -> None:
+        while estado.inicios_recentes and agora - estado.inicios_recentes[0] > JANELA_QUOTA_SEGUNDOS:
+            estado.inicios_recentes.popleft()
+
+    # Momento em que a chave volta a aceitar chamadas (fim da ejeção e vaga na janela por minuto).
+    def _livre_em(self, estado: _EstadoChave) -> float:
+        livre_em = estado.ejetada_ate
+        if self._limite_por_minuto and len(estado.inicios_recentes) >= self._limite_por_minuto:
+            livre_em = max(livre_em, estado.inicios_recentes[0] + JANELA_QUOTA_SEGUNDOS)
+        return livre_em
+
+    # Escolhe e reserva uma chave livre; sem nenhuma, retorna (None, segundos até a primeira liberar).
+    def _escolher(self, excluir: set[str]) -> tuple[_EstadoChave | None, float | None]:
+        agora = time.monotonic()
+        with self._lock:
+            candidatos = [estado for estado in self._estados if estado.chave not in excluir]
+            if not candidatos:
+                return None, None
+
+            for estado in candidatos:
+                self._limpar_janela(estado, agora)
+            saudaveis = [estado for estado in candidatos if self._livre_em(estado) <= agora]
+            if not saudaveis:
+                espera = min(self._livre_em(estado) for estado in candidatos) - agora
+                return None, max(espera, ESPERA_MINIMA_SEGUNDOS)
+
+            menor_carga = min(estado.em_andamento for estado in saudaveis)
+            empatados = [estado for estado in saudaveis if estado.em_andamento == menor_carga]
+            escolhido = empatados[next(self._rodizio) % len(empatados)]
+            escolhido.em_andamento += 1
+            escolhido.chamadas += 1
+            escolhido.inicios_recentes.append(agora)
+            return escolhido, None
+
+    # Espera (limitada) por uma chave livre; None quando todas as chaves já foram excluídas.
+    def _aguardar_chave(self, excluir: set[str]) -> _EstadoChave | None:
+        prazo = time.monotonic() + self._espera_maxima
+        while True:
+            estado, espera = self._escolher(excluir)
+            if espera is None:
+                return estado
+            if time.monotonic() + espera > prazo:
+                raise ErroChavesSaturadas(espera)
+            time.sleep(espera)
+
+    # Reserva uma chave durante o bloco; `excluir` evita repetir chaves que já falharam na mesma chamada.
+    @contextmanager
+    def reservar(self, excluir: set[str] | None = None) -> Iterator[str | None]:
+        estado = self._aguardar_chave(excluir or set())
+        try:
+            yield estado.chave if estado else None
+        finally:
+            if estado is not None:
+                with self._lock:
+                    estado.em_andamento -= 1
+
+    # Registra o resultado de uma chamada feita com a chave.
+    def registrar_resultado(self, chave: str, sucesso: bool, erro_quota: bool = False) -> None:
+        with self._lock:
+            estado = next((item for item in self._estados if item.chave == chave), None)
+            if estado is None:
+                return
+            if sucesso:
+                estado.quotas_seguidas = 0
+                return
+
+            estado.erros += 1
+            if erro_quota:
+                estado.erros_quota += 1
+                estado.quotas_seguidas += 1
+                ejecao = min(self._ejecao_segundos * 2 ** (estado.quotas_seguidas - 1), EJECAO_MAXIMA_SEGUNDOS)
+                estado.ejetada_ate = time.monotonic() + ejecao
+
+    # Estatísticas de saúde por chave (mascarada).
+    def resumo(self) -> list[dict[str, Any]]:
+        agora = time.monotonic()
+        with self._lock:
+            linhas: list[dict[str, Any]] = []
+            for estado in self._estados:
+                self._limpar_janela(estado, agora)
+                linhas.append(
+                    {
+                        "chave": mascarar_chave(estado.chave),
+                        "em_andamento": estado.em_andamento,
+                        "chamadas": estado.chamadas,
+                        "erros": estado.erros,
+                        "erros_quota": estado.erros_quota,
+                        "chamadas_ultimo_minuto": len(estado.inicios_recentes),
+                        "ejetada_por_s": round(max(0.0, estado.ejetada_ate - agora), 1),
+                    }
+                )
+            return linhas
+
+
+_pool: PoolChavesApi | None = None
+_pool_lock = threading.Lock()
+
+
+ # Retorna o pool configurado pelo ambiente (criado na primeira chamada).
+def obter_pool_chaves() -> PoolChavesApi:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolChavesApi(
+                chaves_do_ambiente(),
+                limite_por_minuto=int(float_ambiente("GEMINI_RPM_POR_CHAVE", 0)),
+                ejecao_segundos=float_ambiente("GEMINI_EJECAO_429_SEGUNDOS", EJECAO_PADRAO_SEGUNDOS),
+                espera_maxima=float_ambiente("GEMINI_ESPERA_CHAVE_SEGUNDOS", ESPERA_MAXIMA_PADRAO_SEGUNDOS),
+            )
+        return _pool
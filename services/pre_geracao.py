@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+LIMITE_PRE_GERACOES = 32
+LIMITE_SESSOES_AGENDAMENTO = 256
+
+
+ # Calcula a chave da pre-geracao a partir do modelo, do modo de geracao e do prompt.
+def chave_pre_geracao(prompt: str, model: str, modo: str = "completo") -> str:
+    bruto = f"{model}|{modo}|".encode("utf-8") + (prompt or "").encode("utf-8")
+    return hashlib.sha256(bruto).hexdigest()
+
+
+# Executa geracoes especulativas em segundo plano, indexadas pelo hash do prompt.
+class PreGeracaoEspeculativa:
+    """
+    Guarda no maximo `limite` resultados; ao atingir o limite, descarta os mais antigos.
+    O resultado so e servido para a mesma chave, ou seja, para o mesmo prompt.
+    """
+
+    def __init__(self, max_workers: int = 2, limite: int = LIMITE_PRE_GERACOES) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pre-geracao")
+        self._futuros: OrderedDict[str, Future[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._limite = limite
+        # Por sessao: agendamento pendente (timer e chave) e o Future da geracao disparada. O Future
+        # fica aqui, e nao so em `_futuros`, para que `descartar` nao esconda uma chamada ainda em curso.
+        self._sessoes: dict[str, dict[str, Any]] = {}
+
+    # Inicia a geracao da chave informada, se ainda nao existir uma em andamento ou concluida com sucesso.
+    def iniciar(self, chave: str, gerar: Callable[[], str]) -> Future[str]:
+        with self._lock:
+            return self._iniciar(chave, gerar)
+
+    # Igual a `iniciar`, com o lock ja obtido; retorna o Future da chave.
+    def _iniciar(self, chave: str, gerar: Callable[[], str]) -> Future[str]:
+        futuro = self._futuros.get(chave)
+        if futuro is not None and not (futuro.done() and futuro.exception() is not None):
+            self._futuros.move_to_end(chave)
+            return futuro
+
+        futuro = self._futuros[chave] = self._executor.submit(gerar)
+        while len(self._futuros) > self._limite:
+            _, antigo = self._futuros.popitem(last=False)
+            antigo.cancel()
+        return futuro
+
+    # Agenda a geracao da sessao para daqui a `espera` segundos, se o prompt (chave) nao mudar ate la.
+    def agendar(self, sessao: str, chave: str, gerar: Callable[[], str], espera: float) -> None:
+        """
+        Cada chave nova da sessao reinicia a contagem (debounce); enquanto uma geracao da sessao
+        estiver em andamento, nada novo e agendado, pois uma chamada em curso nao pode ser parada.
+        """
+        with self._lock:
+            estado = self._sessoes.pop(sessao, {})
+            self._sessoes[sessao] = estado
+            while len(self._sessoes) > LIMITE_SESSOES_AGENDAMENTO:
+                antigo = self._sessoes.pop(next(iter(self._sessoes)))
+                if antigo.get("timer") is not None:
+                    antigo["timer"].cancel()
+            em_andamento = estado.get("em_andamento")
+            if em_andamento is not None and not em_andamento.done():
+                return
+            if estado.get("agendada") == chave:
+                return
+            timer_anterior = estado.get("timer")
+            if timer_anterior is not None:
+                timer_anterior.cancel()
+            timer = threading.Timer(espera, self._disparar_agendada, (sessao, chave, gerar))
+            timer.daemon = True
+            estado.update({"agendada": chave, "timer": timer})
+        timer.start()
+
+    # Dispara a geracao agendada, se ela ainda for a mais recente da sessao.
+    def _disparar_agendada(self, sessao: str, chave: str, gerar: Callable[[], str]) -> None:
+        with self._lock:
+            estado = self._sessoes.get(sessao)
+            if estado is None or estado.get("agendada") != chave:
+                return
+            estado.update({"agendada": None, "timer": None, "em_andamento": self._iniciar(chave, gerar)})
+
+    # Cancela o agendamento pendente da sessao (a geracao ja iniciada segue ate o fim).
+    def cancelar_agendamento(self, sessao: str) -> None:
+        with self._lock:
+            estado = self._sessoes.get(sessao)
+            if estado is None:
+                return
+            timer = estado.pop("timer", None)
+            estado["agendada"] = None
+        if timer is not None:
+            timer.cancel()
+
+    # Indica se ha pre-geracao registrada para a chave.
+    def existe(self, chave: str) -> bool:
+        with self._lock:
+            return chave in self._futuros
+
+    # Indica se a pre-geracao da chave terminou com sucesso.
+    def pronta(self, chave: str) -> bool:
+        with self._lock:
+            futuro = self._futuros.get(chave)
+        return futuro is not None and futuro.done() and not futuro.cancelled() and futuro.exception() is None
+
+    # Retorna o texto pre-gerado (aguardando se ainda estiver em andamento) ou None se nao houver/falhar.
+    def obter(self, chave: str, timeout: float | None = None) -> str | None:
+        with self._lock:
+            futuro = self._futuros.get(chave)
+        if futuro is None or futuro.cancelled():
+            return None
+
+        try:
+            return futuro.result(timeout=timeout)
+        except Exception:
+            self.descartar(chave)
+            return None
+
+    # Descarta a pre-geracao da chave; se ainda nao comecou, cancela a execucao.
+    def descartar(self, chave: str) -> None:
+        with self._lock:
+            futuro = self._futuros.pop(chave, None)
+        if futuro is not None:
+            futuro.cancel()
+
+
+pre_geracao = PreGeracaoEspeculativa()
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import logging
 import re
+import threading
+import time
 import unicodedata
-from typing import Any
+from collections import OrderedDict
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
 
 PROMPT_BASE = """
 Voce e um assistente juridico (Brasil) e deve redigir uma PETICAO INICIAL completa, formal e bem estruturada.
@@ -658,11 +665,14 @@ def _montar_bloco_modelo_referencia(dados: dict[str, Any]) -> str:
         modelo.get("conteudo", ""),
     )
     truncado = _to_bool(modelo.get("conteudo_truncado"))
+    comprimido = _to_bool(modelo.get("conteudo_comprimido"))
 
     if not texto_modelo:
         return "Nenhum modelo de referencia anexado."
 
     sufixo = " (trecho truncado)" if truncado else ""
+    if comprimido:
+        sufixo = " (esqueleto de estilo: apenas titulos e frases de abertura, dados do modelo removidos)"
     return "\n".join(
         [
             f"- Arquivo anexado: {nome_arquivo or '[PREENCHER]'}",
@@ -672,10 +682,80 @@ def _montar_bloco_modelo_referencia(dados: dict[str, Any]) -> str:
     )
 
 
- # Constroi o prompt final, combinando regras base, guias e dados do caso.
-def montar_prompt(dados: dict[str, Any]) -> str:
-    dados = dados if isinstance(dados, dict) else {}
+DEPENDENCIAS_BLOCOS_PROMPT: dict[str, tuple[str, ...]] = {
+    "guia_area": ("contexto_processual", "area_direito", "campos_area_especificos"),
+    "guia_subtipo": ("contexto_processual", "area_direito", "campos_area_especificos"),
+    "guia_tipo_acao": ("contexto_processual", "area_direito", "tipo_acao", "campos_area_especificos"),
+    "personalizacao": (
+        "contexto_processual",
+        "area_direito",
+        "tipo_acao",
+        "rito",
+        "comarca_uf",
+        "foro_vara",
+        "campos_area_especificos",
+        "estrutura_peticao",
+        "fundamentacao",
+        "narrativa",
+        "pedidos",
+        "pedidos_detalhados",
+        "parametros_finais",
+        "observacoes_estrategicas",
+        "observacoes",
+        "partes",
+        "autor",
+        "reu",
+        "advogado",
+    ),
+    "modelo_referencia": ("modelo_referencia",),
+}
+
+LIMITE_CACHE_BLOCOS_PROMPT = 256
+
+CARACTERES_POR_TOKEN = 4
+
+_cache_blocos_prompt: OrderedDict[tuple[str, str], str] = OrderedDict()
+_cache_blocos_lock = threading.Lock()
+_hooks_relatorio_prompt: list[Callable[[dict[str, Any]], None]] = []
+
+
+ # Calcula um hash estavel do sub-payload do qual um bloco depende.
+def _hash_subpayload(valor: Any) -> str:
+    serializado = json.dumps(valor, ensure_ascii=False, default=str)
+    return hashlib.sha1(serializado.encode("utf-8")).hexdigest()
+
+
+ # Recorta do payload apenas as chaves de primeiro nivel informadas.
+def _recortar_payload(dados: dict[str, Any], chaves: tuple[str, ...]) -> dict[str, Any]:
+    return {chave: dados[chave] for chave in chaves if chave in dados}
+
 
+ # Retorna o bloco memoizado pela chave (nome, hash) ou o constroi e guarda no cache LRU.
+def _obter_bloco_memoizado(nome: str, assinatura: str, construir: Callable[[], str]) -> tuple[str, bool]:
+    chave = (nome, assinatura)
+    with _cache_blocos_lock:
+        if chave in _cache_blocos_prompt:
+            _cache_blocos_prompt.move_to_end(chave)
+            return _cache_blocos_prompt[chave], True
+
+    bloco = construir()
+
+    with _cache_blocos_lock:
+        _cache_blocos_prompt[chave] = bloco
+        _cache_blocos_prompt.move_to_end(chave)
+        while len(_cache_blocos_prompt) > LIMITE_CACHE_BLOCOS_PROMPT:
+            _cache_blocos_prompt.popitem(last=False)
+    return bloco, False
+
+
+ # Esvazia o cache de blocos do prompt (util apos alterar guias em tempo de execucao).
+def limpar_cache_blocos_prompt() -> None:
+    with _cache_blocos_lock:
+        _cache_blocos_prompt.clear()
+
+
+ # Classifica area e tipo de acao do caso para escolher os guias do prompt.
+def _classificar_caso(dados: dict[str, Any]) -> dict[str, str]:
     area_raw = _coletar_area_direito(dados)
     area_norm = _normalize_area_direito(area_raw)
 
@@ -687,10 +767,29 @@ def montar_prompt(dados: dict[str, Any]) -> str:
             tipo_acao = tipo_inferido
 
     area = _coletar_area(dados)
-    area_display = area or area_raw
-    area_guia = _resolver_area_para_guia(area or area_raw)
-    guia_area = GUIA_POR_AREA.get(area_guia, "")
+    return {
+        "area_raw": area_raw,
+        "area_norm": area_norm,
+        "area_display": area or area_raw,
+        "area_guia": _resolver_area_para_guia(area or area_raw),
+        "tipo_acao_raw": tipo_acao_raw,
+        "tipo_acao": tipo_acao,
+    }
+
+
+ # Monta o bloco "GUIA POR AREA" do prompt.
+def _montar_bloco_guia_area(dados: dict[str, Any]) -> str:
+    classificacao = _classificar_caso(dados)
+    guia_area = GUIA_POR_AREA.get(classificacao["area_guia"], "")
+    return (
+        f"Area: {classificacao['area_display'] or '[PREENCHER]'}\n"
+        f"{guia_area or 'Nenhum guia especifico para a area.'}"
+    )
+
 
+ # Monta o bloco "GUIA POR SUBTIPO" do prompt (beneficio previdenciario ou reu em saude).
+def _montar_bloco_guia_subtipo(dados: dict[str, Any]) -> str:
+    area_guia = _classificar_caso(dados)["area_guia"]
     guia_sub = ""
     if area_guia == "Previdenciario":
         beneficio = _coletar_beneficio_previdenciario(dados)
@@ -698,30 +797,181 @@ def montar_prompt(dados: dict[str, Any]) -> str:
     elif area_guia == "Direito da Saude":
         reu_saude = _coletar_reu_saude(dados)
         guia_sub = _resolver_guia_saude_por_reu(reu_saude)
+    return guia_sub or "Nenhum guia de subtipo aplicavel."
+
 
+ # Monta o bloco de orientacao especifica pelo tipo de acao.
+def _montar_bloco_guia_tipo_acao(dados: dict[str, Any]) -> str:
+    tipo_acao = _classificar_caso(dados)["tipo_acao"]
     guia = TIPO_ACAO_GUIDE.get(tipo_acao, TIPO_ACAO_GUIDE["Outro"])
-    bloco_personalizacao = _montar_bloco_personalizacao(dados, tipo_acao_raw, tipo_acao)
-    bloco_modelo_referencia = _montar_bloco_modelo_referencia(dados)
+    return f"Tipo: {tipo_acao}\n{guia}"
+
+
+ # Monta o bloco de personalizacao a partir do sub-payload, classificando o tipo de acao.
+def _montar_bloco_personalizacao_caso(dados: dict[str, Any]) -> str:
+    classificacao = _classificar_caso(dados)
+    return _montar_bloco_personalizacao(dados, classificacao["tipo_acao_raw"], classificacao["tipo_acao"])
+
+
+CONSTRUTORES_BLOCOS_PROMPT: dict[str, Callable[[dict[str, Any]], str]] = {
+    "guia_area": _montar_bloco_guia_area,
+    "guia_subtipo": _montar_bloco_guia_subtipo,
+    "guia_tipo_acao": _montar_bloco_guia_tipo_acao,
+    "personalizacao": _montar_bloco_personalizacao_caso,
+    "modelo_referencia": _montar_bloco_modelo_referencia,
+}
+
+
+ # Serializa o JSON do caso por chave de primeiro nivel, reaproveitando fragmentos inalterados.
+def _montar_bloco_dados_json(dados: dict[str, Any]) -> tuple[str, str, bool]:
+    if not dados:
+        return json.dumps(dados, ensure_ascii=False, indent=2), _hash_subpayload(dados), False
+    if not all(isinstance(chave, str) for chave in dados):
+        dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
+        return dados_json, _hash_subpayload(dados_json), False
+
+    fragmentos: list[str] = []
+    assinaturas: list[str] = []
+    todos_reaproveitados = True
+    for chave, valor in dados.items():
+        assinatura = _hash_subpayload(valor)
+        assinaturas.append(f"{chave}:{assinatura}")
+        fragmento, reaproveitado = _obter_bloco_memoizado(
+            f"dados_json.{chave}",
+            assinatura,
+            lambda valor=valor: json.dumps(valor, ensure_ascii=False, indent=2).replace("\n", "\n  "),
+        )
+        fragmentos.append(f"  {json.dumps(chave, ensure_ascii=False)}: {fragmento}")
+        todos_reaproveitados = todos_reaproveitados and reaproveitado
+
+    dados_json = "{\n" + ",\n".join(fragmentos) + "\n}"
+    return dados_json, _hash_subpayload(assinaturas), todos_reaproveitados
+
+
+ # Monta (ou reaproveita do cache) todos os blocos variaveis do prompt e suas assinaturas.
+def _montar_blocos_prompt(
+    dados: dict[str, Any],
+    medicoes: dict[str, dict[str, Any]] | None = None,
+) -> tuple[dict[str, str], dict[str, str]]:
+    blocos: dict[str, str] = {}
+    assinaturas: dict[str, str] = {}
+
+    for nome, construir in CONSTRUTORES_BLOCOS_PROMPT.items():
+        inicio = time.perf_counter()
+        subpayload = _recortar_payload(dados, DEPENDENCIAS_BLOCOS_PROMPT[nome])
+        assinatura = _hash_subpayload(subpayload)
+        assinaturas[nome] = assinatura
+        blocos[nome], reaproveitado = _obter_bloco_memoizado(nome, assinatura, lambda: construir(subpayload))
+        if medicoes is not None:
+            medicoes[nome] = _medir_bloco(blocos[nome], time.perf_counter() - inicio, reaproveitado)
+
+    inicio = time.perf_counter()
+    blocos["dados_json"], assinaturas["dados_json"], reaproveitado = _montar_bloco_dados_json(dados)
+    if medicoes is not None:
+        medicoes["dados_json"] = _medir_bloco(blocos["dados_json"], time.perf_counter() - inicio, reaproveitado)
+    return blocos, assinaturas
+
+
+ # Estima tokens pelo numero de caracteres (aproximacao de ~4 caracteres por token).
+def estimar_tokens(texto: str) -> int:
+    return (len(texto or "") + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+ # Registra tamanho, tokens estimados, tempo e uso de cache de um bloco do prompt.
+def _medir_bloco(texto: str, segundos: float, reaproveitado: bool) -> dict[str, Any]:
+    return {
+        "caracteres": len(texto),
+        "tokens_estimados": estimar_tokens(texto),
+        "tempo_ms": round(segundos * 1000, 3),
+        "cache": reaproveitado,
+    }
+
+
+ # Descreve as decisoes de classificacao usadas para escolher os guias do prompt.
+def _decisoes_classificacao(dados: dict[str, Any]) -> dict[str, str]:
+    classificacao = _classificar_caso(dados)
+    area_guia = classificacao["area_guia"]
+
+    guia_sub = ""
+    guias_sub: dict[str, str] = {}
+    if area_guia == "Previdenciario":
+        guia_sub = _resolver_guia_previdenciario_por_beneficio(_coletar_beneficio_previdenciario(dados))
+        guias_sub = GUIA_PREVIDENCIARIO_POR_BENEFICIO
+    elif area_guia == "Direito da Saude":
+        guia_sub = _resolver_guia_saude_por_reu(_coletar_reu_saude(dados))
+        guias_sub = GUIA_SAUDE_POR_REU
+
+    return {
+        **classificacao,
+        "guia_area_aplicado": area_guia if area_guia in GUIA_POR_AREA else "",
+        "guia_subtipo_aplicado": next((nome for nome, guia in guias_sub.items() if guia == guia_sub), ""),
+        "guia_tipo_acao_aplicado": classificacao["tipo_acao"] if classificacao["tipo_acao"] in TIPO_ACAO_GUIDE else "Outro",
+    }
+
+
+ # Registra uma funcao chamada com o relatorio de cada montagem de prompt completo.
+def registrar_hook_relatorio_prompt(hook: Callable[[dict[str, Any]], None]) -> None:
+    if hook not in _hooks_relatorio_prompt:
+        _hooks_relatorio_prompt.append(hook)
+
+
+ # Remove uma funcao registrada em registrar_hook_relatorio_prompt.
+def remover_hook_relatorio_prompt(hook: Callable[[dict[str, Any]], None]) -> None:
+    if hook in _hooks_relatorio_prompt:
+        _hooks_relatorio_prompt.remove(hook)
+
+
+ # Extrai os titulos da "ESTRUTURA BASE MINIMA" na ordem definida no prompt base.
+def extrair_estrutura_base(prompt_base: str = PROMPT_BASE) -> list[str]:
+    titulos: list[str] = []
+    dentro_estrutura = False
+    for linha in prompt_base.splitlines():
+        if linha.startswith("ESTRUTURA BASE MINIMA"):
+            dentro_estrutura = True
+            continue
+        if not dentro_estrutura:
+            continue
+        if not linha.strip():
+            break
+        match = re.match(r"^(\d+)\.\s+(.+?):?\s*$", linha)
+        if match:
+            titulos.append(match.group(2).strip())
+    return titulos
+
+
+ESTRUTURA_BASE_MINIMA = extrair_estrutura_base()
+SECOES_SEM_TITULO = {"ENDERECAMENTO", "FECHAMENTO"}
 
-    dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
+TAREFA_PETICAO_COMPLETA = (
+    "Gere a peticao completa seguindo as regras criticas, a estrutura base minima e as personalizacoes acima."
+)
+
+CHECKLIST_PETICAO_COMPLETA = """
+- Nao inventar fatos/leis/documentos.
+- Usar [PREENCHER] quando faltar dado essencial.
+- Pedidos enumerados e alinhados ao JSON.
+- Retornar somente o texto final da peticao (sem markdown e sem explicacoes adicionais).
+""".strip()
+
+
+ # Monta a parte comum do prompt (regras, guias, personalizacao, modelo e JSON do caso).
+def _montar_contexto_prompt(blocos: dict[str, str]) -> str:
     return f"""{PROMPT_BASE}
 
 GUIA POR AREA:
-Area: {area_display or '[PREENCHER]'}
-{guia_area or 'Nenhum guia especifico para a area.'}
+{blocos["guia_area"]}
 
 GUIA POR SUBTIPO (quando aplicavel):
-{guia_sub or 'Nenhum guia de subtipo aplicavel.'}
+{blocos["guia_subtipo"]}
 
 ORIENTACAO ESPECIFICA PELO TIPO DE ACAO:
-Tipo: {tipo_acao}
-{guia}
+{blocos["guia_tipo_acao"]}
 
 INSTRUCOES DE PERSONALIZACAO DO CASO:
-{bloco_personalizacao}
+{blocos["personalizacao"]}
 
 MODELO DE REFERENCIA (opcional):
-{bloco_modelo_referencia}
+{blocos["modelo_referencia"]}
 
 REGRAS DE USO DO MODELO DE REFERENCIA:
 - Use o modelo apenas para estilo, organizacao e tom de redacao.
@@ -729,19 +979,175 @@ REGRAS DE USO DO MODELO DE REFERENCIA:
 - Nunca copiar fatos, dados sensiveis, pedidos ou qualificacoes do modelo para este caso sem suporte no JSON.
 
 DADOS DO CASO (JSON):
-{dados_json}
+{blocos["dados_json"]}"""
+
+
+ # Junta contexto, tarefa e checklist no formato final enviado ao modelo.
+def _finalizar_prompt(contexto: str, tarefa: str, checklist: str) -> str:
+    return f"""{contexto}
 
 TAREFA:
-Gere a peticao completa seguindo as regras criticas, a estrutura base minima e as personalizacoes acima.
+{tarefa}
 
 CHECKLIST FINAL (auto-validacao antes de responder):
+{checklist}
+"""
+
+
+ # Monta o prompt completo e, quando pedido (ou havendo hooks), o relatorio de montagem por bloco.
+def _construir_prompt(dados: dict[str, Any], com_relatorio: bool) -> tuple[str, dict[str, str], dict[str, Any] | None]:
+    dados = dados if isinstance(dados, dict) else {}
+    medir = com_relatorio or bool(_hooks_relatorio_prompt)
+    medicoes: dict[str, dict[str, Any]] | None = {} if medir else None
+
+    inicio = time.perf_counter()
+    blocos, assinaturas = _montar_blocos_prompt(dados, medicoes)
+    inicio_final = time.perf_counter()
+    prompt = _finalizar_prompt(_montar_contexto_prompt(blocos), TAREFA_PETICAO_COMPLETA, CHECKLIST_PETICAO_COMPLETA)
+    fim = time.perf_counter()
+
+    if medicoes is None:
+        return prompt, assinaturas, None
+
+    relatorio: dict[str, Any] = {
+        "blocos": {
+            "regras_base": _medir_bloco(PROMPT_BASE, 0.0, False),
+            **medicoes,
+        },
+        "classificacao": _decisoes_classificacao(dados),
+        "total_caracteres": len(prompt),
+        "total_tokens_estimados": estimar_tokens(prompt),
+        "tempo_total_ms": round((fim - inicio) * 1000, 3),
+    }
+    # Instrucoes fixas: o molde do prompt sem os blocos variaveis e sem as regras base.
+    molde = _finalizar_prompt(
+        _montar_contexto_prompt({nome: "" for nome in blocos}), TAREFA_PETICAO_COMPLETA, CHECKLIST_PETICAO_COMPLETA
+    )
+    relatorio["blocos"]["instrucoes_fixas"] = _medir_bloco(molde[len(PROMPT_BASE):], fim - inicio_final, False)
+
+    # Hook com defeito nao pode derrubar a montagem (pre-geracao e fila tambem passam por aqui).
+    for hook in list(_hooks_relatorio_prompt):
+        try:
+            hook(relatorio)
+        except Exception:
+            logger.warning("Hook de relatorio do prompt falhou: %r", hook, exc_info=True)
+    return prompt, assinaturas, relatorio
+
+
+ # Monta o prompt e devolve junto as assinaturas (hash) de cada bloco, para comparar builds.
+def montar_prompt_com_assinaturas(dados: dict[str, Any]) -> tuple[str, dict[str, str]]:
+    prompt, assinaturas, _ = _construir_prompt(dados, com_relatorio=False)
+    return prompt, assinaturas
+
+
+ # Monta o prompt e devolve o relatorio de montagem (tamanho, tokens e tempo por bloco e classificacao).
+def montar_prompt_com_relatorio(dados: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    prompt, assinaturas, relatorio = _construir_prompt(dados, com_relatorio=True)
+    relatorio = relatorio or {}
+    relatorio["assinaturas"] = assinaturas
+    return prompt, relatorio
+
+
+ # Monta um prompt que pede somente as secoes indicadas, com o mesmo contexto do caso.
+def montar_prompt_secoes(dados: dict[str, Any], secoes: list[str], instrucoes_extras: str = "") -> str:
+    dados = dados if isinstance(dados, dict) else {}
+    blocos, _ = _montar_blocos_prompt(dados)
+
+    lista_secoes = "\n".join(
+        f"- {secao} (sem titulo; redigir direto o conteudo)" if secao in SECOES_SEM_TITULO else f"- {secao}"
+        for secao in secoes
+    )
+    tarefa = f"""Redija SOMENTE as secoes abaixo da peticao, nesta ordem, iniciando cada uma com o titulo exatamente como escrito:
+{lista_secoes}
+As demais secoes da estrutura base minima serao redigidas separadamente: nao as inclua e nao repita enderecamento ou fechamento fora das secoes pedidas.
+Se houver secoes personalizadas em `estrutura_peticao` ou subtopicos (ex.: DA TUTELA DE URGENCIA) que pertencam a estas secoes, inclua-os aqui."""
+    if instrucoes_extras:
+        tarefa = f"{tarefa}\n{instrucoes_extras.strip()}"
+    checklist = """
 - Nao inventar fatos/leis/documentos.
 - Usar [PREENCHER] quando faltar dado essencial.
-- Pedidos enumerados e alinhados ao JSON.
-- Retornar somente o texto final da peticao (sem markdown e sem explicacoes adicionais).
+- Pedidos enumerados e alinhados ao JSON (quando a secao de pedidos estiver entre as solicitadas).
+- Retornar somente o texto das secoes solicitadas (sem markdown e sem explicacoes adicionais).
+""".strip()
+    return _finalizar_prompt(_montar_contexto_prompt(blocos), tarefa, checklist)
+
+
+INSTRUCOES_SAIDA_ESTRUTURADA = """
+- Responder em JSON no esquema pedido: uma entrada em `secoes` para cada secao, na ordem da estrutura base minima.
+- `titulo` exatamente como na estrutura base (ENDERECAMENTO e FECHAMENTO tambem); `paragrafos` com um paragrafo por item, sem o titulo.
+- Na secao DOS PEDIDOS, cada pedido vai em `pedidos`, um por item e sem numeracao (a numeracao e aplicada na exportacao).
+""".strip()
+
+
+ # Monta o prompt da peticao completa pedindo a resposta no esquema JSON de secoes.
+def montar_prompt_estruturado(dados: dict[str, Any]) -> str:
+    dados = dados if isinstance(dados, dict) else {}
+    blocos, _ = _montar_blocos_prompt(dados)
+    checklist = CHECKLIST_PETICAO_COMPLETA.replace(
+        "- Retornar somente o texto final da peticao (sem markdown e sem explicacoes adicionais).",
+        INSTRUCOES_SAIDA_ESTRUTURADA,
+    )
+    return _finalizar_prompt(_montar_contexto_prompt(blocos), TAREFA_PETICAO_COMPLETA, checklist)
+
+
+CHAVES_CONTEXTO_SECAO = ("contexto_processual", "area_direito", "tipo_acao", "campos_area_especificos", "partes")
+
+DEPENDENCIAS_SECOES: dict[str, tuple[str, ...]] = {
+    "ENDERECAMENTO": (),
+    "QUALIFICACAO DAS PARTES": ("autor", "reu"),
+    "DOS FATOS": ("narrativa", "fatos"),
+    "DO DIREITO": ("fundamentacao", "narrativa", "parametros_finais", "observacoes_estrategicas", "estrutura_peticao"),
+    "DOS PEDIDOS": ("pedidos", "pedidos_detalhados", "parametros_finais", "fundamentacao"),
+    "DO VALOR DA CAUSA": ("parametros_finais", "valor_causa"),
+    "DAS PROVAS": ("narrativa",),
+    "REQUERIMENTOS FINAIS": ("parametros_finais",),
+    "FECHAMENTO": ("advogado",),
+}
+
+
+ # Monta o prompt para reescrever uma unica secao, enviando so a parte do caso que ela usa.
+def montar_prompt_regeneracao_secao(dados: dict[str, Any], secao: str, texto_atual: str) -> str:
+    dados = dados if isinstance(dados, dict) else {}
+    chaves = CHAVES_CONTEXTO_SECAO + DEPENDENCIAS_SECOES.get(secao, tuple(dados.keys()))
+    dados_secao = _recortar_payload(dados, chaves)
+
+    instrucoes = f"""O JSON do caso foi recortado para esta secao: nao use [PREENCHER] para dados que pertencem a outras secoes e nao sao necessarios aqui.
+O usuario pediu uma nova versao desta secao. Texto atual (substitua por uma redacao melhor, mantendo os mesmos dados):
+{(texto_atual or "").strip() or "[secao vazia]"}"""
+    return montar_prompt_secoes(dados_secao, [secao], instrucoes_extras=instrucoes)
+
+
+ # Monta o prompt da revisao de consistencia aplicada apos juntar secoes geradas em separado.
+def montar_prompt_revisao_consistencia(texto: str) -> str:
+    estrutura = "\n".join(f"{idx}. {titulo}" for idx, titulo in enumerate(ESTRUTURA_BASE_MINIMA))
+    return f"""Voce e um revisor juridico. A peticao inicial abaixo foi redigida por secoes, em paralelo.
+Revise SOMENTE a consistencia entre as secoes:
+- remova repeticoes entre secoes e mantenha a ordem da estrutura base minima;
+- alinhe os pedidos com os fatos e fundamentos ja escritos, mantendo a numeracao continua;
+- uniformize nomes das partes, termos e o marcador [PREENCHER].
+Nao acrescente fatos, dados, provas ou fundamentos que nao estejam no texto.
+Retorne somente o texto final completo da peticao (sem markdown e sem explicacoes adicionais).
+
+ESTRUTURA BASE MINIMA:
+{estrutura}
+
+PETICAO:
+{texto}
 """
 
 
+ # Lista os blocos cujas assinaturas mudaram entre dois builds do prompt.
+def blocos_alterados(assinaturas_anteriores: dict[str, str] | None, assinaturas_atuais: dict[str, str]) -> list[str]:
+    anteriores = assinaturas_anteriores or {}
+    return [nome for nome, assinatura in assinaturas_atuais.items() if anteriores.get(nome) != assinatura]
+
+
+ # Constroi o prompt final, combinando regras base, guias e dados do caso.
+def montar_prompt(dados: dict[str, Any]) -> str:
+    prompt, _ = montar_prompt_com_assinaturas(dados)
+    return prompt
+
+
 # Backward-compatible aliases for earlier app versions.
  # Mantem compatibilidade com versoes antigas que montam payload via kwargs.
 def build_case_payload(**kwargs: Any) -> dict[str, Any]:
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Protocol, runtime_checkable
+
+from services import brasilapi
+from services.brasilapi import ClienteHttpPool, ErroConsulta
+from services.comum import float_ambiente
+
+VIACEP_URL_PADRAO = "https://viacep.com.br"
+RECEITAWS_URL_PADRAO = "https://receitaws.com.br"
+PROVEDORES_CEP_PADRAO = "brasilapi,viacep"
+PROVEDORES_CNPJ_PADRAO = "brasilapi"
+ATRASO_ESCALONAMENTO_PADRAO = 0.3
+JANELA_LATENCIAS_PROVEDOR = 200
+
+logger = logging.getLogger(__name__)
+
+
+# Interface dos provedores de CEP/CNPJ: respostas no formato da BrasilAPI, "não encontrado" como ErroConsulta(status=404).
+@runtime_checkable
+class ProvedorConsulta(Protocol):
+    nome: str
+    tipos: tuple[str, ...]
+
+    def consultar(self, tipo: str, digitos: str) -> dict[str, Any]: ...
+
+
+# BrasilAPI (CEP e CNPJ), pelo cliente compartilhado do módulo brasilapi.
+class ProvedorBrasilApi:
+    nome = "brasilapi"
+    tipos = ("cep", "cnpj")
+
+    def consultar(self, tipo: str, digitos: str) -> dict[str, Any]:
+        if tipo == "cnpj":
+            return brasilapi.consultar_cnpj(digitos)
+        return brasilapi.consultar_cep(digitos)
+
+
+# ViaCEP (só CEP), normalizado para os campos da BrasilAPI (street, neighborhood, city, state).
+class ProvedorViaCep:
+    nome = "viacep"
+    tipos = ("cep",)
+
+    def __init__(self, cliente: ClienteHttpPool) -> None:
+        self._cliente = cliente
+
+    def consultar(self, tipo: str, digitos: str) -> dict[str, Any]:
+        dados = brasilapi.consultar_json(
+            f"/ws/{digitos}/json/",
+            {
+                "nao_encontrado": "CEP não encontrado no ViaCEP.",
+                "http": "Falha ao consultar CEP no ViaCEP (HTTP {status}).",
+                "conexao": "Não foi possível conectar ao ViaCEP.",
+                "timeout": "Tempo esgotado na consulta do CEP no ViaCEP.",
+                "invalida": "Resposta inválida do ViaCEP.",
+            },
+            cliente=self._cliente,
+        )
+        # O ViaCEP responde 200 com {"erro": true} para CEP inexistente.
+        if dados.get("erro"):
+            raise ErroConsulta("CEP não encontrado no ViaCEP.", status=404)
+        return {
+            "cep": re.sub(r"\D", "", str(dados.get("cep", digitos))),
+            "state": str(dados.get("uf", "")),
+            "city": str(dados.get("localidade", "")),
+            "neighborhood": str(dados.get("bairro", "")),
+            "street": str(dados.get("logradouro", "")),
+            "service": self.nome,
+        }
+
+
+# ReceitaWS (só CNPJ), normalizado para os campos da BrasilAPI usados no preenchimento.
+class ProvedorReceitaWs:
+    nome = "receitaws"
+    tipos = ("cnpj",)
+
+    def __init__(self, cliente: ClienteHttpPool) -> None:
+        self._cliente = cliente
+
+    def consultar(self, tipo: str, digitos: str) -> dict[str, Any]:
+        dados = brasilapi.consultar_json(
+            f"/v1/cnpj/{digitos}",
+            {
+                "nao_encontrado": "CNPJ não encontrado na ReceitaWS.",
+                "http": "Falha ao consultar CNPJ na ReceitaWS (HTTP {status}).",
+                "conexao": "Não foi possível conectar à ReceitaWS.",
+                "timeout": "Tempo esgotado na consulta do CNPJ na ReceitaWS.",
+                "invalida": "Resposta inválida da ReceitaWS.",
+            },
+            cliente=self._cliente,
+        )
+        # A ReceitaWS responde 200 com {"status": "ERROR"} para CNPJ inexistente ou inválido.
+        if str(dados.get("status", "")).upper() == "ERROR":
+            raise ErroConsulta("CNPJ não encontrado na ReceitaWS.", status=404)
+
+        telefone = str(dados.get("telefone", "")).split("/")[0]
+        natureza = re.sub(r"^[\d-]+\s*-\s*", "", str(dados.get("natureza_juridica", "")))
+        qsa = [
+            {"nome_socio": str(socio.get("nome", "")), "nome_representante_legal": str(socio.get("nome_rep_legal", ""))}
+            for socio in dados.get("qsa") or []
+            if isinstance(socio, dict)
+        ]
+        return {
+            "cnpj": digitos,
+            "razao_social": str(dados.get("nome", "")),
+            "nome_fantasia": str(dados.get("fantasia", "")),
+            "natureza_juridica": natureza,
+            "descricao_tipo_de_logradouro": "",
+            "logradouro": str(dados.get("logradouro", "")),
+            "numero": str(dados.get("numero", "")),
+            "complemento": str(dados.get("complemento", "")),
+            "bairro": str(dados.get("bairro", "")),
+            "municipio": str(dados.get("municipio", "")),
+            "uf": str(dados.get("uf", "")),
+            "cep": re.sub(r"\D", "", str(dados.get("cep", ""))),
+            "descricao_situacao_cadastral": str(dados.get("situacao", "")),
+            "ddd_telefone_1": re.sub(r"\D", "", telefone),
+            "email": str(dados.get("email", "")),
+            "qsa": qsa,
+        }
+
+
+# Latência e desfechos por provedor: chamadas, sucessos, "não encontrado", erros e vitórias na corrida.
+class EstatisticasProvedores:
+    def __init__(self, tamanho_janela: int = JANELA_LATENCIAS_PROVEDOR) -> None:
+        self._tamanho_janela = tamanho_janela
+        self._lock = threading.Lock()
+        self._dados: dict[str, dict[str, Any]] = {}
+
+    def _do_provedor(self, nome: str) -> dict[str, Any]:
+        return self._dados.setdefault(
+            nome,
+            {
+                "chamadas": 0,
+                "sucessos": 0,
+                "nao_encontrados": 0,
+                "erros": 0,
+                "vitorias": 0,
+                "latencias": deque(maxlen=self._tamanho_janela),
+            },
+        )
+
+    # Registra uma chamada concluída; desfecho é "sucesso", "nao_encontrado" ou "erro".
+    def registrar(self, nome: str, segundos: float, desfecho: str) -> None:
+        campo = {"sucesso": "sucessos", "nao_encontrado": "nao_encontrados"}.get(desfecho, "erros")
+        with self._lock:
+            dados = self._do_provedor(nome)
+            dados["chamadas"] += 1
+            dados[campo] += 1
+            dados["latencias"].append(segundos)
+
+    # Registra que a resposta do provedor foi a usada.
+    def registrar_vitoria(self, nome: str) -> None:
+        with self._lock:
+            self._do_provedor(nome)["vitorias"] += 1
+
+    # Resumo por provedor, com p50/p95 das latências recentes (ms).
+    def resumo(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            copia = {nome: {**dados, "latencias": sorted(dados["latencias"])} for nome, dados in self._dados.items()}
+        resultado: dict[str, dict[str, Any]] = {}
+        for nome, dados in copia.items():
+            latencias = dados.pop("latencias")
+            chamadas = dados["chamadas"]
+            resultado[nome] = {
+                **dados,
+                "taxa_erro": dados["erros"] / chamadas if chamadas else 0.0,
+                "p50_ms": _percentil_ms(latencias, 50),
+                "p95_ms": _percentil_ms(latencias, 95),
+            }
+        return resultado
+
+
+ # Percentil (em ms) de latências já ordenadas, em segundos.
+def _percentil_ms(latencias: list[float], percentil: float) -> float:
+    if not latencias:
+        return 0.0
+    posicao = min(len(latencias) - 1, int(round(percentil / 100 * (len(latencias) - 1))))
+    return round(latencias[posicao] * 1000, 1)
+
+
+estatisticas_provedores = EstatisticasProvedores()
+_executor_provedores = ThreadPoolExecutor(max_workers=8, thread_name_prefix="consulta-provedores")
+
+
+ # Chama o provedor medindo a latência e registrando o desfecho.
+def _chamar_medindo(provedor: ProvedorConsulta, tipo: str, digitos: str) -> dict[str, Any]:
+    inicio = time.perf_counter()
+    try:
+        dados = provedor.consultar(tipo, digitos)
+    except ErroConsulta as exc:
+        desfecho = "nao_encontrado" if exc.status == 404 else "erro"
+        estatisticas_provedores.registrar(provedor.nome, time.perf_counter() - inicio, desfecho)
+        raise
+    except Exception:
+        estatisticas_provedores.registrar(provedor.nome, time.perf_counter() - inicio, "erro")
+        raise
+    estatisticas_provedores.registrar(provedor.nome, time.perf_counter() - inicio, "sucesso")
+    return dados
+
+
+ # Consulta os provedores em ordem, disparando o próximo quando o anterior falha ou demora mais que `atraso`.
+def consultar_com_provedores(
+    tipo: str,
+    digitos: str,
+    provedores: list[ProvedorConsulta],
+    atraso: float | None = ATRASO_ESCALONAMENTO_PADRAO,
+) -> dict[str, Any]:
+    """
+    A primeira resposta com dados vence; as tentativas ainda em andamento terminam em segundo
+    plano só para as estatísticas. `atraso=0` dispara todos juntos (corrida) e `atraso=None` só
+    passa ao próximo depois de uma falha (sequencial). "Não encontrado" só é definitivo quando
+    todos os provedores concordam; senão sobe o último erro de indisponibilidade.
+    """
+    digitos = re.sub(r"\D", "", digitos or "")
+    candidatos = [provedor for provedor in provedores if tipo in provedor.tipos]
+    if not candidatos:
+        raise ErroConsulta(f"Nenhum provedor configurado para consulta de {tipo.upper()}.")
+
+    if len(candidatos) == 1:
+        dados = _chamar_medindo(candidatos[0], tipo, digitos)
+        estatisticas_provedores.registrar_vitoria(candidatos[0].nome)
+        return dados
+
+    tentativas: dict[Future[dict[str, Any]], ProvedorConsulta] = {}
+
+    def disparar(provedor: ProvedorConsulta) -> Future[dict[str, Any]]:
+        futuro = _executor_provedores.submit(_chamar_medindo, provedor, tipo, digitos)
+        tentativas[futuro] = provedor
+        return futuro
+
+    fila = list(candidatos)
+    pendentes = {disparar(fila.pop(0))}
+    if atraso == 0:
+        pendentes.update(disparar(provedor) for provedor in fila)
+        fila.clear()
+
+    nao_encontrado: ErroConsulta | None = None
+    ultimo_erro: BaseException | None = None
+    while pendentes:
+        espera = atraso if atraso and fila else None
+        concluidos, pendentes = wait(pendentes, timeout=espera, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            erro = futuro.exception()
+            if erro is None:
+                estatisticas_provedores.registrar_vitoria(tentativas[futuro].nome)
+                return futuro.result()
+            if isinstance(erro, ErroConsulta) and erro.status == 404:
+                nao_encontrado = nao_encontrado or erro
+            else:
+                ultimo_erro = erro
+        # Passou o atraso sem resposta, ou alguém falhou: o próximo provedor entra já.
+        if fila:
+            pendentes.add(disparar(fila.pop(0)))
+
+    if ultimo_erro is None and nao_encontrado is not None:
+        raise nao_encontrado
+    if isinstance(ultimo_erro, ErroConsulta):
+        raise ultimo_erro
+    raise ErroConsulta(f"Falha ao consultar {tipo.upper()}: {ultimo_erro}") from ultimo_erro
+
+
+_instancias: dict[str, ProvedorConsulta] = {}
+_instancias_lock = threading.Lock()
+
+
+ # Cliente com pool próprio para um provedor alternativo (timeouts iguais aos da BrasilAPI).
+def _cliente_alternativo(variavel_url: str, url_padrao: str) -> ClienteHttpPool:
+    return ClienteHttpPool(
+        (os.getenv(variavel_url) or url_padrao).strip(),
+        tamanho_pool=int(float_ambiente("BRASILAPI_POOL", brasilapi.TAMANHO_POOL_PADRAO)),
+        timeout_conexao=float_ambiente("BRASILAPI_TIMEOUT_CONEXAO", brasilapi.TIMEOUT_CONEXAO_PADRAO),
+        timeout_leitura=float_ambiente("BRASILAPI_TIMEOUT_LEITURA", brasilapi.TIMEOUT_LEITURA_PADRAO),
+    )
+
+
+ # Retorna (criando uma vez) o provedor pelo nome, ou None se o nome for desconhecido.
+def _provedor_por_nome(nome: str) -> ProvedorConsulta | None:
+    with _instancias_lock:
+        if nome not in _instancias:
+            if nome == "brasilapi":
+                _instancias[nome] = ProvedorBrasilApi()
+            elif nome == "viacep":
+                _instancias[nome] = ProvedorViaCep(_cliente_alternativo("VIACEP_BASE_URL", VIACEP_URL_PADRAO))
+            elif nome == "receitaws":
+                _instancias[nome] = ProvedorReceitaWs(_cliente_alternativo("RECEITAWS_BASE_URL", RECEITAWS_URL_PADRAO))
+            else:
+                logger.warning("Provedor de consulta desconhecido ignorado: %s", nome)
+                return None
+        return _instancias[nome]
+
+
+ # Provedores do tipo na ordem de CONSULTA_PROVEDORES_CEP / CONSULTA_PROVEDORES_CNPJ (nomes separados por vírgula).
+def provedores_configurados(tipo: str) -> list[ProvedorConsulta]:
+    padrao = PROVEDORES_CEP_PADRAO if tipo == "cep" else PROVEDORES_CNPJ_PADRAO
+    nomes = (os.getenv(f"CONSULTA_PROVEDORES_{tipo.upper()}") or padrao).split(",")
+    provedores = [_provedor_por_nome(nome.strip().lower()) for nome in nomes if nome.strip()]
+    return [provedor for provedor in provedores if provedor is not None and tipo in provedor.tipos]
+
+
+ # Atraso de escalonamento conforme CONSULTA_MODO (escalonado, corrida ou sequencial).
+def _atraso_configurado() -> float | None:
+    modo = (os.getenv("CONSULTA_MODO") or "escalonado").strip().lower()
+    if modo == "corrida":
+        return 0.0
+    if modo == "sequencial":
+        return None
+    return float_ambiente("CONSULTA_ATRASO_ESCALONAMENTO", ATRASO_ESCALONAMENTO_PADRAO)
+
+
+ # Consulta dados de CNPJ nos provedores configurados.
+def consultar_cnpj(cnpj_digitos: str) -> dict[str, Any]:
+    return consultar_com_provedores("cnpj", cnpj_digitos, provedores_configurados("cnpj"), _atraso_configurado())
+
+
+ # Consulta endereço por CEP nos provedores configurados.
+def consultar_cep(cep_digitos: str) -> dict[str, Any]:
+    return consultar_com_provedores("cep", cep_digitos, provedores_configurados("cep"), _atraso_configurado())
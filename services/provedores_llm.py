@@ -0,0 +1,436 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, Protocol, runtime_checkable
+
+from services import gemini_service
+from services.gemini_service import DEFAULT_MODEL, ErroCotaGemini, GeminiServiceError
+from services.prompt_builder import ESTRUTURA_BASE_MINIMA, SECOES_SEM_TITULO
+from services.secoes_peticao import identificar_secao
+from services.telemetria import telemetria
+from services.comum import float_ambiente
+
+CARACTERES_POR_TOKEN_FALSO = 4
+INTERVALO_TRECHO_FALSO = 0.1
+
+_PADRAO_SECOES_PEDIDAS = re.compile(r"Redija SOMENTE as secoes abaixo[^\n]*\n((?:- [^\n]+\n?)+)")
+
+FRASES_FALSAS = (
+    "A parte autora expoe os fatos conforme os dados informados no formulario.",
+    "Os documentos anexos comprovam a relacao juridica descrita nesta peca.",
+    "A conduta narrada contraria a legislacao aplicavel e a boa-fe objetiva.",
+    "O dano decorre diretamente da falha descrita, conforme os elementos dos autos.",
+    "Requer-se a apreciacao do pedido com base nos fundamentos a seguir expostos.",
+    "Eventuais dados ausentes estao indicados com [PREENCHER] para complementacao.",
+)
+
+PEDIDOS_FALSOS = (
+    "a citacao da parte re para, querendo, apresentar resposta;",
+    "a procedencia dos pedidos formulados nesta inicial;",
+    "a condenacao da parte re ao pagamento de [PREENCHER];",
+    "a condenacao em custas processuais e honorarios advocaticios.",
+)
+
+
+# Interface comum dos provedores de LLM: chamada síncrona, assíncrona, em streaming e com saída JSON.
+@runtime_checkable
+class ProvedorLLM(Protocol):
+    nome: str
+
+    def gerar(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> str: ...
+
+    async def gerar_async(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> str: ...
+
+    def gerar_stream(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> Iterator[str]: ...
+
+    def gerar_json(
+        self,
+        prompt: str,
+        esquema: dict[str, Any],
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> Any: ...
+
+    def gerar_candidatos(
+        self,
+        prompt: str,
+        quantidade: int = 2,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> list[str]: ...
+
+
+# Provedor real: delega ao gemini_service (pool de chaves, hedge e coalescência).
+class ProvedorGemini:
+    nome = "gemini"
+
+    def gerar(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> str:
+        return gemini_service.gerar_peticao(prompt, model=model, api_key=api_key, parametros=parametros)
+
+    # O SDK é síncrono no caminho com pool/hedge; a chamada roda em thread para não travar o loop.
+    async def gerar_async(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> str:
+        return await asyncio.to_thread(self.gerar, prompt, model, api_key, parametros)
+
+    def gerar_stream(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> Iterator[str]:
+        return gemini_service.gerar_peticao_stream(prompt, model=model, api_key=api_key, parametros=parametros)
+
+    def gerar_json(
+        self,
+        prompt: str,
+        esquema: dict[str, Any],
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> Any:
+        return gemini_service.gerar_json(prompt, esquema, model=model, api_key=api_key, parametros=parametros)
+
+    def gerar_candidatos(
+        self,
+        prompt: str,
+        quantidade: int = 2,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> list[str]:
+        return gemini_service.gerar_candidatos(
+            prompt, quantidade, model=model, api_key=api_key, parametros=parametros
+        )
+
+
+# Provedor local para testes de carga: petições determinísticas, latência simulada e injeção de erros.
+class ProvedorFalso:
+    """
+    O texto depende só do prompt (mesmo prompt, mesma petição). O tempo até o primeiro trecho segue
+    uma lognormal (mediana e sigma em segundos) e o restante sai na taxa de tokens por segundo
+    (0 = instantâneo). `taxa_erro` e `taxa_cota` são probabilidades de falha genérica e de HTTP 429.
+    """
+
+    nome = "falso"
+
+    def __init__(
+        self,
+        latencia_mediana: float = 1.0,
+        latencia_sigma: float = 0.5,
+        tokens_por_segundo: float = 80.0,
+        taxa_erro: float = 0.0,
+        taxa_cota: float = 0.0,
+        semente: int | None = None,
+    ) -> None:
+        self.latencia_mediana = latencia_mediana
+        self.latencia_sigma = latencia_sigma
+        self.tokens_por_segundo = tokens_por_segundo
+        self.taxa_erro = taxa_erro
+        self.taxa_cota = taxa_cota
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+
+    # Cria o provedor a partir das variáveis LLM_FALSO_* do ambiente.
+    @classmethod
+    def do_ambiente(cls) -> ProvedorFalso:
+        semente = os.getenv("LLM_FALSO_SEMENTE", "").strip()
+        return cls(
+            latencia_mediana=float_ambiente("LLM_FALSO_LATENCIA_MEDIANA", 1.0),
+            latencia_sigma=float_ambiente("LLM_FALSO_LATENCIA_SIGMA", 0.5),
+            tokens_por_segundo=float_ambiente("LLM_FALSO_TOKENS_POR_SEGUNDO", 80.0),
+            taxa_erro=float_ambiente("LLM_FALSO_TAXA_ERRO", 0.0),
+            taxa_cota=float_ambiente("LLM_FALSO_TAXA_COTA", 0.0),
+            semente=int(semente) if semente.isdigit() else None,
+        )
+
+    # Sorteia o tempo até o primeiro trecho e a falha injetada (se houver) para uma chamada.
+    def _sortear_chamada(self, model: str) -> tuple[float, GeminiServiceError | None]:
+        with self._lock:
+            atraso = (
+                self.latencia_mediana * self._aleatorio.lognormvariate(0.0, self.latencia_sigma)
+                if self.latencia_mediana > 0
+                else 0.0
+            )
+            sorteio = self._aleatorio.random()
+        if sorteio < self.taxa_cota:
+            return atraso, ErroCotaGemini(f"Cota simulada esgotada (HTTP 429) no provedor falso ({model}).")
+        if sorteio < self.taxa_cota + self.taxa_erro:
+            return atraso, GeminiServiceError(f"Falha simulada no provedor falso ({model}).")
+        return atraso, None
+
+    # Monta a petição determinística do prompt (só as seções pedidas, quando o prompt for por seções).
+    def texto_para(self, prompt: str) -> str:
+        semente = int.from_bytes(hashlib.sha256((prompt or "").encode("utf-8")).digest()[:8], "big")
+        aleatorio = random.Random(semente)
+
+        encontrado = _PADRAO_SECOES_PEDIDAS.search(prompt or "")
+        if encontrado:
+            secoes = [linha[2:].split(" (", 1)[0].strip() for linha in encontrado.group(1).splitlines()]
+        else:
+            secoes = list(ESTRUTURA_BASE_MINIMA)
+
+        blocos: list[str] = []
+        for secao in secoes:
+            if secao == "ENDERECAMENTO":
+                blocos.append("EXCELENTISSIMO(A) SENHOR(A) DOUTOR(A) JUIZ(A) DE DIREITO DA [PREENCHER]")
+            elif secao == "FECHAMENTO":
+                blocos.append("Termos em que, pede deferimento.\n\n[PREENCHER], [PREENCHER].\n\nAdvogado(a) - OAB [PREENCHER]")
+            elif secao == "DOS PEDIDOS":
+                pedidos = "\n".join(f"{idx}. {pedido}" for idx, pedido in enumerate(PEDIDOS_FALSOS, start=1))
+                blocos.append(f"{secao}\nDiante do exposto, requer:\n{pedidos}")
+            else:
+                paragrafos = [
+                    " ".join(aleatorio.sample(FRASES_FALSAS, 3)) for _ in range(aleatorio.randint(1, 3))
+                ]
+                titulo = "" if secao in SECOES_SEM_TITULO else f"{secao}\n"
+                blocos.append(titulo + "\n\n".join(paragrafos))
+        return "\n\n".join(blocos)
+
+    # Divide o texto em trechos de ~INTERVALO_TRECHO_FALSO segundos na taxa de tokens configurada.
+    def _trechos(self, texto: str) -> tuple[list[str], float]:
+        if self.tokens_por_segundo <= 0:
+            return [texto], 0.0
+        caracteres = max(1, int(self.tokens_por_segundo * INTERVALO_TRECHO_FALSO * CARACTERES_POR_TOKEN_FALSO))
+        trechos = [texto[idx:idx + caracteres] for idx in range(0, len(texto), caracteres)]
+        return trechos, INTERVALO_TRECHO_FALSO
+
+    # Estimativa de uso de tokens no mesmo formato de `usage_metadata` do Gemini, para a telemetria.
+    def _uso_estimado(self, prompt: str, texto: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            prompt_token_count=len(prompt or "") // CARACTERES_POR_TOKEN_FALSO,
+            candidates_token_count=len(texto) // CARACTERES_POR_TOKEN_FALSO,
+            cached_content_token_count=0,
+        )
+
+    # Texto do prompt cortado no limite de saída da rota, como faria o modelo ao atingir max_output_tokens.
+    def _texto_limitado(self, prompt: str, parametros: dict[str, Any] | None) -> str:
+        texto = self.texto_para(prompt)
+        limite = int((parametros or {}).get("max_output_tokens") or 0)
+        return texto[: limite * CARACTERES_POR_TOKEN_FALSO] if limite else texto
+
+    def _stream(self, prompt: str, model: str, tipo: str, parametros: dict[str, Any] | None) -> Iterator[str]:
+        medicao = telemetria.iniciar(self.nome, model, tipo)
+        try:
+            atraso, erro = self._sortear_chamada(model)
+            time.sleep(atraso)
+            if erro is not None:
+                medicao.finalizar("erro_cota" if isinstance(erro, ErroCotaGemini) else "erro")
+                raise erro
+
+            texto = self._texto_limitado(prompt, parametros)
+            medicao.uso(self._uso_estimado(prompt, texto))
+            trechos, intervalo = self._trechos(texto)
+            for idx, trecho in enumerate(trechos):
+                if idx and intervalo:
+                    time.sleep(intervalo)
+                medicao.primeiro_byte()
+                yield trecho
+            medicao.finalizar("sucesso")
+        finally:
+            medicao.finalizar("cancelada")
+
+    def gerar_stream(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> Iterator[str]:
+        return self._stream(prompt, model, "stream", parametros)
+
+    def gerar(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> str:
+        return "".join(self._stream(prompt, model, "texto", parametros)).strip()
+
+    async def gerar_stream_async(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> AsyncIterator[str]:
+        medicao = telemetria.iniciar(self.nome, model, "stream_async")
+        try:
+            atraso, erro = self._sortear_chamada(model)
+            await asyncio.sleep(atraso)
+            if erro is not None:
+                medicao.finalizar("erro_cota" if isinstance(erro, ErroCotaGemini) else "erro")
+                raise erro
+
+            texto = self._texto_limitado(prompt, parametros)
+            medicao.uso(self._uso_estimado(prompt, texto))
+            trechos, intervalo = self._trechos(texto)
+            for idx, trecho in enumerate(trechos):
+                if idx and intervalo:
+                    await asyncio.sleep(intervalo)
+                medicao.primeiro_byte()
+                yield trecho
+            medicao.finalizar("sucesso")
+        finally:
+            medicao.finalizar("cancelada")
+
+    async def gerar_async(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> str:
+        partes = [trecho async for trecho in self.gerar_stream_async(prompt, model, api_key, parametros)]
+        return "".join(partes).strip()
+
+    # Devolve a petição determinística já no formato do esquema de saída estruturada.
+    def gerar_json(
+        self,
+        prompt: str,
+        esquema: dict[str, Any],
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> Any:
+        texto = self.gerar(prompt, model=model, api_key=api_key, parametros=parametros)
+        secoes: list[dict[str, Any]] = []
+        for bloco in texto.split("\n\n"):
+            linhas = bloco.splitlines()
+            titulo = identificar_secao(linhas[0]) if linhas else ""
+            if titulo or not secoes:
+                secoes.append({"titulo": titulo or "ENDERECAMENTO", "paragrafos": [], "pedidos": []})
+            corpo = linhas[1:] if titulo and titulo not in SECOES_SEM_TITULO else linhas
+            for linha in corpo:
+                item = re.match(r"^\d+\.\s+(.+)$", linha)
+                if item:
+                    secoes[-1]["pedidos"].append(item.group(1))
+                else:
+                    secoes[-1]["paragrafos"].append(linha)
+        return {"secoes": secoes}
+
+    # Várias versões numa única espera simulada; a primeira é igual à de `gerar` para o mesmo prompt.
+    def gerar_candidatos(
+        self,
+        prompt: str,
+        quantidade: int = 2,
+        model: str = DEFAULT_MODEL,
+        api_key: str | None = None,
+        parametros: dict[str, Any] | None = None,
+    ) -> list[str]:
+        medicao = telemetria.iniciar(self.nome, model, "candidatos")
+        try:
+            atraso, erro = self._sortear_chamada(model)
+            time.sleep(atraso)
+            if erro is not None:
+                medicao.finalizar("erro_cota" if isinstance(erro, ErroCotaGemini) else "erro")
+                raise erro
+
+            textos = [
+                self._texto_limitado(prompt if idx == 0 else f"{prompt}\n[versao {idx + 1}]", parametros).strip()
+                for idx in range(max(1, quantidade))
+            ]
+            medicao.primeiro_byte()
+            medicao.uso(self._uso_estimado(prompt, "".join(textos)))
+            medicao.finalizar("sucesso")
+            return textos
+        finally:
+            medicao.finalizar("cancelada")
+
+
+PROVEDORES_LLM = ("gemini", "falso")
+
+_provedor: ProvedorLLM | None = None
+_provedor_lock = threading.Lock()
+
+
+# Retorna o provedor escolhido por LLM_PROVEDOR ("gemini", padrão, ou "falso"); criado uma vez por processo.
+def obter_provedor() -> ProvedorLLM:
+    global _provedor
+    with _provedor_lock:
+        if _provedor is None:
+            nome = (os.getenv("LLM_PROVEDOR") or "gemini").strip().lower()
+            if nome not in PROVEDORES_LLM:
+                raise GeminiServiceError(
+                    f"LLM_PROVEDOR invalido: {nome!r}. Use um destes: {', '.join(PROVEDORES_LLM)}."
+                )
+            _provedor = ProvedorFalso.do_ambiente() if nome == "falso" else ProvedorGemini()
+        return _provedor
+
+
+# Substitui o provedor do processo (ex.: testes de carga com parâmetros próprios).
+def definir_provedor(provedor: ProvedorLLM | None) -> None:
+    global _provedor
+    with _provedor_lock:
+        _provedor = provedor
+
+
+# Gera o texto da petição pelo provedor configurado.
+def gerar_peticao(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> str:
+    return obter_provedor().gerar(prompt, model=model, api_key=api_key, parametros=parametros)
+
+
+# Gera várias versões da petição para o mesmo prompt pelo provedor configurado.
+def gerar_candidatos(
+    prompt: str,
+    quantidade: int = 2,
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> list[str]:
+    return obter_provedor().gerar_candidatos(prompt, quantidade, model=model, api_key=api_key, parametros=parametros)
+
+
+# Gera a resposta JSON no esquema informado pelo provedor configurado.
+def gerar_json(
+    prompt: str,
+    esquema: dict[str, Any],
+    model: str = DEFAULT_MODEL,
+    api_key: str | None = None,
+    parametros: dict[str, Any] | None = None,
+) -> Any:
+    return obter_provedor().gerar_json(prompt, esquema, model=model, api_key=api_key, parametros=parametros)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+from services.prompt_builder import ESTRUTURA_BASE_MINIMA, SECOES_SEM_TITULO
+
+ALIASES_TITULOS_SECAO: dict[str, tuple[str, ...]] = {
+    "ENDERECAMENTO": ("enderecamento",),
+    "QUALIFICACAO DAS PARTES": ("qualificacao das partes", "da qualificacao das partes", "das partes"),
+    "DOS FATOS": ("dos fatos", "da sintese fatica", "sintese dos fatos"),
+    "DO DIREITO": ("do direito", "dos fundamentos juridicos", "da fundamentacao juridica", "do merito"),
+    "DOS PEDIDOS": ("dos pedidos", "do pedido"),
+    "DO VALOR DA CAUSA": ("do valor da causa", "valor da causa"),
+    "DAS PROVAS": ("das provas", "da producao de provas"),
+    "REQUERIMENTOS FINAIS": ("requerimentos finais", "dos requerimentos finais", "dos requerimentos"),
+    "FECHAMENTO": ("fechamento",),
+}
+
+PREFIXOS_FECHAMENTO = ("termos em que", "nestes termos")
+LIMITE_CARACTERES_CABECALHO = 80
+
+MARCADOR_PREENCHER = "[PREENCHER]"
+LIMITE_CACHE_INDICES = 32
+
+_PADRAO_NUMERACAO_CABECALHO = re.compile(r"^(?:\d{1,2}|[ivxlc]{1,5})\s*[\.\)\-:]\s*")
+_PADRAO_PEDIDO_NUMERADO = re.compile(r"^\s*(\d{1,3}|[a-z])\s*[\.\)\-]\s+\S")
+_TERMINADORES_LINHA = "\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+_cache_indices: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_cache_indices_lock = threading.Lock()
+
+
+ # Normaliza um candidato a titulo: sem acentos, minusculo, sem numeracao e sem pontuacao final.
+def _normalizar_cabecalho(linha: str) -> str:
+    texto = unicodedata.normalize("NFKD", linha or "")
+    texto = texto.encode("ascii", "ignore").decode("ascii").strip().lower()
+    texto = texto.strip("*#_ ")
+    texto = _PADRAO_NUMERACAO_CABECALHO.sub("", texto)
+    texto = re.sub(r"\s+", " ", texto)
+    return texto.rstrip(" :.-")
+
+
+ # Retorna o titulo canonico da estrutura base quando a linha e um cabecalho de secao.
+def identificar_secao(linha: str) -> str:
+    limpa = (linha or "").strip()
+    if not limpa or len(limpa) > LIMITE_CARACTERES_CABECALHO:
+        return ""
+
+    normalizado = _normalizar_cabecalho(limpa)
+    if normalizado.startswith(PREFIXOS_FECHAMENTO):
+        return "FECHAMENTO"
+
+    for titulo, aliases in ALIASES_TITULOS_SECAO.items():
+        if normalizado in aliases:
+            return titulo
+    return ""
+
+
+ # Indexa o texto em uma unica passada: paragrafos, cabecalhos, secoes, pedidos numerados e [PREENCHER].
+def _indexar(conteudo: str) -> dict[str, Any]:
+    paragrafos: list[tuple[int, int]] = []
+    cabecalhos: list[int] = []
+    secoes: list[dict[str, Any]] = []
+    pedidos: list[tuple[str, int, int]] = []
+    placeholders: list[int] = []
+    atual: dict[str, Any] = {"titulo": "ENDERECAMENTO", "cabecalho": "", "inicio": 0, "paragrafo": -1}
+
+    posicao = 0
+    for linha in conteudo.splitlines(keepends=True):
+        fim_linha = posicao + len(linha.rstrip(_TERMINADORES_LINHA))
+        indice_paragrafo = len(paragrafos)
+        paragrafos.append((posicao, fim_linha))
+
+        titulo = identificar_secao(linha)
+        if titulo:
+            atual["fim"] = posicao
+            secoes.append(atual)
+            atual = {"titulo": titulo, "cabecalho": linha.strip(), "inicio": posicao, "paragrafo": indice_paragrafo}
+            cabecalhos.append(indice_paragrafo)
+        elif atual["titulo"] == "DOS PEDIDOS":
+            match = _PADRAO_PEDIDO_NUMERADO.match(linha)
+            if match:
+                pedidos.append((match.group(1), posicao, fim_linha))
+
+        achado = linha.find(MARCADOR_PREENCHER)
+        while achado != -1:
+            placeholders.append(posicao + achado)
+            achado = linha.find(MARCADOR_PREENCHER, achado + len(MARCADOR_PREENCHER))
+
+        posicao += len(linha)
+
+    atual["fim"] = len(conteudo)
+    secoes.append(atual)
+
+    return {
+        "paragrafos": paragrafos,
+        "cabecalhos": frozenset(cabecalhos),
+        "secoes": [
+            secao
+            for secao in secoes
+            if secao["cabecalho"] or conteudo[secao["inicio"]:secao["fim"]].strip()
+        ],
+        "pedidos": pedidos,
+        "placeholders": placeholders,
+    }
+
+
+ # Retorna o indice do texto da peticao, reaproveitando o calculado para o mesmo hash de texto.
+def indexar_peticao(texto: str) -> dict[str, Any]:
+    """
+    O indice e compartilhado entre chamadas (cache por hash do texto): nao altere as listas retornadas.
+    Offsets sao posicoes de caractere em `texto`; paragrafos sao as linhas, sem o terminador.
+    """
+    conteudo = texto or ""
+    chave = hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+    with _cache_indices_lock:
+        if chave in _cache_indices:
+            _cache_indices.move_to_end(chave)
+            return _cache_indices[chave]
+
+    indice = _indexar(conteudo)
+    with _cache_indices_lock:
+        _cache_indices[chave] = indice
+        while len(_cache_indices) > LIMITE_CACHE_INDICES:
+            _cache_indices.popitem(last=False)
+    return indice
+
+
+ # Divide o texto em secoes da estrutura base, com offsets de inicio e fim no texto original.
+def dividir_em_secoes(texto: str) -> list[dict[str, Any]]:
+    """
+    O trecho anterior ao primeiro cabecalho reconhecido vira ENDERECAMENTO
+    (com cabecalho vazio). Subtopicos nao reconhecidos ficam dentro da secao anterior.
+    """
+    conteudo = texto or ""
+    return [
+        {**secao, "texto": conteudo[secao["inicio"]:secao["fim"]]}
+        for secao in indexar_peticao(conteudo)["secoes"]
+    ]
+
+
+ # Lista os titulos da estrutura base minima que nao aparecem no texto.
+def secoes_ausentes(texto: str, esperadas: list[str] | None = None) -> list[str]:
+    presentes = {secao["titulo"] for secao in dividir_em_secoes(texto) if secao["texto"].strip()}
+    return [titulo for titulo in (esperadas or ESTRUTURA_BASE_MINIMA) if titulo not in presentes]
+
+
+ # Substitui o trecho da secao de indice informado, preservando o restante do texto.
+def substituir_secao(texto: str, indice: int, novo_trecho: str) -> str:
+    secoes = dividir_em_secoes(texto)
+    if not 0 <= indice < len(secoes):
+        raise IndexError("Secao inexistente no texto da peticao.")
+
+    secao = secoes[indice]
+    conteudo = texto or ""
+    separador = "\n\n" if secao["fim"] < len(conteudo) else "\n"
+    return f"{conteudo[:secao['inicio']]}{novo_trecho.strip()}{separador}{conteudo[secao['fim']:]}"
+
+
+ # Indica se o titulo de uma secao estruturada aparece no texto (enderecamento e fechamento nao tem titulo proprio).
+def titulo_visivel_secao(secao: dict[str, Any]) -> bool:
+    titulo = str(secao.get("titulo") or "")
+    canonico = secao.get("canonico") or identificar_secao(titulo)
+    return bool(titulo) and not (canonico in SECOES_SEM_TITULO and titulo.upper() == canonico)
+
+
+ # Remove marcas de markdown que o modelo possa ter incluido no trecho.
+def limpar_markdown(texto: str) -> str:
+    linhas: list[str] = []
+    for linha in (texto or "").splitlines():
+        if linha.strip().startswith("```"):
+            continue
+        linha = re.sub(r"^\s*#{1,6}\s+", "", linha)
+        linhas.append(linha.replace("**", ""))
+    return "\n".join(linhas).strip()
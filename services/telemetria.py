@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterable, Protocol
+
+LIMITES_LATENCIA_SEGUNDOS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+JANELA_PERCENTIS = 500
+TIPOS_TOKENS = ("prompt", "candidatos", "cache")
+ENDERECO_METRICAS_PADRAO = "127.0.0.1"
+
+logger = logging.getLogger(__name__)
+
+
+# Destino dos eventos de telemetria (um evento por chamada ao LLM).
+class SinkTelemetria(Protocol):
+    def registrar(self, evento: dict[str, Any]) -> None: ...
+
+
+# Histograma cumulativo no formato OpenMetrics (contagem por limite superior, soma e total).
+class _Histograma:
+    def __init__(self, limites: tuple[float, ...] = LIMITES_LATENCIA_SEGUNDOS) -> None:
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.soma += valor
+        self.total += 1
+        for idx, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[idx] += 1
+
+
+# Agrega os eventos em memória: contadores, histogramas por modelo/resultado e janela para percentis.
+class SinkMemoria:
+    def __init__(self, janela: int = JANELA_PERCENTIS) -> None:
+        self._lock = threading.Lock()
+        self._chamadas: dict[tuple[str, str], int] = {}
+        self._tentativas_extras: dict[str, int] = {}
+        self._tokens: dict[tuple[str, str], int] = {}
+        self._latencia: dict[tuple[str, str], _Histograma] = {}
+        self._primeiro_byte: dict[str, _Histograma] = {}
+        self._recentes: deque[dict[str, Any]] = deque(maxlen=janela)
+
+    def registrar(self, evento: dict[str, Any]) -> None:
+        modelo = str(evento.get("modelo", ""))
+        resultado = str(evento.get("resultado", ""))
+        with self._lock:
+            chave = (modelo, resultado)
+            self._chamadas[chave] = self._chamadas.get(chave, 0) + 1
+            self._tentativas_extras[modelo] = self._tentativas_extras.get(modelo, 0) + int(evento.get("retentativas", 0))
+            for tipo in TIPOS_TOKENS:
+                quantidade = int(evento.get(f"tokens_{tipo}") or 0)
+                if quantidade:
+                    self._tokens[(modelo, tipo)] = self._tokens.get((modelo, tipo), 0) + quantidade
+            self._latencia.setdefault(chave, _Histograma()).observar(float(evento.get("latencia_s", 0.0)))
+            if evento.get("primeiro_byte_s") is not None:
+                self._primeiro_byte.setdefault(modelo, _Histograma()).observar(float(evento["primeiro_byte_s"]))
+            self._recentes.append(evento)
+
+    # Resumo para a interface: chamadas, taxa de erro, tokens e percentis de latência dos eventos recentes.
+    def resumo(self) -> dict[str, Any]:
+        with self._lock:
+            recentes = list(self._recentes)
+            chamadas = sum(self._chamadas.values())
+            erros = sum(
+                total for (_, resultado), total in self._chamadas.items() if resultado not in {"sucesso", "cancelada"}
+            )
+            tokens = {tipo: sum(v for (_, t), v in self._tokens.items() if t == tipo) for tipo in TIPOS_TOKENS}
+        return {
+            "chamadas": chamadas,
+            "taxa_erro": erros / chamadas if chamadas else 0.0,
+            "tokens": tokens,
+            **resumir_eventos(recentes),
+        }
+
+    # Exporta os agregados no formato de texto OpenMetrics.
+    def exportar_openmetrics(self) -> str:
+        linhas: list[str] = []
+        with self._lock:
+            linhas.append("# TYPE llm_chamadas counter")
+            for (modelo, resultado), total in sorted(self._chamadas.items()):
+                linhas.append(f'llm_chamadas_total{{modelo="{_rotulo(modelo)}",resultado="{_rotulo(resultado)}"}} {total}')
+
+            linhas.append("# TYPE llm_retentativas counter")
+            for modelo, total in sorted(self._tentativas_extras.items()):
+                linhas.append(f'llm_retentativas_total{{modelo="{_rotulo(modelo)}"}} {total}')
+
+            linhas.append("# TYPE llm_tokens counter")
+            for (modelo, tipo), total in sorted(self._tokens.items()):
+                linhas.append(f'llm_tokens_total{{modelo="{_rotulo(modelo)}",tipo="{tipo}"}} {total}')
+
+            linhas.append("# TYPE llm_latencia_segundos histogram")
+            for (modelo, resultado), histograma in sorted(self._latencia.items()):
+                rotulos = f'modelo="{_rotulo(modelo)}",resultado="{_rotulo(resultado)}"'
+                linhas.extend(_linhas_histograma("llm_latencia_segundos", rotulos, histograma))
+
+            linhas.append("# TYPE llm_primeiro_byte_segundos histogram")
+            for modelo, histograma in sorted(self._primeiro_byte.items()):
+                linhas.extend(_linhas_histograma("llm_primeiro_byte_segundos", f'modelo="{_rotulo(modelo)}"', histograma))
+        linhas.append("# EOF")
+        return "\n".join(linhas) + "\n"
+
+
+# Acrescenta cada evento como uma linha JSON no arquivo (útil para análise posterior pela CLI).
+class SinkJsonl:
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def registrar(self, evento: dict[str, Any]) -> None:
+        linha = json.dumps(evento, ensure_ascii=False)
+        with self._lock:
+            with open(self.caminho, "a", encoding="utf-8") as arquivo:
+                arquivo.write(linha + "\n")
+
+
+ # Escapa valores de rótulo do OpenMetrics.
+def _rotulo(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+ # Linhas de um histograma OpenMetrics (buckets cumulativos, +Inf, soma e contagem).
+def _linhas_histograma(nome: str, rotulos: str, histograma: _Histograma) -> list[str]:
+    linhas = [
+        f'{nome}_bucket{{{rotulos},le="{limite}"}} {contagem}'
+        for limite, contagem in zip(histograma.limites, histograma.contagens)
+    ]
+    linhas.append(f'{nome}_bucket{{{rotulos},le="+Inf"}} {histograma.total}')
+    linhas.append(f"{nome}_sum{{{rotulos}}} {histograma.soma:.6f}")
+    linhas.append(f"{nome}_count{{{rotulos}}} {histograma.total}")
+    return linhas
+
+
+ # Percentil simples (vizinho mais próximo) de uma lista já ordenada.
+def _percentil(ordenados: list[float], percentil: float) -> float | None:
+    if not ordenados:
+        return None
+    posicao = min(len(ordenados) - 1, int(round(percentil / 100 * (len(ordenados) - 1))))
+    return ordenados[posicao]
+
+
+ # Percentis de latência e primeiro byte de uma sequência de eventos.
+def resumir_eventos(eventos: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    lista = list(eventos)
+    latencias = sorted(float(evento.get("latencia_s", 0.0)) for evento in lista)
+    primeiros = sorted(float(evento["primeiro_byte_s"]) for evento in lista if evento.get("primeiro_byte_s") is not None)
+    return {
+        "eventos": len(lista),
+        "latencia_p50_s": _percentil(latencias, 50),
+        "latencia_p95_s": _percentil(latencias, 95),
+        "primeiro_byte_p50_s": _percentil(primeiros, 50),
+        "primeiro_byte_p95_s": _percentil(primeiros, 95),
+    }
+
+
+# Mede uma chamada ao LLM do início ao fim e envia o evento aos sinks ao finalizar.
+class MedicaoChamada:
+    def __init__(self, telemetria: Telemetria, provedor: str, modelo: str, tipo: str) -> None:
+        self._telemetria = telemetria
+        self._inicio = time.perf_counter()
+        self._finalizada = False
+        self.evento: dict[str, Any] = {
+            "provedor": provedor,
+            "modelo": modelo,
+            "tipo": tipo,
+            "primeiro_byte_s": None,
+            "retentativas": 0,
+            "tokens_prompt": 0,
+            "tokens_candidatos": 0,
+            "tokens_cache": 0,
+        }
+
+    # Marca o recebimento do primeiro trecho (só a primeira marcação vale).
+    def primeiro_byte(self) -> None:
+        if self.evento["primeiro_byte_s"] is None:
+            self.evento["primeiro_byte_s"] = round(time.perf_counter() - self._inicio, 4)
+
+    # Conta uma nova tentativa dentro da mesma chamada (ex.: troca de chave após 429).
+    def retentativa(self) -> None:
+        self.evento["retentativas"] += 1
+
+    # Copia as contagens de tokens de `usage_metadata` da resposta do Gemini (ausentes viram zero).
+    def uso(self, metadados: Any) -> None:
+        if metadados is None:
+            return
+        self.evento["tokens_prompt"] = int(getattr(metadados, "prompt_token_count", 0) or 0)
+        self.evento["tokens_candidatos"] = int(getattr(metadados, "candidates_token_count", 0) or 0)
+        self.evento["tokens_cache"] = int(getattr(metadados, "cached_content_token_count", 0) or 0)
+
+    # Registra o desfecho ("sucesso", "erro_cota", "erro" ou "cancelada"); chamadas repetidas são ignoradas.
+    def finalizar(self, resultado: str) -> None:
+        if self._finalizada:
+            return
+        self._finalizada = True
+        self.evento["resultado"] = resultado
+        self.evento["latencia_s"] = round(time.perf_counter() - self._inicio, 4)
+        self.evento["momento"] = round(time.time(), 3)
+        self._telemetria.registrar(self.evento)
+
+
+# Distribui os eventos entre os sinks configurados; o sink em memória está sempre presente.
+class Telemetria:
+    """
+    Com `ler_ambiente=True`, TELEMETRIA_JSONL é lido no primeiro evento, e não na importação:
+    assim vale o valor do .env carregado depois que os serviços já foram importados.
+    """
+
+    def __init__(self, sinks: list[SinkTelemetria] | None = None, ler_ambiente: bool = False) -> None:
+        self.memoria = SinkMemoria()
+        self._sinks: list[SinkTelemetria] = [self.memoria, *(sinks or [])]
+        self._lock = threading.Lock()
+        self._ambiente_pendente = ler_ambiente
+
+    # Acrescenta o sink em arquivo de TELEMETRIA_JSONL, uma única vez.
+    def _configurar_do_ambiente(self) -> None:
+        with self._lock:
+            if not self._ambiente_pendente:
+                return
+            self._ambiente_pendente = False
+            caminho = (os.getenv("TELEMETRIA_JSONL") or "").strip()
+            if caminho:
+                self._sinks.append(SinkJsonl(caminho))
+
+    def adicionar_sink(self, sink: SinkTelemetria) -> None:
+        with self._lock:
+            self._sinks.append(sink)
+
+    def iniciar(self, provedor: str, modelo: str, tipo: str = "texto") -> MedicaoChamada:
+        return MedicaoChamada(self, provedor, modelo, tipo)
+
+    def registrar(self, evento: dict[str, Any]) -> None:
+        if self._ambiente_pendente:
+            self._configurar_do_ambiente()
+        with self._lock:
+            sinks = list(self._sinks)
+        for sink in sinks:
+            try:
+                sink.registrar(evento)
+            except Exception:  # pragma: no cover
+                # Falha de telemetria nunca deve derrubar a geracao.
+                continue
+
+
+telemetria = Telemetria(ler_ambiente=True)
+
+_servidor_metricas: ThreadingHTTPServer | None = None
+_servidor_falhou = False
+_servidor_lock = threading.Lock()
+
+
+# Responde GET /metrics com o texto OpenMetrics do sink em memória.
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        corpo = telemetria.memoria.exportar_openmetrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        return
+
+
+ # Sobe (uma vez por processo) o endpoint /metrics em segundo plano, se TELEMETRIA_PORTA estiver definida.
+def iniciar_servidor_metricas(porta: int | None = None, endereco: str | None = None) -> int | None:
+    """
+    Escuta em TELEMETRIA_ENDERECO (padrão 127.0.0.1, só a máquina local; o endpoint não tem
+    autenticação). Se a porta estiver ocupada, registra o erro no log e segue sem o endpoint,
+    sem tentar de novo neste processo.
+    """
+    global _servidor_metricas, _servidor_falhou
+    if porta is None:
+        valor = (os.getenv("TELEMETRIA_PORTA") or "").strip()
+        if not valor.isdigit():
+            return None
+        porta = int(valor)
+    endereco = endereco or (os.getenv("TELEMETRIA_ENDERECO") or "").strip() or ENDERECO_METRICAS_PADRAO
+
+    with _servidor_lock:
+        if _servidor_metricas is None:
+            if _servidor_falhou:
+                return None
+            try:
+                _servidor_metricas = ThreadingHTTPServer((endereco, porta), _ManipuladorMetricas)
+            except OSError as exc:
+                _servidor_falhou = True
+                logger.error("Endpoint /metrics desativado (%s:%s): %s", endereco, porta, exc)
+                return None
+            threading.Thread(target=_servidor_metricas.serve_forever, name="telemetria-http", daemon=True).start()
+        return _servidor_metricas.server_address[1]
+
+
+ # Lê eventos de um arquivo JSONL gerado pelo SinkJsonl.
+def ler_eventos_jsonl(caminho: str) -> list[dict[str, Any]]:
+    eventos: list[dict[str, Any]] = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if linha:
+                eventos.append(json.loads(linha))
+    return eventos
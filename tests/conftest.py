@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from scripts.servidor_brasilapi_local import ServidorBrasilApiLocal, iniciar_em_segundo_plano  # noqa: E402
+
+
+ # Fábrica de servidores locais (BrasilAPI, ViaCEP e ReceitaWS) em threads, encerrados ao fim do teste.
+@pytest.fixture
+def servidor_local() -> Iterator[Callable[..., ServidorBrasilApiLocal]]:
+    servidores: list[ServidorBrasilApiLocal] = []
+
+    def criar(**opcoes: float) -> ServidorBrasilApiLocal:
+        servidor = iniciar_em_segundo_plano(**opcoes)
+        servidores.append(servidor)
+        return servidor
+
+    yield criar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from services.brasilapi import ClienteHttpPool, ErroConsulta, consultar_json
+
+MENSAGENS = {
+    "nao_encontrado": "nao encontrado",
+    "http": "http {status}",
+    "conexao": "conexao",
+    "timeout": "timeout",
+    "invalida": "invalida",
+}
+
+
+def test_reaproveita_a_mesma_conexao(servidor_local):
+    servidor = servidor_local()
+    cliente = ClienteHttpPool(servidor.url, tamanho_pool=1)
+
+    for _ in range(5):
+        assert consultar_json("/api/cep/v1/01310100", MENSAGENS, cliente=cliente)["state"] == "SP"
+
+    assert cliente.resumo() == {"conexoes_abertas": 1, "requisicoes": 5, "ociosas": 1}
+    assert servidor.conexoes == 1
+    cliente.fechar()
+
+
+def test_refaz_requisicao_quando_servidor_fechou_conexao_ociosa(servidor_local):
+    servidor = servidor_local(tempo_ocioso=0.2)
+    cliente = ClienteHttpPool(servidor.url, tamanho_pool=1)
+
+    assert consultar_json("/api/cep/v1/01310100", MENSAGENS, cliente=cliente)["cep"] == "01310100"
+    time.sleep(0.5)
+    assert consultar_json("/api/cep/v1/20040002", MENSAGENS, cliente=cliente)["state"] == "RJ"
+
+    assert cliente.resumo()["conexoes_abertas"] == 2
+    assert cliente.resumo()["requisicoes"] == 2
+    assert servidor.conexoes == 2
+    cliente.fechar()
+
+
+def test_404_vira_erro_consulta_com_status(servidor_local):
+    servidor = servidor_local()
+    cliente = ClienteHttpPool(servidor.url)
+
+    with pytest.raises(ErroConsulta, match="nao encontrado") as erro:
+        consultar_json("/api/cnpj/v1/00000000000000", MENSAGENS, cliente=cliente)
+
+    assert erro.value.status == 404
+    cliente.fechar()
+
+
+def test_falha_do_servidor_vira_erro_http(servidor_local):
+    servidor = servidor_local(taxa_erro=1.0)
+    cliente = ClienteHttpPool(servidor.url)
+
+    with pytest.raises(ErroConsulta, match="http 503") as erro:
+        consultar_json("/api/cep/v1/01310100", MENSAGENS, cliente=cliente)
+
+    assert erro.value.status == 503
+    cliente.fechar()
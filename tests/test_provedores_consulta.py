@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from services.brasilapi import ClienteHttpPool, ErroConsulta
+from services.provedores_consulta import ProvedorReceitaWs, ProvedorViaCep, consultar_com_provedores
+
+
+# Provedor que responde "não encontrado" para qualquer documento.
+class ProvedorSemRegistro:
+    tipos = ("cep", "cnpj")
+
+    def __init__(self, nome: str) -> None:
+        self.nome = nome
+        self.chamadas = 0
+
+    def consultar(self, tipo: str, digitos: str) -> dict:
+        self.chamadas += 1
+        raise ErroConsulta("não encontrado", status=404)
+
+
+def _viacep(servidor) -> ProvedorViaCep:
+    return ProvedorViaCep(ClienteHttpPool(servidor.url))
+
+
+def test_escalonado_dispara_o_proximo_quando_o_primeiro_demora(servidor_local):
+    lento = servidor_local(atraso=1.0)
+    rapido = servidor_local()
+
+    inicio = time.perf_counter()
+    dados = consultar_com_provedores("cep", "01310-100", [_viacep(lento), _viacep(rapido)], atraso=0.1)
+    decorrido = time.perf_counter() - inicio
+
+    assert dados["city"] == "São Paulo"
+    assert decorrido < 0.8
+    assert rapido.requisicoes == 1
+
+
+def test_escalonado_nao_dispara_o_proximo_quando_o_primeiro_responde(servidor_local):
+    primeiro = servidor_local()
+    segundo = servidor_local()
+
+    dados = consultar_com_provedores("cep", "20040002", [_viacep(primeiro), _viacep(segundo)], atraso=0.5)
+
+    assert dados["state"] == "RJ"
+    assert primeiro.requisicoes == 1
+    assert segundo.requisicoes == 0
+
+
+def test_segue_para_o_proximo_quando_um_falha(servidor_local):
+    instavel = servidor_local(taxa_erro=1.0)
+    estavel = servidor_local()
+
+    dados = consultar_com_provedores("cep", "01310100", [_viacep(instavel), _viacep(estavel)], atraso=None)
+
+    assert dados["state"] == "SP"
+    assert instavel.requisicoes == 1
+
+
+def test_um_nao_encontrado_perde_para_quem_tem_o_registro(servidor_local):
+    servidor = servidor_local()
+    sem_registro = ProvedorSemRegistro("vazio")
+
+    dados = consultar_com_provedores("cep", "01310100", [sem_registro, _viacep(servidor)], atraso=None)
+
+    assert dados["street"] == "Avenida Paulista"
+    assert sem_registro.chamadas == 1
+
+
+def test_404_so_quando_todos_os_provedores_concordam(servidor_local):
+    servidor = servidor_local()
+
+    with pytest.raises(ErroConsulta) as erro:
+        consultar_com_provedores(
+            "cnpj",
+            "00000000000000",
+            [ProvedorReceitaWs(ClienteHttpPool(servidor.url)), ProvedorSemRegistro("vazio")],
+            atraso=0,
+        )
+
+    assert erro.value.status == 404
+
+
+def test_indisponibilidade_prevalece_sobre_nao_encontrado(servidor_local):
+    fora_do_ar = servidor_local(taxa_erro=1.0)
+
+    with pytest.raises(ErroConsulta) as erro:
+        consultar_com_provedores(
+            "cep", "99999999", [ProvedorSemRegistro("vazio"), _viacep(fora_do_ar)], atraso=None
+        )
+
+    assert erro.value.status == 503